@@ -1,16 +1,32 @@
+import os
+import json
+import asyncio
 import logging
+from itertools import islice
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
 
-from ..core.hidden_detector import HiddenDetector
-from ..core.virus_scanner import VirusScanner
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from ..core.scanner import get_removable_drives
-from ..core.mft import scan_mft
-from ..core.analyzer import FileAnalyzer
-from ..models.schemas import ScanResponse
-from ..core.file_type_detector import FileTypeDetector
+from ..core.mft import iter_mft
+from ..core.columnar import ColumnarScanResult
+from ..core.image import EvidenceSource
+from ..core.pipeline import ScanPipeline
+from ..core.scan_filter import ScanFilter
+from ..core.triage import TriagePolicy
+from ..core.fuzzy import SimilarityIndex, SSDEEP_MIN_SCORE, TLSH_MAX_DISTANCE
+from ..core.jobs import job_manager
+from ..core.export import export_results, FORMATS as EXPORT_FORMATS
+from ..models.schemas import (
+    ScanResponse, MFTMetadata, ScanJobRequest, ScanJobStatus, ScanJobResults, SimilarContent
+)
 
 router = APIRouter()
 
+ENGINES = ("tsk", "raw")
+
 @router.get("/drives")
 async def list_drives():
     drives = get_removable_drives()
@@ -18,73 +34,208 @@ async def list_drives():
         raise HTTPException(status_code=404, detail="No removable drives detected")
     return drives
 
+def scan_filter_params(include: Optional[List[str]] = Query(None), exclude: Optional[List[str]] = Query(None),
+                       max_depth: Optional[int] = None, min_size: Optional[int] = None,
+                       max_size: Optional[int] = None, modified_after: Optional[datetime] = None,
+                       modified_before: Optional[datetime] = None,
+                       skip_system: bool = False) -> Optional[ScanFilter]:
+    return ScanFilter.create(include=include, exclude=exclude, max_depth=max_depth, min_size=min_size,
+                             max_size=max_size, modified_after=modified_after, modified_before=modified_before,
+                             skip_system=skip_system)
+
+def triage_params(max_file_bytes: Optional[int] = None, partial_above: Optional[int] = None,
+                  priority_extensions: Optional[List[str]] = Query(None), recent_days: Optional[float] = None,
+                  byte_budget: Optional[int] = None, time_budget: Optional[float] = None) -> Optional[TriagePolicy]:
+    return TriagePolicy.create(max_file_bytes=max_file_bytes, partial_above=partial_above,
+                               priority_extensions=priority_extensions, recent_days=recent_days,
+                               byte_budget=byte_budget, time_budget=time_budget)
+
 # routes.py scan_drive function modification
 
 @router.get("/scan", response_model=ScanResponse)
-async def scan_drive(drive: str):
+async def scan_drive(drive: str, engine: str = "tsk", hash_workers: int = 4, incremental: bool = False,
+                     batch_size: int = 1024, recover_deleted: bool = False, dedup: bool = False,
+                     fuzzy: bool = False, include_tree: bool = False, walk_workers: int = 1,
+                     scan_filter: Optional[ScanFilter] = Depends(scan_filter_params),
+                     triage: Optional[TriagePolicy] = Depends(triage_params)):
     logger = logging.getLogger("api.scan")
-    logger.info(f"Starting scan for drive: {drive}")
+    logger.info(f"Starting scan for drive: {drive} (engine: {engine})")
+
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown MFT engine: {engine}")
     
     try:
-        mft_data = scan_mft(drive)
-        logger.info(f"MFT scan completed for drive {drive}")
-        
-        virus_scanner = None
+        # Opening the image, compiling rules and loading hash sets all block: none of it runs on the loop
+        source = await asyncio.to_thread(EvidenceSource, drive)
         try:
-            virus_scanner = VirusScanner()
-        except Exception as e:
-            logger.error(f"Failed to initialize VirusScanner: {e}")
-        
-        total_files = len(mft_data)
-        processed = 0
-        
-        for filename, metadata in mft_data.items():
-            processed += 1
-            logger.info(f"Processing file {processed}/{total_files}: {filename}")
-            
-            # Initialize default hash and file type data
-            metadata["hashes"] = {"md5": None, "sha256": None}
-            metadata["file_type"] = None
-
-            # Skip system files and directories
-            if (filename.startswith('$') or 
-                filename in ['.', 'System Volume Information'] or
-                metadata['type'] == 'Directory'):
-                logger.debug(f"Skipping system file/directory: {filename}")
-                continue
+            results = ColumnarScanResult()
+            await asyncio.to_thread(
+                results.extend,
+                iter_mft(source, engine=engine, raw=True, recover_deleted=recover_deleted, tree=results.tree,
+                         scan_filter=scan_filter, workers=walk_workers)
+            )
+            logger.info(f"MFT scan completed for drive {drive}: {len(results)} entries")
 
+            pipeline = await asyncio.to_thread(ScanPipeline, source, hash_workers=hash_workers,
+                                               incremental=incremental, dedup=dedup, fuzzy=fuzzy, triage=triage)
             try:
-                analyzer = FileAnalyzer(f"{drive}{filename}")
-                hash_result = analyzer.calculate_hashes()
-                
-                if "error" not in hash_result:
-                    metadata["hashes"] = hash_result
-                    
-                    if virus_scanner and hash_result.get("sha256"):
-                        try:
-                            logger.info(f"Scanning file: {filename} with hash: {hash_result['sha256']}")
-                            scan_result = virus_scanner.check_hash(hash_result["sha256"])
-                            metadata["hashes"]["virus_scan"] = scan_result
-                            logger.info(f"Scan completed for {filename}: {scan_result['message']}")
-                        except Exception as e:
-                            logger.error(f"Virus scan failed for {filename}: {e}")
-                            metadata["hashes"]["virus_scan"] = None
-                    
-                    # Add file type analysis
-                    type_detector = FileTypeDetector()
-                    metadata["file_type"] = type_detector.analyze_file(f"{drive}{filename}")
-                    
-            except Exception as e:
-                logger.error(f"Failed to analyze {filename}: {str(e)}")
-            hidden_detector = HiddenDetector()
-            metadata["hidden_status"] = hidden_detector.analyze_file(f"{drive}{filename}")
+                await asyncio.to_thread(results.check_timestamps, pipeline.timestamps)
+                order = await asyncio.to_thread(results.priority_order, triage) if triage else None
+                for batch in results.batches(batch_size, pipeline.group_above, order):
+                    await pipeline.process_batch(batch)
+                    for filename, metadata in batch:
+                        results.store(filename, metadata)
+                pipeline.finish()
+            finally:
+                await pipeline.close()
+        finally:
+            source.close()
 
         logger.info(f"Scan completed for drive {drive}")
         return {
             "status": "success",
-            "data": mft_data
+            "data": results.as_dict(),
+            "tree": results.tree_dict() if include_tree else None,
+            "summary": pipeline.summary()
         }
         
     except Exception as e:
         logger.exception(f"Scan failed for drive {drive}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/scan/stream")
+async def scan_drive_stream(drive: str, engine: str = "tsk", hash_workers: int = 4, batch_size: int = 256,
+                            incremental: bool = False, recover_deleted: bool = False, dedup: bool = False,
+                            fuzzy: bool = False, walk_workers: int = 1,
+                            scan_filter: Optional[ScanFilter] = Depends(scan_filter_params),
+                            triage: Optional[TriagePolicy] = Depends(triage_params)):
+    """NDJSON variant of /scan: one {"path", ...MFTMetadata} line per entry as soon as its
+    batch is enriched, followed by a final {"summary": ...} line."""
+    logger = logging.getLogger("api.scan")
+    logger.info(f"Starting streaming scan for drive: {drive} (engine: {engine})")
+
+    if engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown MFT engine: {engine}")
+
+    try:
+        source = await asyncio.to_thread(EvidenceSource, drive)
+    except Exception as e:
+        logger.exception(f"Scan failed for drive {drive}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def generate():
+        # Entries are triaged in enumeration order here: there is no whole volume to prioritise
+        pipeline = None
+        entries = iter_mft(source, engine=engine, recover_deleted=recover_deleted, scan_filter=scan_filter,
+                           workers=walk_workers)
+        try:
+            pipeline = await asyncio.to_thread(ScanPipeline, source, hash_workers=hash_workers,
+                                               incremental=incremental, dedup=dedup, fuzzy=fuzzy, triage=triage)
+            while True:
+                batch = await asyncio.to_thread(lambda: list(islice(entries, max(batch_size, 1))))
+                if not batch:
+                    break
+                await pipeline.process_batch(batch)
+                lines = []
+                for filename, metadata in batch:
+                    record = MFTMetadata(**metadata).model_dump()
+                    lines.append(json.dumps({"path": filename, **record}))
+                yield "\n".join(lines) + "\n"
+            pipeline.finish()
+            logger.info(f"Streaming scan completed for drive {drive}")
+            yield json.dumps({"summary": pipeline.summary()}) + "\n"
+        except Exception as e:
+            logger.exception(f"Streaming scan failed for drive {drive}: {str(e)}")
+            yield json.dumps({"error": str(e)}) + "\n"
+        finally:
+            if pipeline is not None:
+                await pipeline.close()
+            source.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/scans", response_model=ScanJobStatus)
+async def create_scan_job(request: ScanJobRequest):
+    if request.engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown MFT engine: {request.engine}")
+    scan_filter = ScanFilter.create(include=request.include, exclude=request.exclude, max_depth=request.max_depth,
+                                    min_size=request.min_size, max_size=request.max_size,
+                                    modified_after=request.modified_after, modified_before=request.modified_before,
+                                    skip_system=request.skip_system)
+    job = job_manager.submit(request.drive, request.engine, request.hash_workers, request.batch_size,
+                             request.incremental, request.recover_deleted, request.dedup, request.fuzzy,
+                             scan_filter, request.walk_workers,
+                             TriagePolicy.create(max_file_bytes=request.max_file_bytes,
+                                                 partial_above=request.partial_above,
+                                                 priority_extensions=request.priority_extensions,
+                                                 recent_days=request.recent_days,
+                                                 byte_budget=request.byte_budget,
+                                                 time_budget=request.time_budget))
+    return job.progress()
+
+@router.get("/scans", response_model=List[ScanJobStatus])
+async def list_scan_jobs():
+    return [job.progress() for job in job_manager.list()]
+
+@router.get("/scans/{job_id}", response_model=ScanJobStatus)
+async def get_scan_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scan job: {job_id}")
+    return job.progress()
+
+@router.get("/scans/{job_id}/results", response_model=ScanJobResults)
+async def get_scan_job_results(job_id: str, offset: int = 0, limit: Optional[int] = None):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scan job: {job_id}")
+    return job.results(offset, limit)
+
+@router.delete("/scans/{job_id}", response_model=ScanJobStatus)
+async def cancel_scan_job(job_id: str):
+    """Cancel a queued or running job, or forget a finished one along with its results"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scan job: {job_id}")
+    return job.progress()
+
+@router.post("/scans/{job_id}/export")
+async def export_scan_job(job_id: str, format: str = "parquet"):
+    """Write a job's results (including partial ones) into EXPORT_DIR as Parquet, Arrow IPC or SQLite"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown scan job: {job_id}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format: {format}")
+
+    extension = {"parquet": "parquet", "arrow": "arrow", "sqlite": "db"}[format]
+    path = Path(os.getenv("EXPORT_DIR", "exports")) / f"scan-{job_id}.{extension}"
+    try:
+        completed = job.entries.rows_at(job.entries.completed_rows())
+        rows = await asyncio.to_thread(export_results, completed, str(path), format)
+    except Exception as e:
+        logging.getLogger("api.export").exception(f"Export failed for job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"path": str(path.resolve()), "format": format, "rows": rows}
+
+@router.get("/similar", response_model=List[SimilarContent])
+async def find_similar(sha256: Optional[str] = None, ssdeep: Optional[str] = None, tlsh: Optional[str] = None,
+                       scan_id: Optional[str] = None, min_score: int = SSDEEP_MIN_SCORE,
+                       max_distance: int = TLSH_MAX_DISTANCE, limit: int = 50):
+    """Files similar to an indexed sha256, or to an ssdeep/TLSH digest, across every fuzzy
+    scan or only the scan (or job id) given as scan_id."""
+    if not (sha256 or ssdeep or tlsh):
+        raise HTTPException(status_code=400, detail="Give a sha256, ssdeep or tlsh to search for")
+
+    def search():
+        index = SimilarityIndex()
+        try:
+            return index.similar(sha256, ssdeep, tlsh, scan_id, min_score, max_distance, limit)
+        finally:
+            index.close()
+
+    try:
+        return await asyncio.to_thread(search)
+    except Exception as e:
+        logging.getLogger("api.fuzzy").exception(f"Similarity search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -5,23 +5,31 @@ from datetime import datetime
 from pathlib import Path
 
 class FileAnalyzer:
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, opener=None):
         self.file_path = Path(file_path)
+        # Optional callable returning a binary file object, used for image-backed content
+        self.opener = opener
 
-    def calculate_hashes(self) -> dict:
+    def _open(self):
+        if self.opener is not None:
+            return self.opener()
+        return open(self.file_path, 'rb')
+
+    def calculate_hashes(self, chunk_size: int = 65536) -> dict:
         try:
-            if not self.file_path.exists():
-                return {"error": f"File not found: {self.file_path}"}
-            
-            if not self.file_path.is_file():
-                return {"error": f"Not a file: {self.file_path}"}
+            if self.opener is None:
+                if not self.file_path.exists():
+                    return {"error": f"File not found: {self.file_path}"}
+
+                if not self.file_path.is_file():
+                    return {"error": f"Not a file: {self.file_path}"}
 
             md5 = hashlib.md5()
             sha256 = hashlib.sha256()
             
-            with open(self.file_path, 'rb') as f:
+            with self._open() as f:
                 # Read in chunks to handle large files
-                for chunk in iter(lambda: f.read(65536), b''):
+                for chunk in iter(lambda: f.read(chunk_size), b''):
                     md5.update(chunk)
                     sha256.update(chunk)
             
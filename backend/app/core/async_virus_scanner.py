@@ -0,0 +1,154 @@
+# app/core/async_virus_scanner.py
+import os
+import time
+import random
+import asyncio
+from typing import Any, Dict, Iterable, Optional
+
+import aiohttp
+
+from .virus_scanner import VirusScanner
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per `period` seconds, bursting up to `capacity`."""
+
+    def __init__(self, rate: float, period: float = 60.0, capacity: Optional[int] = None):
+        self.fill_rate = rate / period
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+    def drain(self):
+        # Called on a 429 so every pending lookup waits for fresh quota
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+
+class AsyncVirusScanner(VirusScanner):
+    """Batched VirusTotal lookups over one pooled aiohttp session.
+
+    Shares the cache and result format of VirusScanner, but never blocks the event loop.
+    Limits come from VIRUSTOTAL_CONCURRENCY, VIRUSTOTAL_RATE_LIMIT (requests per minute)
+    and VIRUSTOTAL_MAX_RETRIES; point VIRUSTOTAL_API_URL at a mock server to load-test.
+    The rate limit, concurrency cap and session span every batch of the scanner, so
+    close() it from the event loop that ran the lookups; that also closes the cache.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, rate_limit: Optional[float] = None,
+                 max_retries: Optional[int] = None, timeout: float = 10.0):
+        super().__init__()
+        self.concurrency = concurrency or int(os.getenv("VIRUSTOTAL_CONCURRENCY", "4"))
+        self.rate_limit = rate_limit or float(os.getenv("VIRUSTOTAL_RATE_LIMIT", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("VIRUSTOTAL_MAX_RETRIES", "5"))
+        self.timeout = timeout
+        self.stats = {"requested": 0, "unique": 0, "cache_hits": 0, "api_calls": 0, "retries": 0}
+        self.bucket = TokenBucket(self.rate_limit)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        # Opened on the first lookup, inside the loop it belongs to
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency),
+                headers={"accept": "application/json", "x-apikey": self.api_key},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.cache.close()
+
+    def _error_result(self, message: str, details: str) -> Dict[str, Any]:
+        return {
+            "status_code": 500,
+            "data": None,
+            "message": message,
+            "error_details": details
+        }
+
+    async def _fetch(self, session: aiohttp.ClientSession, file_hash: str) -> Dict[str, Any]:
+        url = f"{self.base_url}/files/{file_hash}"
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            try:
+                async with self.semaphore:
+                    self.stats["api_calls"] += 1
+                    async with session.get(url) as response:
+                        status = response.status
+                        body = await response.text()
+                        retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.logger.error(f"API request failed for hash {file_hash}: {e}")
+                if attempt == self.max_retries:
+                    return self._error_result("API request failed", str(e))
+                status, body, retry_after = None, "", None
+
+            if status is not None and status not in RETRY_STATUSES:
+                return self._build_result(file_hash, status, body)
+
+            if attempt == self.max_retries:
+                return self._build_result(file_hash, status, body)
+
+            if status == 429:
+                self.bucket.drain()
+            self.stats["retries"] += 1
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else delay + random.uniform(0, delay)
+            self.logger.warning(f"Retrying hash {file_hash} in {wait:.1f}s (status {status}, attempt {attempt + 1})")
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, 60.0)
+
+    async def check_hashes(self, hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Look up every distinct hash once, returning hash -> result."""
+        hashes = [h for h in hashes if h]
+        unique = list(dict.fromkeys(hashes))
+        self.stats["requested"] += len(hashes)
+        self.stats["unique"] += len(unique)
+
+        results = {}
+        pending = []
+        stored = self.cache.get_many(unique)
+        for file_hash in unique:
+            cached = self._cached_result(file_hash, stored.get(file_hash)) if file_hash in stored else None
+            if cached is not None:
+                results[file_hash] = cached
+                self.stats["cache_hits"] += 1
+            else:
+                pending.append(file_hash)
+
+        if pending:
+            session = self._session()
+            fetched = await asyncio.gather(*(self._fetch(session, h) for h in pending))
+
+            for file_hash, result in zip(pending, fetched):
+                results[file_hash] = result
+                if self._is_cacheable(result):
+                    self.cache.put(file_hash, result)
+            # One transaction per batch instead of one file rewrite per miss
+            self._save_cache()
+
+        self.logger.info(
+            f"Looked up {len(unique)} unique hashes ({self.stats['cache_hits']} cached, "
+            f"{self.stats['api_calls']} API calls, {self.stats['retries']} retries)"
+        )
+        return results
@@ -0,0 +1,356 @@
+# app/core/columnar.py
+import json
+from array import array
+from collections.abc import MutableMapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .mft import TIME_FIELDS, format_metadata
+from .path_tree import PathTree
+from .timestamps import decode_anomalies
+
+
+# Digests kept as fixed-width binary columns: bytes per row and presence bit
+DIGESTS = {"md5": (16, 0x01), "sha256": (32, 0x02), "partial_hash": (16, 0x04)}
+HAS_HASHES = 0x80
+# Nested enrichment produced by the content stages, dictionary-encoded per row
+ENCODED_KEYS = ("file_type", "hidden_status", "triage")
+NO_OFFSET = -1
+NO_ROW = -1
+UNKNOWN = -1
+DEFAULT_STREAM = -1
+# A same-size run keeps a batch growing up to this many times batch_size, then is split
+MAX_GROUP_BATCHES = 4
+
+
+class DictionaryColumn:
+    """Dictionary-encoded column: each distinct value is stored once, rows hold a small code."""
+
+    def __init__(self, typecode: str = "H"):
+        self.codes = array(typecode)
+        self.values: List = []
+        self.lookup: Dict = {}
+
+    def code(self, value) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        self.codes.append(self.code(value))
+
+    def __setitem__(self, row: int, value):
+        self.codes[row] = self.code(value)
+
+    def __getitem__(self, row: int):
+        return self.values[self.codes[row]]
+
+
+class EncodedColumn(DictionaryColumn):
+    """Dictionary-encoded column of nested values (dicts, lists): each distinct value is kept
+    once as its JSON text and decoded into fresh objects when a row is read."""
+
+    def __init__(self, typecode: str = "I"):
+        super().__init__(typecode)
+
+    @staticmethod
+    def encode(value) -> Optional[str]:
+        return None if value is None else json.dumps(value, separators=(",", ":"))
+
+    def append(self, value):
+        super().append(self.encode(value))
+
+    def __setitem__(self, row: int, value):
+        super().__setitem__(row, self.encode(value))
+
+    def __getitem__(self, row: int):
+        text = super().__getitem__(row)
+        return None if text is None else json.loads(text)
+
+
+class ColumnarScanResult(MutableMapping):
+    """Scan results held as typed arrays instead of one dict per file.
+
+    Integer columns hold sizes, unix timestamps, ids and modes, type and flags are
+    dictionary-encoded, and paths are nodes of a PathTree. The pipeline's enrichment
+    follows the same layout: digests are fixed-width binary columns, file type, hidden
+    status, triage and the remaining hash fields (fuzzy digests, verdicts) are
+    dictionary-encoded, so rows with equal results share one copy. Formatting into the
+    API dict and building the path string only happen when a record is read, so the
+    object behaves like the old path -> metadata dict at a fixed cost per entry, a few
+    hundred bytes with its name, that enrichment doesn't add to.
+    """
+
+    def __init__(self, tree: Optional[PathTree] = None):
+        self.tree = tree if tree is not None else PathTree()
+        self.nodes = array("I")
+        # Row of every tree node, NO_ROW for directories only known as a path prefix
+        self.node_rows = array("i")
+        self.size = array("q")
+        self.crtime = array("q")
+        self.mtime = array("q")
+        self.atime = array("q")
+        self.file_id = array("Q")
+        self.sequence = array("I")
+        self.mode = array("I")
+        self.uid = array("I")
+        self.gid = array("I")
+        self.volume = array("H")
+        self.data_offset = array("q")
+        self.recoverable = array("b")
+        self.attribute_id = array("i")
+        self.dos_flags = array("q")
+        # Raw $SI/$FN FILETIMEs, 0 when unknown, and their anomaly bits once checked
+        self.times = {field: array("q") for field in TIME_FIELDS}
+        self.anomalies = array("B")
+        self.type = DictionaryColumn("B")
+        self.flags = DictionaryColumn("H")
+        self.digests = {key: bytearray() for key in DIGESTS}
+        self.hash_bits = array("B")
+        # Hash fields other than the digests above, plus digests that aren't plain hex
+        self.hash_details = EncodedColumn()
+        self.encoded = {key: EncodedColumn() for key in ENCODED_KEYS}
+        # 1 once the pipeline has stored a row, so partial results skip rows still in flight
+        self.done = array("B")
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, Dict]]) -> "ColumnarScanResult":
+        """Build from the raw (path, metadata) pairs of mft.iter_mft(..., raw=True)."""
+        result = cls()
+        result.extend(entries)
+        return result
+
+    def extend(self, entries: Iterable[Tuple[str, Dict]]):
+        for path, raw in entries:
+            self.append(path, raw)
+
+    def append(self, path: str, raw: Dict) -> int:
+        """Add a row; raw["node"] is used when the engine already placed it in self.tree."""
+        row = len(self.nodes)
+        node = raw.get("node")
+        if node is None:
+            node = self.tree.insert(path)
+        self.nodes.append(node)
+        if len(self.node_rows) < len(self.tree):
+            self.node_rows.extend([NO_ROW] * (len(self.tree) - len(self.node_rows)))
+        self.node_rows[node] = row
+        self.size.append(raw["size"] or 0)
+        self.crtime.append(raw["crtime"] or 0)
+        self.mtime.append(raw["mtime"] or 0)
+        self.atime.append(raw["atime"] or 0)
+        self.file_id.append(raw["file_id"] or 0)
+        self.sequence.append(raw.get("sequence") or 0)
+        self.mode.append(raw["mode"] or 0)
+        self.uid.append(raw["uid"] or 0)
+        self.gid.append(raw["gid"] or 0)
+        self.volume.append(raw.get("volume") or 0)
+        offset = raw.get("data_offset")
+        self.data_offset.append(NO_OFFSET if offset is None else offset)
+        recoverable = raw.get("recoverable")
+        self.recoverable.append(UNKNOWN if recoverable is None else int(recoverable))
+        attribute_id = raw.get("attribute_id")
+        self.attribute_id.append(DEFAULT_STREAM if attribute_id is None else attribute_id)
+        dos_flags = raw.get("dos_flags")
+        self.dos_flags.append(UNKNOWN if dos_flags is None else dos_flags)
+        for field, column in self.times.items():
+            column.append(raw.get(field) or 0)
+        self.type.append(raw["type"])
+        self.flags.append(raw["flags"])
+        for key, (width, _) in DIGESTS.items():
+            self.digests[key].extend(bytes(width))
+        self.hash_bits.append(0)
+        self.hash_details.append(None)
+        for column in self.encoded.values():
+            column.append(None)
+        self.done.append(0)
+        return row
+
+    def raw(self, row: int) -> Dict:
+        offset = self.data_offset[row]
+        recoverable = self.recoverable[row]
+        attribute_id = self.attribute_id[row]
+        dos_flags = self.dos_flags[row]
+        raw = {
+            "size": self.size[row],
+            "crtime": self.crtime[row],
+            "mtime": self.mtime[row],
+            "atime": self.atime[row],
+            "type": self.type[row],
+            "flags": self.flags[row],
+            "file_id": self.file_id[row],
+            "sequence": self.sequence[row],
+            "mode": self.mode[row],
+            "uid": self.uid[row],
+            "gid": self.gid[row],
+            "volume": self.volume[row],
+            "data_offset": None if offset == NO_OFFSET else offset,
+            "recoverable": None if recoverable == UNKNOWN else bool(recoverable),
+            "attribute_id": None if attribute_id == DEFAULT_STREAM else attribute_id,
+            "dos_flags": None if dos_flags == UNKNOWN else dos_flags,
+        }
+        for field, column in self.times.items():
+            raw[field] = column[row]
+        if row < len(self.anomalies):
+            raw["timestamp_anomalies"] = decode_anomalies(self.anomalies[row])
+        return raw
+
+    def priority_order(self, policy) -> np.ndarray:
+        """Rows in the processing order of a TriagePolicy."""
+        names = [self.tree.names[node] for node in self.nodes]
+        return policy.order(names, np.frombuffer(self.size, dtype=np.int64), np.frombuffer(self.mtime, dtype=np.int64))
+
+    def check_timestamps(self, checker) -> Dict:
+        """Run the timestamp anomaly pass of a TimestampChecker over every row at once."""
+        times = {field: np.frombuffer(column, dtype=np.int64) for field, column in self.times.items()}
+        mask = checker.check(times, np.frombuffer(self.file_id, dtype=np.uint64),
+                             np.frombuffer(self.volume, dtype=np.uint16))
+        self.anomalies = array("B", mask.tobytes())
+        return checker.stats
+
+    def record(self, row: int) -> Dict:
+        """The API metadata dict for one row, formatted on demand."""
+        metadata = format_metadata(self.raw(row))
+        hashes = self.hashes(row)
+        if hashes is not None:
+            metadata["hashes"] = hashes
+        for key, column in self.encoded.items():
+            value = column[row]
+            if value is not None:
+                metadata[key] = value
+        return metadata
+
+    def hashes(self, row: int) -> Optional[Dict]:
+        bits = self.hash_bits[row]
+        if not bits & HAS_HASHES:
+            return None
+        hashes = {}
+        for key, (width, bit) in DIGESTS.items():
+            if bits & bit:
+                hashes[key] = self.digests[key][row * width:(row + 1) * width].hex()
+        hashes.update(self.hash_details[row] or {})
+        return hashes
+
+    def store_hashes(self, row: int, hashes: Optional[Dict]):
+        if hashes is None:
+            self.hash_bits[row] = 0
+            self.hash_details[row] = None
+            return
+        bits = HAS_HASHES
+        details = {}
+        for key, value in hashes.items():
+            digest = None
+            if key in DIGESTS and isinstance(value, str) and len(value) == 2 * DIGESTS[key][0]:
+                try:
+                    digest = bytes.fromhex(value)
+                except ValueError:
+                    pass
+            if digest is None:
+                details[key] = value
+                continue
+            width, bit = DIGESTS[key]
+            self.digests[key][row * width:(row + 1) * width] = digest
+            bits |= bit
+        self.hash_bits[row] = bits
+        self.hash_details[row] = details or None
+
+    def path(self, row: int) -> str:
+        return self.tree.path(self.nodes[row])
+
+    def row(self, path: str) -> int:
+        node = self.tree.find(path)
+        row = self.node_rows[node] if node is not None and node < len(self.node_rows) else NO_ROW
+        if row == NO_ROW:
+            raise KeyError(path)
+        return row
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+        stop = len(self.nodes) if stop is None else min(stop, len(self.nodes))
+        for row in range(start, stop):
+            yield self.path(row), self.record(row)
+
+    def rows_at(self, rows: Iterable[int]) -> Iterator[Tuple[str, Dict]]:
+        for row in rows:
+            row = int(row)
+            yield self.path(row), self.record(row)
+
+    def completed_rows(self) -> np.ndarray:
+        """Indices of the rows stored so far, in row order whatever order they were processed in."""
+        return np.flatnonzero(np.frombuffer(self.done.tobytes(), dtype=np.uint8))
+
+    def batches(self, batch_size: int, group_above: Optional[int] = None,
+                order: Optional[Iterable[int]] = None) -> Iterator[List[Tuple[str, Dict]]]:
+        """Rows in batches of batch_size, following order (row indices) when given. With
+        group_above and no order, rows come in size order; either way a run of equal sizes
+        above group_above is kept in one batch, up to MAX_GROUP_BATCHES times batch_size.
+        A longer run is split in chunks that never leave a single row of that size behind."""
+        if group_above is None and order is None:
+            for start in range(0, len(self.nodes), batch_size):
+                yield list(self.rows(start, start + batch_size))
+            return
+
+        if order is None:
+            order = sorted(range(len(self.nodes)), key=self.size.__getitem__)
+        limit = batch_size * MAX_GROUP_BATCHES
+        batch = []
+        previous = None
+        for position, row in enumerate(order):
+            row = int(row)
+            size = self.size[row]
+            if len(batch) >= batch_size:
+                grouped = group_above is not None and size == previous and size > group_above
+                if not grouped or (len(batch) >= limit and position + 1 < len(order)
+                                   and self.size[int(order[position + 1])] == size):
+                    yield batch
+                    batch = []
+            batch.append((self.path(row), self.record(row)))
+            previous = size
+        if batch:
+            yield batch
+
+    def store(self, path: str, metadata: Dict):
+        """Keep the enrichment added by the pipeline and mark the row done; the column fields
+        are immutable."""
+        row = self.row(path)
+        self.store_hashes(row, metadata.get("hashes"))
+        for key, column in self.encoded.items():
+            column[row] = metadata.get(key)
+        self.done[row] = 1
+
+    # MutableMapping interface, so existing dict consumers keep working
+
+    def __getitem__(self, path: str) -> Dict:
+        return self.record(self.row(path))
+
+    def __setitem__(self, path: str, metadata: Dict):
+        if path not in self:
+            raise KeyError(f"Cannot add {path}: rows are appended from raw MFT metadata")
+        self.store(path, metadata)
+
+    def __delitem__(self, path: str):
+        raise TypeError("ColumnarScanResult rows cannot be deleted")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.path(row) for row in range(len(self.nodes)))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, path) -> bool:
+        try:
+            self.row(path)
+        except KeyError:
+            return False
+        return True
+
+    def items(self):
+        return self.rows()
+
+    def as_dict(self) -> Dict[str, Dict]:
+        return dict(self.rows())
+
+    def tree_dict(self) -> Dict[str, List]:
+        """The path tree with the node of every row, in the order as_dict() lists the rows."""
+        return {**self.tree.as_dict(), "nodes": self.nodes.tolist()}
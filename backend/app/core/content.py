@@ -0,0 +1,130 @@
+# app/core/content.py
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+class ContentConsumer:
+    """A stage fed every buffer of a file's content during the single read pass.
+
+    update() receives a memoryview into a reused buffer, so anything kept beyond the
+    call has to be copied. finish() returns a dict merged into the per-file result.
+    """
+
+    name = "consumer"
+    # Whether the consumer gives a usable result from just the first and last block
+    partial_ok = False
+
+    def update(self, view: memoryview):
+        raise NotImplementedError
+
+    def skip(self, count: int):
+        """count bytes between the blocks of a partial read were not fed to update()."""
+
+    def finish(self) -> Dict:
+        return {}
+
+
+class HashConsumer(ContentConsumer):
+    name = "hashes"
+
+    def __init__(self):
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def update(self, view: memoryview):
+        self.md5.update(view)
+        self.sha256.update(view)
+
+    def finish(self) -> Dict:
+        return {"hashes": {"md5": self.md5.hexdigest(), "sha256": self.sha256.hexdigest()}}
+
+
+class HeaderConsumer(ContentConsumer):
+    """Keeps the leading bytes for the signature sniffer."""
+
+    name = "header"
+    partial_ok = True
+
+    def __init__(self, length: int = 8):
+        self.length = length
+        self.header = bytearray()
+
+    def update(self, view: memoryview):
+        missing = self.length - len(self.header)
+        if missing > 0:
+            self.header += view[:missing]
+
+    def finish(self) -> Dict:
+        return {"header": bytes(self.header)}
+
+
+# Consumers every scan runs; later stages (entropy, YARA, ...) append their factories
+DEFAULT_CONSUMERS: List[Callable[[], ContentConsumer]] = [HashConsumer, HeaderConsumer]
+
+
+class ContentReader:
+    """Reads each file exactly once through a per-thread, preallocated buffer.
+
+    readinto() fills the same bytearray on every call, so no bytes object is created
+    per chunk on the path-based route, and all consumers see the same memoryview.
+    """
+
+    def __init__(self, buffer_size: int = 1024 * 1024):
+        self.buffer_size = buffer_size
+        self.local = threading.local()
+
+    def _buffer(self) -> memoryview:
+        view = getattr(self.local, "view", None)
+        if view is None:
+            self.local.view = view = memoryview(bytearray(self.buffer_size))
+        return view
+
+    def read(self, path: str, consumers: List[ContentConsumer], opener: Optional[Callable] = None) -> Dict:
+        """Stream one file through the consumers, returning their merged results and bytes read."""
+        view = self._buffer()
+        total = 0
+        handle = opener() if opener is not None else open(Path(path), "rb", buffering=0)
+        with handle as f:
+            while True:
+                count = f.readinto(view)
+                if not count:
+                    break
+                chunk = view[:count]
+                for consumer in consumers:
+                    consumer.update(chunk)
+                total += count
+
+        result = {"bytes_read": total}
+        for consumer in consumers:
+            result.update(consumer.finish())
+        return result
+
+    def read_partial(self, path: str, consumers: List[ContentConsumer], size: int, block: int,
+                     opener: Optional[Callable] = None) -> Dict:
+        """Read only the first and last block, returning a partial hash that, together with
+        the size, groups candidate duplicates. Only partial_ok consumers are fed."""
+        consumers = [consumer for consumer in consumers if consumer.partial_ok]
+        view = self._buffer()[:block]
+        digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=16)
+        position = total = 0
+        handle = opener() if opener is not None else open(Path(path), "rb", buffering=0)
+        with handle as f:
+            for offset in (0, max(size - block, block)):
+                if offset > position:
+                    f.seek(offset)
+                    for consumer in consumers:
+                        consumer.skip(offset - position)
+                count = f.readinto(view)
+                chunk = view[:count]
+                digest.update(chunk)
+                for consumer in consumers:
+                    consumer.update(chunk)
+                position = offset + count
+                total += count
+
+        result = {"bytes_read": total, "partial_hash": digest.hexdigest()}
+        for consumer in consumers:
+            result.update(consumer.finish())
+        return result
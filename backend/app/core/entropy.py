@@ -0,0 +1,146 @@
+# app/core/entropy.py
+from typing import Dict, List
+
+import numpy as np
+
+from .content import ContentConsumer
+
+
+# Bits per byte; random or encrypted data sits just under 8
+ENCRYPTED_THRESHOLD = 7.9
+PACKED_THRESHOLD = 7.5
+# Below this many bytes the estimate can't reach the thresholds anyway
+MIN_ENTROPY_SIZE = 1024
+
+WINDOW_SIZE = 32 * 1024
+MAX_REGIONS = 16
+# Buffers this large are histogrammed from a sample of their 16-bit pairs
+SAMPLE_MIN_CHUNK = 1024 * 1024
+EXECUTABLE_MAGIC = (b"MZ", b"\x7fELF", b"\xfe\xed\xfa\xce", b"\xfe\xed\xfa\xcf", b"\xce\xfa\xed\xfe", b"\xcf\xfa\xed\xfe")
+
+
+def shannon_entropy(counts: np.ndarray) -> float:
+    total = counts.sum()
+    if not total:
+        return 0.0
+    p = counts[counts > 0] / total
+    return float(-(p * np.log2(p)).sum())
+
+
+def row_entropy(histograms: np.ndarray) -> np.ndarray:
+    """Entropy of every row of a (n, 256) histogram matrix at once."""
+    p = histograms / np.maximum(histograms.sum(axis=1, keepdims=True), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.where(p > 0, np.log2(p), 0.0)
+    return -(p * logs).sum(axis=1)
+
+
+def byte_histogram(data: np.ndarray, stride: int = 1) -> np.ndarray:
+    """Byte counts of a uint8 array.
+
+    Large buffers are binned as 16-bit pairs and folded back to bytes, which halves the
+    elements bincount has to widen; stride > 1 bins every stride-th pair and scales up.
+    """
+    if len(data) < 4096:
+        return np.bincount(data, minlength=256)
+    even = len(data) & ~1
+    pairs = np.bincount(data[:even].view(np.uint16)[::stride], minlength=65536).reshape(256, 256)
+    counts = pairs.sum(axis=0) + pairs.sum(axis=1)
+    if stride > 1:
+        counts *= stride
+    if even < len(data):
+        counts[data[-1]] += 1
+    return counts
+
+
+class EntropyConsumer(ContentConsumer):
+    """Shannon entropy of the whole file, plus overlapping window entropy for executables.
+
+    Fed straight from the shared read buffer: np.frombuffer wraps the memoryview without
+    copying. Windows are WINDOW_SIZE long with 50% overlap, built from half-window block
+    histograms so each byte is binned once.
+    """
+
+    name = "entropy"
+
+    def __init__(self, sample_stride: int = 4, window_size: int = WINDOW_SIZE):
+        self.sample_stride = max(sample_stride, 1)
+        self.block = window_size // 2
+        self.counts = np.zeros(256, dtype=np.int64)
+        self.sampled = False
+        self.windowed = None
+        self.carry = np.empty(0, dtype=np.uint8)
+        self.previous = None
+        self.position = 0
+        self.max_window = 0.0
+        self.regions: List[List] = []
+
+    def update(self, view: memoryview):
+        data = np.frombuffer(view, dtype=np.uint8)
+        if self.windowed is None:
+            self.windowed = bytes(view[:4]).startswith(EXECUTABLE_MAGIC)
+
+        stride = self.sample_stride if len(data) >= SAMPLE_MIN_CHUNK else 1
+        self.sampled |= stride > 1
+        self.counts += byte_histogram(data, stride)
+        if self.windowed:
+            self._windows(data)
+
+    def _windows(self, data: np.ndarray):
+        if len(self.carry):
+            data = np.concatenate((self.carry, data))
+        count = len(data) // self.block
+        if count:
+            blocks = data[:count * self.block].reshape(count, self.block).astype(np.int32)
+            blocks += (np.arange(count, dtype=np.int32) * 256)[:, None]
+            histograms = np.bincount(blocks.ravel(), minlength=count * 256).reshape(count, 256)
+
+            start = self.position
+            if self.previous is not None:
+                histograms = np.vstack((self.previous[None], histograms))
+                start -= self.block
+            if len(histograms) > 1:
+                entropies = row_entropy(histograms[:-1] + histograms[1:])
+                self.max_window = max(self.max_window, float(entropies.max()))
+                for index in np.flatnonzero(entropies >= PACKED_THRESHOLD):
+                    self._add_region(start + int(index) * self.block, float(entropies[index]))
+            self.previous = histograms[-1]
+            self.position += count * self.block
+        self.carry = data[count * self.block:].copy()
+
+    def _add_region(self, offset: int, entropy: float):
+        end = offset + 2 * self.block
+        if self.regions and offset <= self.regions[-1][1]:
+            region = self.regions[-1]
+            region[1] = end
+            region[2] = max(region[2], entropy)
+        elif len(self.regions) < MAX_REGIONS:
+            self.regions.append([offset, end, entropy])
+
+    def finish(self) -> Dict:
+        return {"entropy": {
+            "entropy": round(shannon_entropy(self.counts), 4),
+            "sampled": self.sampled,
+            "max_window_entropy": round(self.max_window, 4) if self.windowed else None,
+            "high_entropy_regions": [
+                {"offset": start, "length": end - start, "entropy": round(entropy, 4)}
+                for start, end, entropy in self.regions
+            ],
+        }}
+
+
+def entropy_reasons(entropy: Dict, file_size: int, expected_high: bool) -> List[str]:
+    """Suspicion reasons for FileTypeAnalysis from an EntropyConsumer result."""
+    reasons = []
+    value = entropy.get("entropy") or 0.0
+    if not expected_high and file_size >= MIN_ENTROPY_SIZE and value >= ENCRYPTED_THRESHOLD:
+        reasons.append(f"Entropy {value:.2f} bits/byte: content looks encrypted or compressed")
+    for region in entropy.get("high_entropy_regions") or []:
+        if region["offset"] == 0 and region["length"] >= file_size - WINDOW_SIZE // 2:
+            reasons.append(f"Executable is high-entropy throughout ({region['entropy']:.2f} bits/byte): likely packed")
+            break
+        reasons.append(
+            f"High-entropy region at offset {region['offset']:#x} ({region['length']} bytes, "
+            f"{region['entropy']:.2f} bits/byte): possibly packed or encrypted code"
+        )
+    return reasons
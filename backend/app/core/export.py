@@ -0,0 +1,185 @@
+# app/core/export.py
+import sqlite3
+import logging
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .mft import TIME_FIELDS
+
+
+logger = logging.getLogger("api.export")
+
+# (column, sqlite type, arrow type name)
+COLUMNS = [
+    ("path", "TEXT", "string"),
+    ("size", "INTEGER", "int64"),
+    ("created", "TEXT", "string"),
+    ("modified", "TEXT", "string"),
+    ("accessed", "TEXT", "string"),
+    ("type", "TEXT", "string"),
+    ("flags", "TEXT", "string"),
+    ("file_id", "INTEGER", "int64"),
+    ("permissions", "TEXT", "string"),
+    ("uid", "INTEGER", "int64"),
+    ("gid", "INTEGER", "int64"),
+    ("recoverable", "INTEGER", "bool_"),
+    ("attributes", "TEXT", "string"),
+    ("si_crtime", "INTEGER", "int64"),
+    ("si_mtime", "INTEGER", "int64"),
+    ("si_ctime", "INTEGER", "int64"),
+    ("si_atime", "INTEGER", "int64"),
+    ("fn_crtime", "INTEGER", "int64"),
+    ("fn_mtime", "INTEGER", "int64"),
+    ("fn_ctime", "INTEGER", "int64"),
+    ("fn_atime", "INTEGER", "int64"),
+    ("timestamp_anomalies", "TEXT", "string"),
+    ("md5", "TEXT", "string"),
+    ("sha256", "TEXT", "string"),
+    ("ssdeep", "TEXT", "string"),
+    ("tlsh", "TEXT", "string"),
+    ("known_file", "TEXT", "string"),
+    ("declared_extension", "TEXT", "string"),
+    ("detected_extension", "TEXT", "string"),
+    ("mime_type", "TEXT", "string"),
+    ("is_suspicious", "INTEGER", "bool_"),
+    ("suspicion_reasons", "TEXT", "string"),
+    ("entropy", "REAL", "float64"),
+    ("is_hidden", "INTEGER", "bool_"),
+    ("hidden_type", "TEXT", "string"),
+    ("hidden_reasons", "TEXT", "string"),
+    ("virus_status_code", "INTEGER", "int64"),
+    ("virus_message", "TEXT", "string"),
+    ("virus_malicious", "INTEGER", "int64"),
+    ("yara_matches", "TEXT", "string"),
+    ("triage", "TEXT", "string"),
+]
+COLUMN_NAMES = [name for name, _, _ in COLUMNS]
+INDEXED_COLUMNS = ("path", "md5", "sha256", "known_file", "timestamp_anomalies", "is_suspicious", "is_hidden", "virus_malicious")
+FORMATS = ("parquet", "arrow", "sqlite")
+
+
+def flatten_record(path: str, metadata: Dict) -> Dict:
+    """One flat row per file, the nested hash/type/hidden/virus dicts spread into columns."""
+    hashes = metadata.get("hashes") or {}
+    file_type = metadata.get("file_type") or {}
+    detected = file_type.get("detected_type") or {}
+    analysis = file_type.get("analysis") or {}
+    hidden = metadata.get("hidden_status") or {}
+    virus = hashes.get("virus_scan") or {}
+    stats = (virus.get("data") or {}).get("last_analysis_stats") or {}
+    times = metadata.get("timestamps") or {}
+    triage = metadata.get("triage")
+    return {
+        "path": path,
+        "size": metadata.get("size"),
+        "created": metadata.get("created"),
+        "modified": metadata.get("modified"),
+        "accessed": metadata.get("accessed"),
+        "type": metadata.get("type"),
+        "flags": metadata.get("flags"),
+        "file_id": metadata.get("file_id"),
+        "permissions": metadata.get("permissions"),
+        "uid": metadata.get("uid"),
+        "gid": metadata.get("gid"),
+        "recoverable": metadata.get("recoverable"),
+        "attributes": ", ".join(metadata.get("attributes") or []) or None,
+        **{field: times.get(field) for field in TIME_FIELDS},
+        "timestamp_anomalies": ", ".join(metadata.get("timestamp_anomalies") or []) or None,
+        "md5": hashes.get("md5"),
+        "sha256": hashes.get("sha256"),
+        "ssdeep": hashes.get("ssdeep"),
+        "tlsh": hashes.get("tlsh"),
+        "known_file": (hashes.get("known_file") or {}).get("status"),
+        "declared_extension": file_type.get("declared_extension"),
+        "detected_extension": detected.get("extension"),
+        "mime_type": detected.get("mime_type"),
+        "is_suspicious": analysis.get("is_suspicious"),
+        "suspicion_reasons": "; ".join(analysis.get("reasons") or []) or None,
+        "entropy": analysis.get("entropy"),
+        "is_hidden": hidden.get("is_hidden"),
+        "hidden_type": hidden.get("hidden_type"),
+        "hidden_reasons": "; ".join(hidden.get("reasons") or []) or None,
+        "virus_status_code": virus.get("status_code"),
+        "virus_message": virus.get("message"),
+        "virus_malicious": stats.get("malicious"),
+        "yara_matches": ", ".join(match["rule"] for match in hashes.get("yara") or []) or None,
+        "triage": f"{triage['action']}: {triage['reason']}" if triage else None,
+    }
+
+
+def batched(entries: Iterable[Tuple[str, Dict]], batch_size: int) -> Iterator[List[Dict]]:
+    iterator = iter(entries)
+    while True:
+        batch = [flatten_record(path, metadata) for path, metadata in islice(iterator, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+
+class SQLiteExporter:
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("DROP TABLE IF EXISTS files")
+        self.conn.execute(f"CREATE TABLE files ({', '.join(f'{name} {kind}' for name, kind, _ in COLUMNS)})")
+        self.insert = f"INSERT INTO files VALUES ({', '.join('?' * len(COLUMNS))})"
+
+    def write_batch(self, rows: List[Dict]):
+        with self.conn:
+            self.conn.executemany(self.insert, [tuple(row[name] for name in COLUMN_NAMES) for row in rows])
+
+    def close(self):
+        # Indexes are built once at the end, much cheaper than maintaining them per insert
+        with self.conn:
+            for name in INDEXED_COLUMNS:
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS files_{name} ON files ({name})")
+        self.conn.close()
+
+
+class ArrowExporter:
+    """Writes Parquet or Arrow IPC files one record batch at a time."""
+
+    def __init__(self, path: str, file_format: str = "parquet"):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("pyarrow is required for Parquet/Arrow export")
+
+        self.pa = pa
+        self.schema = pa.schema([(name, getattr(pa, kind)()) for name, _, kind in COLUMNS])
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            import pyarrow.ipc as ipc
+            self.sink = pa.OSFile(path, "wb")
+            self.writer = ipc.new_file(self.sink, self.schema)
+
+    def write_batch(self, rows: List[Dict]):
+        self.writer.write_batch(self.pa.RecordBatch.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        if hasattr(self, "sink"):
+            self.sink.close()
+
+
+def export_results(entries: Iterable[Tuple[str, Dict]], path: str, file_format: str = "parquet",
+                   batch_size: int = 10000) -> int:
+    """Stream (path, metadata) pairs into a Parquet, Arrow IPC or SQLite file, one batch in memory at a time."""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {file_format}")
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    exporter = SQLiteExporter(path) if file_format == "sqlite" else ArrowExporter(path, file_format)
+    written = 0
+    try:
+        for rows in batched(entries, batch_size):
+            exporter.write_batch(rows)
+            written += len(rows)
+    finally:
+        exporter.close()
+    logger.info(f"Exported {written} rows to {path} ({file_format})")
+    return written
@@ -1,28 +1,21 @@
 # backend/app/core/file_type_detector.py
 from pathlib import Path
-from typing import Dict
-from dataclasses import dataclass
-from mimetypes import guess_type
+from typing import Dict, Optional
+
+from .entropy import entropy_reasons
+from .signatures import FileSignature, SignatureConsumer, SignatureEngine, TAIL_LENGTH, load_engine
 
-@dataclass
-class FileSignature:
-    extension: str
-    mime_type: str
-    description: str
 
 class FileTypeDetector:
-    SIGNATURES = {
-        b'\x50\x4B\x03\x04': FileSignature('zip', 'application/zip', 'ZIP Archive'),
-        b'\x25\x50\x44\x46': FileSignature('pdf', 'application/pdf', 'PDF Document'),
-        b'\xFF\xD8\xFF': FileSignature('jpg', 'image/jpeg', 'JPEG Image'),
-        b'\x89\x50\x4E\x47': FileSignature('png', 'image/png', 'PNG Image'),
-        b'\x4D\x5A': FileSignature('exe', 'application/x-msdownload', 'Windows Executable'),
-        b'\x7F\x45\x4C\x46': FileSignature('elf', 'application/x-executable', 'Linux Executable'),
-        b'\x52\x61\x72\x21': FileSignature('rar', 'application/x-rar-compressed', 'RAR Archive'),
-        b'\x47\x49\x46\x38': FileSignature('gif', 'image/gif', 'GIF Image')
-    }
+    def __init__(self, engine: Optional[SignatureEngine] = None):
+        # Rules live in signatures.json (or SIGNATURE_RULES), compiled once per process
+        self.engine = engine or load_engine()
+
+    def content_consumer(self) -> SignatureConsumer:
+        """Factory for the content read pass, so the type is identified without reopening the file."""
+        return SignatureConsumer(self.engine)
 
-    def analyze_file(self, file_path: str) -> Dict:
+    def analyze_file(self, file_path: str, opener=None) -> Dict:
         path = Path(file_path)
         
         # Default response structure that matches schema
@@ -41,36 +34,16 @@ class FileTypeDetector:
         }
 
         try:
-            with open(path, 'rb') as f:
-                header = f.read(8)
-                file_size = path.stat().st_size
-
-            declared_ext = path.suffix.lower().lstrip('.')
-            if not declared_ext:
-                declared_ext = "unknown"
+            with (opener() if opener is not None else open(path, 'rb')) as f:
+                header = f.read(self.engine.header_length)
+                file_size = f.seek(0, 2)
+                tail = b""
+                if self.engine.needs_tail(header):
+                    f.seek(max(file_size - TAIL_LENGTH, 0))
+                    tail = f.read(TAIL_LENGTH)
 
-            # Find actual type from signature
-            actual_sig = None
-            for signature, file_type in self.SIGNATURES.items():
-                if header.startswith(signature):
-                    actual_sig = file_type
-                    break
-
-            suspicion_info = self._check_suspicion(header, file_size, declared_ext, actual_sig)
-
-            return {
-                "declared_extension": declared_ext,
-                "detected_type": {
-                    "extension": actual_sig.extension if actual_sig else "unknown",
-                    "mime_type": actual_sig.mime_type if actual_sig else "unknown",
-                    "description": actual_sig.description if actual_sig else "Unknown Format"
-                },
-                "analysis": {
-                    "is_suspicious": bool(suspicion_info["reasons"]),
-                    "confidence": suspicion_info["confidence"],
-                    "reasons": suspicion_info["reasons"]
-                }
-            }
+            return self.analyze_signature(file_path, header, file_size,
+                                          self.engine.identify(header, tail, file_size))
 
         except FileNotFoundError:
             default_response["analysis"]["reasons"].append("File not found")
@@ -82,8 +55,39 @@ class FileTypeDetector:
             default_response["analysis"]["reasons"].append(f"Error analyzing file: {str(e)}")
             return default_response
 
+    def analyze_header(self, file_path: str, header: bytes, file_size: int) -> Dict:
+        """Classify from bytes already read by the content pipeline, without reopening the file"""
+        return self.analyze_signature(file_path, header, file_size, self.engine.identify(header, b"", file_size))
+
+    def analyze_signature(self, file_path: str, header: bytes, file_size: int,
+                          actual_sig: Optional[FileSignature], entropy: Optional[Dict] = None) -> Dict:
+        """Build the file type result for a signature the engine already identified,
+        with the entropy measured during the same read when available"""
+        # An alternate data stream (file.txt:payload.exe) is declared by its stream name
+        path = Path(Path(file_path).name.rpartition(':')[2])
+        declared_ext = path.suffix.lower().lstrip('.')
+        if not declared_ext:
+            declared_ext = "unknown"
+
+        suspicion_info = self._check_suspicion(header, file_size, declared_ext, actual_sig, entropy)
+
+        return {
+            "declared_extension": declared_ext,
+            "detected_type": {
+                "extension": actual_sig.extension if actual_sig else "unknown",
+                "mime_type": actual_sig.mime_type if actual_sig else "unknown",
+                "description": actual_sig.description if actual_sig else "Unknown Format"
+            },
+            "analysis": {
+                "is_suspicious": bool(suspicion_info["reasons"]),
+                "confidence": suspicion_info["confidence"],
+                "reasons": suspicion_info["reasons"],
+                "entropy": entropy["entropy"] if entropy else None
+            }
+        }
+
     def _check_suspicion(self, header: bytes, file_size: int, 
-                        declared_ext: str, actual_sig: FileSignature) -> Dict:
+                        declared_ext: str, actual_sig: FileSignature, entropy: Optional[Dict] = None) -> Dict:
         reasons = []
         
         if not actual_sig:
@@ -95,9 +99,12 @@ class FileTypeDetector:
         if file_size < 100 and declared_ext in ['exe', 'dll']:
             reasons.append("Suspiciously small executable")
             
-        if actual_sig and declared_ext != actual_sig.extension:
+        if actual_sig and declared_ext not in actual_sig.extensions:
             reasons.append(f"Extension mismatch: claims {declared_ext} but detected {actual_sig.extension}")
 
+        if entropy:
+            reasons.extend(entropy_reasons(entropy, file_size, bool(actual_sig and actual_sig.compressed)))
+
         return {
             "is_suspicious": bool(reasons),
             "confidence": "high" if actual_sig else "low",
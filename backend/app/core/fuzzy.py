@@ -0,0 +1,244 @@
+# app/core/fuzzy.py
+import os
+import re
+import time
+import sqlite3
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .content import ContentConsumer
+
+try:
+    import ssdeep
+except ImportError:
+    ssdeep = None
+
+try:
+    import tlsh
+except ImportError:
+    tlsh = None
+
+
+logger = logging.getLogger("api.fuzzy")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id TEXT PRIMARY KEY,
+    drive TEXT,
+    started REAL
+);
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT UNIQUE NOT NULL,
+    ssdeep TEXT,
+    tlsh TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    scan TEXT NOT NULL,
+    path TEXT NOT NULL,
+    content INTEGER NOT NULL,
+    PRIMARY KEY (scan, path)
+);
+CREATE INDEX IF NOT EXISTS files_content ON files (content);
+CREATE TABLE IF NOT EXISTS ssdeep_grams (
+    block_size INTEGER NOT NULL,
+    gram TEXT NOT NULL,
+    content INTEGER NOT NULL,
+    PRIMARY KEY (block_size, gram, content)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tlsh_bands (
+    band INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    content INTEGER NOT NULL,
+    PRIMARY KEY (band, value, content)
+) WITHOUT ROWID;
+"""
+
+# ssdeep scores two digests 0 unless their signatures at a common block size share a
+# 7-character substring, so indexing every 7-gram finds all candidates with a score
+SSDEEP_GRAM = 7
+# TLSH bodies are 128 two-bit bucket codes; each band of 8 buckets is a 4-hex-digit key
+TLSH_BODY = slice(8, 72)
+TLSH_BAND = 4
+SSDEEP_MIN_SCORE = 40
+TLSH_MAX_DISTANCE = 100
+REPEATS = re.compile(r"(.)\1{3,}")
+
+
+def fuzzy_available() -> List[str]:
+    return [name for name, module in (("ssdeep", ssdeep), ("tlsh", tlsh)) if module is not None]
+
+
+class FuzzyHashConsumer(ContentConsumer):
+    """ssdeep and TLSH digests from the shared read pass, for whichever library is installed."""
+
+    name = "fuzzy"
+
+    def __init__(self):
+        self.ssdeep = ssdeep.Hash() if ssdeep else None
+        self.tlsh = tlsh.Tlsh() if tlsh else None
+
+    def update(self, view: memoryview):
+        # Both bindings only take bytes
+        data = bytes(view)
+        if self.ssdeep:
+            self.ssdeep.update(data)
+        if self.tlsh:
+            self.tlsh.update(data)
+
+    def finish(self) -> Dict:
+        digests = {"ssdeep": self.ssdeep.digest() if self.ssdeep else None, "tlsh": None}
+        if self.tlsh:
+            try:
+                self.tlsh.final()
+                digest = self.tlsh.hexdigest()
+                digests["tlsh"] = digest if digest and digest != "TNULL" else None
+            except ValueError:
+                # Under 50 bytes, or too little variation for a digest
+                pass
+        return {"fuzzy": digests}
+
+
+def ssdeep_grams(digest: str) -> Set[Tuple[int, str]]:
+    """(block size, 7-gram) keys of both signatures of an ssdeep digest, with runs of more
+    than three identical characters collapsed the way ssdeep compares them."""
+    block_size, first, second = digest.split(":", 2)
+    block_size = int(block_size)
+    grams = set()
+    for size, signature in ((block_size, first), (block_size * 2, second.split(",", 1)[0])):
+        signature = REPEATS.sub(lambda m: m.group(1) * 3, signature)
+        for i in range(len(signature) - SSDEEP_GRAM + 1):
+            grams.add((size, signature[i:i + SSDEEP_GRAM]))
+    return grams
+
+
+def tlsh_bands(digest: str) -> List[Tuple[int, str]]:
+    body = digest[TLSH_BODY]
+    return [(i, body[i * TLSH_BAND:(i + 1) * TLSH_BAND]) for i in range(len(body) // TLSH_BAND)]
+
+
+class SimilarityIndex:
+    """Fuzzy digests of every scanned file, indexed so "files similar to X" only scores a
+    few candidates instead of comparing against every stored digest.
+
+    ssdeep candidates come from shared 7-grams at the same effective block size, which
+    misses nothing ssdeep would score. TLSH candidates share at least one band of 8
+    bucket codes: near-identical files almost always do, files around the distance
+    threshold usually do. Contents are stored once per sha256 and linked to every
+    (scan, path) they were seen at, so the index spans scans.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SIMILARITY_DB", "similarity.db")
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def add_scan(self, scan_id: str, drive: str):
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO scans (id, drive, started) VALUES (?, ?, ?)",
+                              (scan_id, drive, time.time()))
+
+    def _index(self, content: int, ssdeep_digest: Optional[str], tlsh_digest: Optional[str]):
+        if ssdeep_digest:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO ssdeep_grams (block_size, gram, content) VALUES (?, ?, ?)",
+                [(size, gram, content) for size, gram in ssdeep_grams(ssdeep_digest)]
+            )
+        if tlsh_digest:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tlsh_bands (band, value, content) VALUES (?, ?, ?)",
+                [(band, value, content) for band, value in tlsh_bands(tlsh_digest)]
+            )
+
+    def add(self, scan_id: str, entries: Iterable[Tuple[str, str, Optional[str], Optional[str]]]) -> int:
+        """Index (path, sha256, ssdeep, tlsh) entries of a scan, one transaction per call. A
+        content stored without one of the digests (too small for TLSH, or indexed by a host
+        missing a library) gets it filled in when a later entry brings it."""
+        count = 0
+        with self.conn:
+            for path, sha256, ssdeep_digest, tlsh_digest in entries:
+                row = self.conn.execute("SELECT id, ssdeep, tlsh FROM contents WHERE sha256 = ?",
+                                        (sha256,)).fetchone()
+                if row is None:
+                    content = self.conn.execute(
+                        "INSERT INTO contents (sha256, ssdeep, tlsh) VALUES (?, ?, ?)",
+                        (sha256, ssdeep_digest, tlsh_digest)
+                    ).lastrowid
+                else:
+                    content, stored_ssdeep, stored_tlsh = row
+                    ssdeep_digest = ssdeep_digest if not stored_ssdeep else None
+                    tlsh_digest = tlsh_digest if not stored_tlsh else None
+                    if ssdeep_digest or tlsh_digest:
+                        self.conn.execute(
+                            "UPDATE contents SET ssdeep = COALESCE(ssdeep, ?), tlsh = COALESCE(tlsh, ?) WHERE id = ?",
+                            (ssdeep_digest, tlsh_digest, content)
+                        )
+                self._index(content, ssdeep_digest, tlsh_digest)
+                self.conn.execute("INSERT OR REPLACE INTO files (scan, path, content) VALUES (?, ?, ?)",
+                                  (scan_id, path, content))
+                count += 1
+        return count
+
+    def digests(self, sha256: str) -> Optional[Tuple[int, Optional[str], Optional[str]]]:
+        return self.conn.execute("SELECT id, ssdeep, tlsh FROM contents WHERE sha256 = ?", (sha256,)).fetchone()
+
+    def _candidates(self, ssdeep_digest: Optional[str], tlsh_digest: Optional[str]) -> Dict[int, Tuple]:
+        ids = set()
+        if ssdeep_digest:
+            for size, gram in ssdeep_grams(ssdeep_digest):
+                ids.update(row[0] for row in self.conn.execute(
+                    "SELECT content FROM ssdeep_grams WHERE block_size = ? AND gram = ?", (size, gram)))
+        if tlsh_digest:
+            for band, value in tlsh_bands(tlsh_digest):
+                ids.update(row[0] for row in self.conn.execute(
+                    "SELECT content FROM tlsh_bands WHERE band = ? AND value = ?", (band, value)))
+        rows = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows.update((row[0], row[1:]) for row in self.conn.execute(
+                f"SELECT id, sha256, ssdeep, tlsh FROM contents WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return rows
+
+    def similar(self, sha256: Optional[str] = None, ssdeep_digest: Optional[str] = None,
+                tlsh_digest: Optional[str] = None, scan_id: Optional[str] = None,
+                min_score: int = SSDEEP_MIN_SCORE, max_distance: int = TLSH_MAX_DISTANCE,
+                limit: int = 50) -> List[Dict]:
+        """Contents similar to a stored sha256 or to the given digests, best first, each with
+        the (scan, path) occurrences, restricted to one scan when scan_id is given."""
+        own = None
+        if sha256:
+            stored = self.digests(sha256)
+            if stored is None:
+                return []
+            own, ssdeep_digest, tlsh_digest = stored
+
+        matches = []
+        for content, (other_sha256, other_ssdeep, other_tlsh) in self._candidates(ssdeep_digest, tlsh_digest).items():
+            if content == own:
+                continue
+            score = ssdeep.compare(ssdeep_digest, other_ssdeep) if ssdeep and ssdeep_digest and other_ssdeep else None
+            distance = tlsh.diff(tlsh_digest, other_tlsh) if tlsh and tlsh_digest and other_tlsh else None
+            if (score is not None and score >= min_score) or (distance is not None and distance <= max_distance):
+                matches.append({"content": content, "sha256": other_sha256, "ssdeep_score": score,
+                                "tlsh_distance": distance})
+
+        # Strongest evidence first: ssdeep score, then closest TLSH distance
+        matches.sort(key=lambda m: (-(m["ssdeep_score"] or 0), m["tlsh_distance"] if m["tlsh_distance"] is not None else 1 << 20))
+        results = []
+        for match in matches:
+            query = "SELECT scan, path FROM files WHERE content = ?"
+            params = [match.pop("content")]
+            if scan_id:
+                query += " AND scan = ?"
+                params.append(scan_id)
+            files = [{"scan_id": scan, "path": path} for scan, path in self.conn.execute(query, params)]
+            if files:
+                results.append({**match, "files": files})
+                if len(results) >= limit:
+                    break
+        return results
+
+    def close(self):
+        self.conn.close()
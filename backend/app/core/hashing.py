@@ -0,0 +1,212 @@
+# app/core/hashing.py
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional
+
+from .content import ContentReader, DEFAULT_CONSUMERS
+
+
+logger = logging.getLogger("api.hashing")
+
+# Dedup mode probes the first and last PARTIAL_BLOCK of files larger than two blocks
+PARTIAL_BLOCK = 64 * 1024
+
+
+class ByteBudget:
+    """Blocks submitters until enough in-flight bytes have been released by finished jobs."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount: int):
+        amount = min(amount, self.limit)
+        with self.condition:
+            while self.in_flight and self.in_flight + amount > self.limit:
+                self.condition.wait()
+            self.in_flight += amount
+        return amount
+
+    def release(self, amount: int):
+        with self.condition:
+            self.in_flight -= amount
+            self.condition.notify_all()
+
+
+class HashJob:
+    def __init__(self, key: str, path: str, size: int, opener: Optional[Callable] = None,
+                 physical_offset: Optional[int] = None, content_key: Optional[Hashable] = None,
+                 partial: bool = False):
+        self.key = key
+        self.path = path
+        self.size = size or 0
+        self.opener = opener
+        self.physical_offset = physical_offset
+        # Jobs with the same content key (hard links of one MFT record) read the same bytes
+        self.content_key = content_key
+        # Only the first and last PARTIAL_BLOCK are read, as decided by a triage policy
+        self.partial = partial
+
+
+class HashPipeline:
+    """Reads many files concurrently, feeding each one once through the content consumers
+    (MD5/SHA-256, header sniffing, ...) while keeping buffered bytes bounded.
+
+    hashlib releases the GIL on large updates, so a thread pool gets real parallelism
+    and can share the already opened pytsk3 handles, which a process pool could not.
+    """
+
+    def __init__(self, workers: int = 4, max_in_flight: int = 256 * 1024 * 1024,
+                 chunk_size: int = 4 * 1024 * 1024, consumers: Optional[List[Callable]] = None,
+                 dedup: bool = False, needs_full: Optional[Callable[[Dict], bool]] = None):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        # Every consumer sees the same single read of each file
+        self.consumers = list(consumers or DEFAULT_CONSUMERS)
+        self.reader = ContentReader(chunk_size)
+        self.budget = ByteBudget(max_in_flight)
+        self.stats = {"files": 0, "errors": 0, "bytes": 0, "seconds": 0.0, "mb_per_second": 0.0}
+        self.stats_lock = threading.Lock()
+
+        self.dedup = dedup
+        # Decides from a partial read whether a file without a twin still needs its full hash;
+        # called with None, whether every file does whatever its content
+        self.needs_full = needs_full or (lambda partial: True)
+        if dedup:
+            self.stats["dedup"] = {"linked": 0, "probed": 0, "partial_only": 0, "duplicates": 0,
+                                   "probe_bytes": 0, "bytes_skipped": 0, "bytes_saved": 0}
+
+    @staticmethod
+    def order_jobs(jobs: List[HashJob]) -> List[HashJob]:
+        # Files with a known physical location are read in disk order, resident and
+        # unknown files go last since they cost no seeks on the data area
+        return sorted(jobs, key=lambda job: (job.physical_offset is None, job.physical_offset or 0))
+
+    def _run(self, job: HashJob, reserved: int) -> Dict:
+        try:
+            consumers = [factory() for factory in self.consumers]
+            result = self.reader.read(job.path, consumers, opener=job.opener)
+            with self.stats_lock:
+                self.stats["files"] += 1
+                self.stats["bytes"] += result["bytes_read"]
+            return result
+        except Exception as e:
+            logger.error(f"Content read failed for {job.path}: {e}")
+            with self.stats_lock:
+                self.stats["errors"] += 1
+            return {"error": str(e)}
+        finally:
+            self.budget.release(reserved)
+
+    def _probe(self, job: HashJob, reserved: int) -> Dict:
+        try:
+            consumers = [factory() for factory in self.consumers]
+            return self.reader.read_partial(job.path, consumers, job.size, PARTIAL_BLOCK, opener=job.opener)
+        except Exception as e:
+            logger.error(f"Partial read failed for {job.path}: {e}")
+            return {"error": str(e)}
+        finally:
+            self.budget.release(reserved)
+
+    def _read_all(self, jobs: List[HashJob], run: Callable, limit: int) -> Dict[str, Dict]:
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash") as executor:
+            for job in self.order_jobs(jobs):
+                # Each worker holds at most one chunk, so reserve what it will actually buffer
+                reserved = self.budget.acquire(max(min(job.size, limit), 1))
+                futures[job.key] = executor.submit(run, job, reserved)
+        return {key: future.result() for key, future in futures.items()}
+
+    def _hash_dedup(self, jobs: List[HashJob]) -> Dict[str, Dict]:
+        """Size, then partial hash, then full hash, like a duplicate finder.
+
+        Only files larger than two blocks whose size occurs more than once in the batch
+        can have a twin that a probe would reveal; a twin pair is fully hashed. Other
+        large files are probed instead of read, and only read in full when needs_full()
+        says a lookup still wants their hash. When needs_full(None) says every file needs
+        its hash, nothing is probed: the full hashes find the duplicates on their own. Hard
+        links are read once and share the result.
+        """
+        stats = self.stats["dedup"]
+        unique: Dict[Hashable, HashJob] = {}
+        links: Dict[str, HashJob] = {}
+        for job in jobs:
+            if job.content_key is not None and job.content_key in unique:
+                links[job.key] = unique[job.content_key]
+            else:
+                unique[job.content_key if job.content_key is not None else ("job", job.key)] = job
+
+        full, probe = [], []
+        if self.needs_full(None):
+            full = list(unique.values())
+        else:
+            for job in unique.values():
+                (probe if job.size > 2 * PARTIAL_BLOCK else full).append(job)
+
+        results = {}
+        probes = self._read_all(probe, self._probe, 2 * PARTIAL_BLOCK)
+        sizes = Counter(job.size for job in probe)
+        groups = Counter((job.size, probes[job.key].get("partial_hash")) for job in probe if sizes[job.size] > 1)
+        for job in probe:
+            partial = probes[job.key]
+            stats["probed"] += 1
+            if "error" in partial or groups[(job.size, partial["partial_hash"])] > 1 or self.needs_full(partial):
+                full.append(job)
+                stats["probe_bytes"] += partial.get("bytes_read", 0)
+                continue
+            results[job.key] = self._partial_result(partial)
+            stats["partial_only"] += 1
+            stats["bytes_skipped"] += job.size - partial["bytes_read"]
+
+        results.update(self._read_all(full, self._run, self.chunk_size))
+
+        for key, job in links.items():
+            result = results[job.key]
+            results[key] = {**result, "hashes": dict(result["hashes"])} if "hashes" in result else result
+            stats["linked"] += 1
+            stats["bytes_skipped"] += job.size
+
+        contents = Counter(r["hashes"]["sha256"] for key, r in results.items()
+                           if key not in links and r.get("hashes", {}).get("sha256"))
+        stats["duplicates"] += sum(count - 1 for count in contents.values())
+        stats["bytes_saved"] = stats["bytes_skipped"] - stats["probe_bytes"]
+        return results
+
+    def _partial_result(self, partial: Dict) -> Dict:
+        """A probe result standing in for a full read: no content hashes, only the partial one."""
+        partial["hashes"] = {"md5": None, "sha256": None, "partial_hash": partial.pop("partial_hash")}
+        with self.stats_lock:
+            self.stats["files"] += 1
+            self.stats["bytes"] += partial["bytes_read"]
+        return partial
+
+    def hash_files(self, jobs: List[HashJob]) -> Dict[str, Dict]:
+        started = time.perf_counter()
+        partial_jobs = [job for job in jobs if job.partial]
+        jobs = [job for job in jobs if not job.partial]
+        if self.dedup:
+            results = self._hash_dedup(jobs)
+        else:
+            results = self._read_all(jobs, self._run, self.chunk_size)
+        for key, partial in self._read_all(partial_jobs, self._probe, 2 * PARTIAL_BLOCK).items():
+            if "error" in partial:
+                with self.stats_lock:
+                    self.stats["errors"] += 1
+                results[key] = partial
+            else:
+                results[key] = self._partial_result(partial)
+
+        # Stats accumulate over successive batches of the same scan
+        elapsed = time.perf_counter() - started
+        self.stats["seconds"] = round(self.stats["seconds"] + elapsed, 3)
+        self.stats["mb_per_second"] = round(self.stats["bytes"] / (1024 * 1024) / max(self.stats["seconds"], 1e-9), 2)
+        self.stats["workers"] = self.workers
+        logger.info(
+            f"Hashed {len(results)} files in {elapsed:.2f}s "
+            f"- {self.stats['mb_per_second']} MB/s overall with {self.workers} workers"
+        )
+        return results
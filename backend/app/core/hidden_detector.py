@@ -5,17 +5,49 @@ from pathlib import Path
 from typing import Dict
 
 class HiddenDetector:
+    """Classifies hidden files from their DOS attribute flags and name.
+
+    The flags normally come from $STANDARD_INFORMATION, decoded during the MFT pass, so
+    classification needs no per-file call and works on images on any platform.
+    """
+
     def __init__(self):
         self.FILE_ATTRIBUTE_HIDDEN = 0x2
         self.FILE_ATTRIBUTE_SYSTEM = 0x4
-        
+
+    def analyze_attributes(self, file_path: str, attrs: int) -> Dict:
+        reasons = []
+        hidden_type = "none"
+
+        # Check Windows hidden attribute
+        if attrs & self.FILE_ATTRIBUTE_HIDDEN:
+            reasons.append("Windows hidden attribute set")
+            hidden_type = "windows_hidden"
+
+        # Check Windows system attribute
+        if attrs & self.FILE_ATTRIBUTE_SYSTEM:
+            reasons.append("Windows system attribute set")
+            hidden_type = "windows_system"
+
+        # Check if name starts with dot (Unix-style hidden)
+        if file_path.rpartition('/')[2].startswith('.'):
+            reasons.append("Filename starts with dot")
+            hidden_type = "unix_hidden"
+
+        return {
+            "is_hidden": bool(reasons),
+            "hidden_type": hidden_type,
+            "reasons": reasons
+        }
+
     def analyze_file(self, file_path: str) -> Dict:
+        """Fallback for live files whose $STANDARD_INFORMATION couldn't be read (Windows only)."""
         try:
             path = Path(file_path)
-            
+
             # Get Windows file attributes
             attrs = ctypes.windll.kernel32.GetFileAttributesW(str(path))
-            
+
             if attrs == -1:  # Invalid handle
                 return {
                     "is_hidden": False,
@@ -23,33 +55,19 @@ class HiddenDetector:
                     "reasons": ["Unable to get file attributes"]
                 }
 
-            reasons = []
-            hidden_type = "none"
-
-            # Check Windows hidden attribute
-            if attrs & self.FILE_ATTRIBUTE_HIDDEN:
-                reasons.append("Windows hidden attribute set")
-                hidden_type = "windows_hidden"
-
-            # Check Windows system attribute
-            if attrs & self.FILE_ATTRIBUTE_SYSTEM:
-                reasons.append("Windows system attribute set")
-                hidden_type = "windows_system"
-
-            # Check if name starts with dot (Unix-style hidden)
-            if path.name.startswith('.'):
-                reasons.append("Filename starts with dot")
-                hidden_type = "unix_hidden"
-
-            return {
-                "is_hidden": bool(reasons),
-                "hidden_type": hidden_type,
-                "reasons": reasons
-            }
+            return self.analyze_attributes(path.as_posix(), attrs)
 
         except Exception as e:
             return {
                 "is_hidden": False,
                 "hidden_type": "none",
                 "reasons": [f"Error analyzing file: {str(e)}"]
-            }
\ No newline at end of file
+            }
+
+    def analyze_stream(self, stream_path: str) -> Dict:
+        # Alternate data streams never show up in a directory listing
+        return {
+            "is_hidden": True,
+            "hidden_type": "alternate_data_stream",
+            "reasons": [f"Alternate data stream {stream_path.rpartition(':')[2]} of {stream_path.rpartition(':')[0]}"]
+        }
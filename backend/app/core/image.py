@@ -0,0 +1,210 @@
+# app/core/image.py
+import io
+import os
+import re
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytsk3
+
+
+logger = logging.getLogger("api.image")
+
+DRIVE_LETTER = re.compile(r"^[A-Za-z]:\\?$")
+# image.001 / image.002 ..., image.aa / image.ab ..., image.dd.000 ...
+SEGMENT_SUFFIXES = [
+    (re.compile(r"^(.*\.)(\d{3})$"), lambda i: f"{i:03d}"),
+    (re.compile(r"^(.*\.)([a-z]{2})$"), lambda i: chr(97 + i // 26) + chr(97 + i % 26)),
+]
+
+
+def is_drive_letter(source: str) -> bool:
+    return bool(DRIVE_LETTER.match(source))
+
+
+def raw_device_path(drive_path: str) -> str:
+    drive = drive_path.rstrip('\\')
+    return f"\\\\.\\{drive}"
+
+
+def find_segments(image_path: str) -> List[str]:
+    """Return every segment of a split raw image, or just the path for a single file."""
+    path = Path(image_path)
+    for pattern, suffix in SEGMENT_SUFFIXES:
+        match = pattern.match(path.name)
+        if not match:
+            continue
+        prefix, first = match.groups()
+        start = int(first) if first.isdigit() else 0
+        segments = []
+        index = start
+        while True:
+            candidate = path.with_name(f"{prefix}{suffix(index)}")
+            if not candidate.exists():
+                break
+            segments.append(str(candidate))
+            index += 1
+        if len(segments) > 1 and segments[0] == str(path):
+            return segments
+    return [str(path)]
+
+
+class SplitImgInfo(pytsk3.Img_Info):
+    """Presents a set of raw image segments to pytsk3 as one contiguous image."""
+
+    def __init__(self, segments: List[str]):
+        self.segments = segments
+        self.handles = [open(segment, "rb") for segment in segments]
+        self.starts = []
+        total = 0
+        for segment in segments:
+            self.starts.append(total)
+            total += os.path.getsize(segment)
+        self.size = total
+        super().__init__(url="", type=pytsk3.TSK_IMG_TYPE_EXTERNAL)
+
+    def close(self):
+        for handle in self.handles:
+            handle.close()
+
+    def read(self, offset, size):
+        chunks = []
+        index = 0
+        while index + 1 < len(self.starts) and self.starts[index + 1] <= offset:
+            index += 1
+        while size > 0 and index < len(self.handles):
+            handle = self.handles[index]
+            handle.seek(offset - self.starts[index])
+            data = handle.read(size)
+            if not data:
+                index += 1
+                continue
+            chunks.append(data)
+            offset += len(data)
+            size -= len(data)
+            index += 1
+        return b"".join(chunks)
+
+    def get_size(self):
+        return self.size
+
+
+def open_image(source: str) -> pytsk3.Img_Info:
+    if is_drive_letter(source):
+        return pytsk3.Img_Info(raw_device_path(source))
+    segments = find_segments(source)
+    if len(segments) > 1:
+        logger.info(f"Opening split image with {len(segments)} segments: {source}")
+        return SplitImgInfo(segments)
+    return pytsk3.Img_Info(source)
+
+
+def find_ntfs_volumes(img: pytsk3.Img_Info) -> List[Dict]:
+    """Locate every NTFS file system in the image, falling back to a bare volume at offset 0."""
+    volumes = []
+    try:
+        volume_info = pytsk3.Volume_Info(img)
+    except IOError:
+        volume_info = None
+
+    if volume_info is not None:
+        block_size = volume_info.info.block_size
+        for part in volume_info:
+            if not part.flags & pytsk3.TSK_VS_PART_FLAG_ALLOC or part.len == 0:
+                continue
+            offset = part.start * block_size
+            try:
+                fs = pytsk3.FS_Info(img, offset=offset)
+            except IOError:
+                continue
+            if fs.info.ftype != pytsk3.TSK_FS_TYPE_NTFS:
+                logger.info(f"Skipping non-NTFS partition {part.addr} at offset {offset}")
+                continue
+            volumes.append({
+                "offset": offset,
+                "fs": fs,
+                "description": part.desc.decode("utf-8", errors="replace"),
+                "prefix": f"/partition_{part.addr}",
+            })
+
+    if not volumes:
+        volumes.append({"offset": 0, "fs": pytsk3.FS_Info(img), "description": "volume", "prefix": ""})
+
+    # A single volume keeps the plain paths the frontend already expects
+    if len(volumes) == 1:
+        volumes[0]["prefix"] = ""
+    return volumes
+
+
+class TskFileObject(io.RawIOBase):
+    """Read-only file object over a pytsk3 File, so analyzers can stream content from an image."""
+
+    def __init__(self, tsk_file, attribute_id: Optional[int] = None, size: Optional[int] = None):
+        self.tsk_file = tsk_file
+        # Without an attribute id TSK reads the default $DATA stream
+        self.attribute = () if attribute_id is None else (pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA, attribute_id)
+        if size is None:
+            size = tsk_file.info.meta.size if tsk_file.info.meta else 0
+        self.size = size
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def readinto(self, buffer):
+        # One read_random per caller buffer, so a large buffer means few calls into TSK
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        data = self.tsk_file.read_random(self.position, length, *self.attribute)
+        count = len(data)
+        buffer[:count] = data
+        self.position += count
+        return count
+
+
+class EvidenceSource:
+    """An opened drive or image together with the NTFS volumes found on it."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.is_live = is_drive_letter(source)
+        self.img = open_image(source)
+        self.volumes = find_ntfs_volumes(self.img)
+        logger.info(f"Opened {source} with {len(self.volumes)} NTFS volume(s)")
+
+    def close(self):
+        """Drop the volume handles and close the image (or every segment of a split one)."""
+        self.volumes = []
+        self.img.close()
+
+    def open_fs(self, index: int) -> pytsk3.FS_Info:
+        """A separate image and FS handle on volume index, for a thread that mustn't share one."""
+        return pytsk3.FS_Info(open_image(self.source), offset=self.volumes[index]["offset"])
+
+    def open_file(self, metadata: Dict) -> TskFileObject:
+        """Open file content by MFT record number through the volume's shared FS_Info handle.
+        Alternate data streams are read from their own $DATA attribute by attribute id."""
+        fs = self.volumes[metadata.get("volume", 0)]["fs"]
+        tsk_file = fs.open_meta(inode=metadata["file_id"])
+        if metadata.get("attribute_id") is None:
+            return TskFileObject(tsk_file)
+        return TskFileObject(tsk_file, metadata["attribute_id"], metadata["size"])
+
+    def opener(self, metadata: Dict):
+        return lambda: self.open_file(metadata)
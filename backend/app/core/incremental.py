@@ -0,0 +1,230 @@
+# app/core/incremental.py
+import os
+import json
+import time
+import struct
+import sqlite3
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+
+logger = logging.getLogger("api.incremental")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS volumes (
+    serial TEXT PRIMARY KEY,
+    journal_id INTEGER,
+    next_usn INTEGER,
+    scanned_at REAL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    serial TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    sequence INTEGER,
+    size INTEGER,
+    mtime INTEGER,
+    hashes TEXT,
+    file_type TEXT,
+    PRIMARY KEY (serial, file_id)
+);
+"""
+
+USN_RECORD_HEADER = struct.Struct("<IHHQQQQIIIIHH")
+USN_MAX = struct.Struct("<QQQQ")
+JOURNAL_CHUNK = 1024 * 1024
+# Digests carried over to a rescan; fuzzy digests are only there when the last scan made them
+SNAPSHOT_HASHES = ("md5", "sha256", "ssdeep", "tlsh")
+
+
+def volume_serial(img, offset: int) -> str:
+    """NTFS volume serial number from the boot sector, used as the snapshot key."""
+    boot = img.read(offset, 512)
+    return f"{struct.unpack_from('<Q', boot, 0x48)[0]:016X}"
+
+
+def parse_usn_records(data: bytes, changed: Set[int]) -> int:
+    """Collect the MFT record numbers touched by USN_RECORD_V2/V3 entries, returns bytes consumed."""
+    offset = 0
+    while offset + USN_RECORD_HEADER.size <= len(data):
+        record_length, major = struct.unpack_from("<IH", data, offset)
+        if record_length == 0:
+            # Zero padding up to the next journal page
+            offset += 8
+            continue
+        if offset + record_length > len(data):
+            break
+        if major in (2, 3):
+            # V3 uses 128-bit file ids, the record number is still the low 48 bits
+            file_reference = struct.unpack_from("<Q", data, offset + 8)[0]
+            changed.add(file_reference & 0xFFFFFFFFFFFF)
+        offset += record_length
+    return offset
+
+
+def read_usn_changes(fs, journal_id: Optional[int], start_usn: Optional[int]) -> Tuple[Optional[int], Optional[int], Optional[Set[int]]]:
+    """Read $UsnJrnl:$J from start_usn onward.
+
+    Returns (journal id, next usn, changed record numbers). The change set is None when the
+    journal is missing, was recreated, or has wrapped past start_usn, in which case callers
+    fall back to comparing MFT sequence numbers, sizes and timestamps.
+    """
+    try:
+        journal = fs.open("/$Extend/$UsnJrnl")
+    except Exception:
+        return None, None, None
+
+    j_attr = max_attr = None
+    for attr in journal:
+        name = attr.info.name
+        if name == b"$J":
+            j_attr = attr
+        elif name == b"$Max":
+            max_attr = attr
+    if j_attr is None or max_attr is None:
+        return None, None, None
+
+    raw_max = journal.read_random(0, USN_MAX.size, max_attr.info.type, max_attr.info.id)
+    _, _, current_id, lowest_valid = USN_MAX.unpack_from(raw_max, 0)
+    next_usn = j_attr.info.size
+
+    if journal_id != current_id or start_usn is None or start_usn < lowest_valid or start_usn > next_usn:
+        return current_id, next_usn, None
+
+    changed: Set[int] = set()
+    position = start_usn
+    pending = b""
+    while position < next_usn:
+        data = journal.read_random(position, min(JOURNAL_CHUNK, next_usn - position),
+                                   j_attr.info.type, j_attr.info.id)
+        if not data:
+            break
+        position += len(data)
+        buffer = pending + data
+        consumed = parse_usn_records(buffer, changed)
+        pending = buffer[consumed:]
+    return current_id, next_usn, changed
+
+
+class SnapshotStore:
+    """Per-volume snapshot of what was hashed last time, kept in SQLite next to the reputation cache."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("SNAPSHOT_DB", "scan_snapshots.db")
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if columns and "mtime" not in columns:
+            # Snapshots from before raw mtimes were kept can't be compared: start over
+            logger.info(f"Dropping outdated snapshot entries in {self.path}")
+            self.conn.execute("DROP TABLE entries")
+        self.conn.executescript(SCHEMA)
+
+    def volume(self, serial: str) -> Optional[Tuple[int, int]]:
+        return self.conn.execute(
+            "SELECT journal_id, next_usn FROM volumes WHERE serial = ?", (serial,)
+        ).fetchone()
+
+    def entries(self, serial: str) -> Dict[int, Tuple]:
+        rows = self.conn.execute(
+            "SELECT file_id, sequence, size, mtime, hashes, file_type FROM entries WHERE serial = ?", (serial,)
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def save_entries(self, serial: str, rows: List[Tuple]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entries (serial, file_id, sequence, size, mtime, hashes, file_type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(serial, *row) for row in rows]
+            )
+
+    def save_volume(self, serial: str, journal_id: Optional[int], next_usn: Optional[int]):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO volumes (serial, journal_id, next_usn, scanned_at) VALUES (?, ?, ?, ?)",
+                (serial, journal_id, next_usn, time.time())
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def modified_time(metadata: Dict) -> Optional[int]:
+    """The $STANDARD_INFORMATION modified FILETIME (100 ns ticks), None when it wasn't read."""
+    return (metadata.get("timestamps") or {}).get("si_mtime")
+
+
+def snapshot_key(metadata: Dict) -> int:
+    # Alternate data streams share their file's record number, the attribute id keeps them apart
+    attribute_id = metadata.get("attribute_id")
+    if attribute_id is None:
+        return metadata["file_id"]
+    return metadata["file_id"] | (attribute_id + 1) << 48
+
+
+class IncrementalScan:
+    """Decides which entries of a rescan can reuse the hashes and file type of the last snapshot."""
+
+    def __init__(self, source, store: Optional[SnapshotStore] = None):
+        self.store = store or SnapshotStore()
+        self.volumes = []
+        self.stats = {"reused": 0, "rehashed": 0, "journal_used": False}
+
+        for volume in source.volumes:
+            serial = volume_serial(source.img, volume["offset"])
+            previous = self.store.volume(serial)
+            journal_id, start_usn = previous if previous else (None, None)
+            journal_id, next_usn, changed = read_usn_changes(volume["fs"], journal_id, start_usn)
+            snapshot = self.store.entries(serial) if previous else {}
+            if changed is not None:
+                self.stats["journal_used"] = True
+            logger.info(
+                f"Volume {serial}: {len(snapshot)} snapshot entries, "
+                f"{'%d journal changes' % len(changed) if changed is not None else 'no usable journal'}"
+            )
+            self.volumes.append({
+                "serial": serial,
+                "snapshot": snapshot,
+                "changed": changed,
+                "journal_id": journal_id,
+                "next_usn": next_usn,
+                "pending": [],
+            })
+
+    def reusable(self, metadata: Dict) -> Optional[Dict]:
+        volume = self.volumes[metadata.get("volume", 0)]
+        previous = volume["snapshot"].get(snapshot_key(metadata))
+        if previous is None:
+            return None
+        sequence, size, mtime, hashes, file_type = previous
+        if volume["changed"] is not None and metadata["file_id"] in volume["changed"]:
+            return None
+        # Without a journal, a reused or rewritten record shows up in sequence, size or the
+        # raw mtime; the formatted time only has whole seconds, so it isn't enough
+        current = modified_time(metadata)
+        if (sequence != metadata.get("sequence") or size != metadata["size"]
+                or current is None or mtime != current or not hashes):
+            return None
+        return {"hashes": json.loads(hashes), "file_type": json.loads(file_type) if file_type else None}
+
+    def record(self, metadata: Dict, reused: bool):
+        self.stats["reused" if reused else "rehashed"] += 1
+        hashes = metadata.get("hashes") or {}
+        if not hashes.get("sha256"):
+            return
+        volume = self.volumes[metadata.get("volume", 0)]
+        volume["pending"].append((
+            snapshot_key(metadata), metadata.get("sequence"), metadata["size"], modified_time(metadata),
+            json.dumps({key: hashes.get(key) for key in SNAPSHOT_HASHES if hashes.get(key)}),
+            json.dumps(metadata["file_type"]) if metadata.get("file_type") else None,
+        ))
+
+    def commit(self):
+        for volume in self.volumes:
+            self.store.save_entries(volume["serial"], volume["pending"])
+            volume["pending"] = []
+            self.store.save_volume(volume["serial"], volume["journal_id"], volume["next_usn"])
+        logger.info(f"Snapshot saved: {self.stats['reused']} entries reused, {self.stats['rehashed']} rehashed")
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,216 @@
+# app/core/jobs.py
+import os
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .mft import iter_mft, convert_file_type
+from .columnar import ColumnarScanResult
+from .image import EvidenceSource
+from .pipeline import ScanPipeline
+from .scan_filter import ScanFilter
+from .triage import TriagePolicy
+
+
+logger = logging.getLogger("api.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class ScanJob:
+    def __init__(self, drive: str, engine: str = "tsk", hash_workers: int = 4, batch_size: int = 256,
+                 incremental: bool = False, recover_deleted: bool = False, dedup: bool = False,
+                 fuzzy: bool = False, scan_filter: Optional[ScanFilter] = None, walk_workers: int = 1,
+                 triage: Optional[TriagePolicy] = None):
+        self.id = uuid.uuid4().hex
+        self.drive = drive
+        self.engine = engine
+        self.hash_workers = hash_workers
+        self.batch_size = max(batch_size, 1)
+        self.incremental = incremental
+        self.recover_deleted = recover_deleted
+        self.dedup = dedup
+        self.fuzzy = fuzzy
+        self.scan_filter = scan_filter
+        self.walk_workers = walk_workers
+        self.triage = triage
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+        self.entries = ColumnarScanResult()
+        self.processed = 0
+        self.candidates = 0
+        self.candidate_bytes = 0
+        self.pipeline: Optional[ScanPipeline] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def progress(self) -> Dict:
+        hashing = self.pipeline.hash_pipeline.stats if self.pipeline else {}
+        lookups = self.pipeline.virus_scanner.stats if self.pipeline and self.pipeline.virus_scanner else {}
+        bytes_read = hashing.get("bytes", 0)
+
+        eta = None
+        if self.status == RUNNING and self.started:
+            if self.candidate_bytes:
+                done = bytes_read / self.candidate_bytes
+            else:
+                done = self.processed / len(self.entries) if self.entries else 0
+            if done > 0:
+                elapsed = time.time() - self.started
+                eta = round(elapsed * (1 - done) / done, 1)
+
+        return {
+            "job_id": self.id,
+            "drive": self.drive,
+            "engine": self.engine,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "files_enumerated": len(self.entries),
+            "files_processed": self.processed,
+            "files_hashed": hashing.get("files", 0) + hashing.get("errors", 0),
+            "files_looked_up": lookups.get("unique", 0),
+            "bytes_read": bytes_read,
+            "bytes_total": self.candidate_bytes,
+            "eta_seconds": eta,
+        }
+
+    def results(self, offset: int = 0, limit: Optional[int] = None) -> Dict:
+        """Entries enriched so far, in enumeration order. With dedup or triage batches follow
+        size or priority order, so these are the completed rows rather than a prefix."""
+        rows = self.entries.completed_rows()
+        end = None if limit is None else offset + limit
+        return {
+            "status": self.status,
+            "total": len(rows),
+            "data": dict(self.entries.rows_at(rows[offset:end])),
+            "summary": self.pipeline.summary() if self.pipeline else None,
+        }
+
+    async def _run(self):
+        source = EvidenceSource(self.drive)
+        try:
+            self.pipeline = ScanPipeline(source, hash_workers=self.hash_workers, incremental=self.incremental,
+                                         dedup=self.dedup, fuzzy=self.fuzzy, scan_id=self.id, triage=self.triage)
+            try:
+                await self._scan(source)
+            finally:
+                await self.pipeline.close()
+        finally:
+            source.close()
+
+    async def _scan(self, source: EvidenceSource):
+        # Enumerate first so progress and ETA have a denominator
+        for filename, raw in iter_mft(source, engine=self.engine, raw=True,
+                                      recover_deleted=self.recover_deleted, tree=self.entries.tree,
+                                      scan_filter=self.scan_filter, workers=self.walk_workers):
+            if self.cancelled:
+                return
+            self.entries.append(filename, raw)
+            if ScanPipeline.is_candidate(filename, {"type": convert_file_type(raw["type"]),
+                                                    "recoverable": raw.get("recoverable")}):
+                self.candidates += 1
+                self.candidate_bytes += raw.get("size") or 0
+        logger.info(f"Job {self.id}: enumerated {len(self.entries)} entries on {self.drive}")
+
+        self.entries.check_timestamps(self.pipeline.timestamps)
+        order = self.entries.priority_order(self.triage) if self.triage else None
+        for batch in self.entries.batches(self.batch_size, self.pipeline.group_above, order):
+            if self.cancelled:
+                return
+            await self.pipeline.process_batch(batch)
+            for filename, metadata in batch:
+                self.entries.store(filename, metadata)
+            with self.lock:
+                self.processed += len(batch)
+        self.pipeline.finish()
+
+    def run(self):
+        if self.cancelled:
+            return
+        self.status = RUNNING
+        self.started = time.time()
+        try:
+            asyncio.run(self._run())
+            self.status = CANCELLED if self.cancelled else COMPLETED
+        except Exception as e:
+            logger.exception(f"Job {self.id} failed: {e}")
+            self.status = FAILED
+            self.error = str(e)
+        finally:
+            self.finished = time.time()
+            logger.info(f"Job {self.id} finished with status {self.status}")
+
+
+class JobManager:
+    """Runs scan jobs on a bounded pool; SCAN_MAX_CONCURRENT caps simultaneous scans.
+
+    Finished jobs keep their results in memory until they are deleted or pushed out by
+    newer ones: only the SCAN_JOB_RETENTION most recently finished jobs are kept.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, retention: Optional[int] = None):
+        self.max_concurrent = max_concurrent or int(os.getenv("SCAN_MAX_CONCURRENT", "2"))
+        self.retention = retention if retention is not None else int(os.getenv("SCAN_JOB_RETENTION", "16"))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="scan-job")
+        self.jobs: Dict[str, ScanJob] = {}
+
+    def submit(self, drive: str, engine: str = "tsk", hash_workers: int = 4, batch_size: int = 256,
+               incremental: bool = False, recover_deleted: bool = False, dedup: bool = False,
+               fuzzy: bool = False, scan_filter: Optional[ScanFilter] = None, walk_workers: int = 1,
+               triage: Optional[TriagePolicy] = None) -> ScanJob:
+        job = ScanJob(drive, engine, hash_workers, batch_size, incremental, recover_deleted, dedup, fuzzy,
+                      scan_filter, walk_workers, triage)
+        self.prune()
+        self.jobs[job.id] = job
+        self.executor.submit(job.run)
+        logger.info(f"Queued job {job.id} for {drive}")
+        return job
+
+    def prune(self):
+        """Forget the oldest finished jobs beyond the retention limit."""
+        finished = sorted((job for job in self.jobs.values() if job.finished is not None),
+                          key=lambda job: job.finished)
+        for job in finished[:max(len(finished) - self.retention, 0)]:
+            del self.jobs[job.id]
+            logger.info(f"Dropped finished job {job.id}")
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[ScanJob]:
+        return list(self.jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[ScanJob]:
+        """Cancel a queued or running job; a finished one is forgotten along with its results."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if job.finished is not None:
+            return self.jobs.pop(job_id)
+        job.cancel_event.set()
+        if job.status == QUEUED:
+            job.status = CANCELLED
+            job.finished = time.time()
+        return job
+
+
+job_manager = JobManager()
@@ -0,0 +1,287 @@
+# app/core/known_hashes.py
+import os
+import csv
+import mmap
+import sqlite3
+import struct
+import logging
+import argparse
+import tempfile
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger("api.known_hashes")
+
+# One .khdb file per hash set:
+#   header | fan-out index | bloom filter bits | sorted 16-byte keys
+# Keys are the MD5, or the first 16 bytes of the SHA-256, stored big-endian as (hi, lo)
+# uint64 pairs so their numeric order is their byte order. The fan-out index holds, for
+# each value of the top fanout bits of a key, the row of the first key at or above it.
+MAGIC = b"KHDB\x00\x01\x00\x00"
+HEADER = struct.Struct("<8s8s8s56sQIQI")
+HEADER_SIZE = 128
+# Fan-out buckets are sized for about FANOUT_BUCKET_KEYS keys each
+FANOUT_BUCKET_KEYS = 64
+KEY_BYTES = 16
+HASH_KINDS = {"md5": 32, "sha256": 64}
+HEX_DIGITS = "0123456789abcdefABCDEF"
+CATEGORIES = ("good", "bad")
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+# Keys parsed per chunk when building, and radix buckets spilled to disk
+BUILD_CHUNK = 4 * 1024 * 1024
+BUILD_BUCKETS = 256
+
+
+def hash_keys(hashes: Iterable[str], kind: str) -> np.ndarray:
+    """(n, 2) big-endian uint64 keys of hex digests of the given kind."""
+    width = KEY_BYTES * 2
+    raw = b"".join(bytes.fromhex(h[:width]) for h in hashes)
+    return np.frombuffer(raw, dtype=">u8").reshape(-1, 2)
+
+
+def bloom_positions(keys: np.ndarray, bits: int) -> np.ndarray:
+    """(n, BLOOM_HASHES) bit positions by double hashing; keys are digests, so already uniform."""
+    h1 = keys[:, 0].astype(np.uint64)
+    h2 = keys[:, 1].astype(np.uint64) | np.uint64(1)
+    rounds = np.arange(BLOOM_HASHES, dtype=np.uint64)
+    return (h1[:, None] + rounds[None, :] * h2[:, None]) % np.uint64(bits)
+
+
+class KnownHashSet:
+    """A memory-mapped .khdb hash set: bloom filter first, then the fan-out bucket of the key."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, kind, category, name, count, fanout_bits, bloom_bits, bloom_hashes = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a known-hash database")
+        self.kind = kind.rstrip(b"\0").decode()
+        self.category = category.rstrip(b"\0").decode()
+        self.name = name.rstrip(b"\0").decode() or self.path.stem
+        self.count = count
+        self.fanout_bits = fanout_bits
+        self.bloom_bits = bloom_bits
+
+        offset = HEADER_SIZE
+        self.fanout = np.frombuffer(self.map, dtype="<u8", count=(1 << fanout_bits) + 1, offset=offset)
+        offset += self.fanout.nbytes
+        self.bloom = np.frombuffer(self.map, dtype=np.uint8, count=bloom_bits // 8, offset=offset)
+        offset += self.bloom.nbytes
+        self.table = np.frombuffer(self.map, dtype=">u8", count=count * 2, offset=offset).reshape(count, 2)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Membership of every key, as a bool array."""
+        found = np.zeros(len(keys), dtype=bool)
+        if not len(keys) or not self.count:
+            return found
+
+        positions = bloom_positions(keys, self.bloom_bits)
+        bits = (self.bloom[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        candidates = np.flatnonzero(bits.all(axis=1))
+
+        buckets = (keys[candidates, 0] >> np.uint64(64 - self.fanout_bits)).astype(np.int64)
+        starts = self.fanout[buckets]
+        ends = self.fanout[buckets + 1]
+        for index, start, end in zip(candidates, starts, ends):
+            # Buckets hold about FANOUT_BUCKET_KEYS keys, so this is one tiny binary search
+            bucket = self.table[start:end]
+            hi, lo = keys[index]
+            row = np.searchsorted(bucket[:, 0], hi)
+            while row < len(bucket) and bucket[row, 0] == hi:
+                if bucket[row, 1] == lo:
+                    found[index] = True
+                    break
+                row += 1
+        return found
+
+    def close(self):
+        self.fanout = self.bloom = self.table = None
+        self.map.close()
+
+
+class KnownFileFilter:
+    """Classifies hashes against every known-good and known-bad set in a directory.
+
+    Known-bad wins over known-good, so a set of trusted installers can't mask a block
+    list entry. Sets are loaded from KNOWN_HASH_DIR; build them with
+    `python -m app.core.known_hashes OUTPUT INPUT... --kind md5 --category good`.
+    """
+
+    def __init__(self, directory: str):
+        self.sets: List[KnownHashSet] = []
+        for path in sorted(Path(directory).glob("*.khdb")):
+            hash_set = KnownHashSet(str(path))
+            self.sets.append(hash_set)
+            logger.info(f"Loaded known-{hash_set.category} set {hash_set.name}: {hash_set.count} {hash_set.kind} hashes")
+        # Known-bad sets are checked first so their verdict stands
+        self.sets.sort(key=lambda s: s.category != "bad")
+        self.stats = {"checked": 0, "known_good": 0, "known_bad": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["KnownFileFilter"]:
+        directory = os.getenv("KNOWN_HASH_DIR")
+        if not directory:
+            return None
+        known = cls(directory)
+        return known if known.sets else None
+
+    def classify(self, hashes: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Map each sha256 of {sha256: {"md5", "sha256"}} that is in a set to its verdict."""
+        digests = list(hashes.values())
+        verdicts: Dict[str, Dict] = {}
+        for hash_set in self.sets:
+            pending = [d for d in digests if d["sha256"] not in verdicts and d.get(hash_set.kind)]
+            if not pending:
+                continue
+            found = hash_set.contains(hash_keys((d[hash_set.kind] for d in pending), hash_set.kind))
+            for index in np.flatnonzero(found):
+                verdicts[pending[index]["sha256"]] = {"status": f"known_{hash_set.category}", "source": hash_set.name}
+
+        self.stats["checked"] += len(digests)
+        for verdict in verdicts.values():
+            self.stats[verdict["status"]] += 1
+        return verdicts
+
+    def close(self):
+        for hash_set in self.sets:
+            hash_set.close()
+
+
+def read_hashes(path: str, kind: str) -> Iterator[str]:
+    """Hex digests of the given kind from an NSRL RDS file or a plain hash list.
+
+    RDSv3 SQLite databases are read from their FILE table, legacy NSRLFile.txt and other
+    CSVs from the column named after the hash kind, anything else one hash per line.
+    """
+    width = HASH_KINDS[kind]
+    is_hex = lambda value: len(value) == width and not value.strip(HEX_DIGITS)
+    if path.endswith((".db", ".sqlite")):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for (value,) in conn.execute(f"SELECT DISTINCT {kind} FROM FILE"):
+                if value and is_hex(value):
+                    yield value
+        finally:
+            conn.close()
+        return
+
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        first = f.readline()
+        columns = [c.strip().strip('"').lower().replace("-", "") for c in first.split(",")]
+        if kind in columns:
+            index = columns.index(kind)
+            for row in csv.reader(f):
+                if len(row) > index and is_hex(row[index]):
+                    yield row[index]
+            return
+        for line in chain([first], f):
+            fields = line.split(",", 1)[0].split()
+            value = fields[0].strip('"') if fields else ""
+            if is_hex(value):
+                yield value
+
+
+def build(inputs: List[str], output: str, kind: str = "md5", category: str = "good", name: str = ""):
+    """Build a .khdb set from hash files.
+
+    Keys are spilled into BUILD_BUCKETS radix buckets by their top byte, then each bucket
+    is sorted and deduplicated on its own, so memory follows the bucket, not the set.
+    """
+    if kind not in HASH_KINDS:
+        raise ValueError(f"Unsupported hash kind: {kind}")
+    if category not in CATEGORIES:
+        raise ValueError(f"Unsupported category: {category}")
+
+    with tempfile.TemporaryDirectory(dir=Path(output).parent) as spill:
+        buckets = [open(Path(spill) / f"{i:03d}", "wb") for i in range(BUILD_BUCKETS)]
+        try:
+            for path in inputs:
+                chunk = []
+                for value in read_hashes(path, kind):
+                    chunk.append(value)
+                    if len(chunk) >= BUILD_CHUNK:
+                        _spill(chunk, kind, buckets)
+                        chunk = []
+                _spill(chunk, kind, buckets)
+        finally:
+            for bucket in buckets:
+                bucket.close()
+
+        sorted_buckets = []
+        count = 0
+        for i in range(BUILD_BUCKETS):
+            keys = np.fromfile(Path(spill) / f"{i:03d}", dtype=">u8").reshape(-1, 2)
+            if len(keys):
+                keys = keys[np.lexsort((keys[:, 1], keys[:, 0]))]
+                keep = np.ones(len(keys), dtype=bool)
+                keep[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+                keys = keys[keep]
+            keys.tofile(Path(spill) / f"{i:03d}.sorted")
+            sorted_buckets.append(len(keys))
+            count += len(keys)
+
+        fanout_bits = min(24, max(8, (count // FANOUT_BUCKET_KEYS).bit_length()))
+        bloom_bits = max(64, (count * BLOOM_BITS_PER_KEY + 63) // 64 * 64)
+        fanout = np.zeros((1 << fanout_bits) + 1, dtype="<u8")
+        bloom = np.zeros(bloom_bits // 8, dtype=np.uint8)
+        for i, size in enumerate(sorted_buckets):
+            if not size:
+                continue
+            keys = np.fromfile(Path(spill) / f"{i:03d}.sorted", dtype=">u8").reshape(-1, 2)
+            prefixes = (keys[:, 0] >> np.uint64(64 - fanout_bits)).astype(np.int64)
+            np.add.at(fanout, prefixes + 1, 1)
+            positions = bloom_positions(keys, bloom_bits).ravel()
+            np.bitwise_or.at(bloom, (positions >> np.uint64(3)).astype(np.int64),
+                             (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        fanout = np.cumsum(fanout, dtype=np.uint64).astype("<u8")
+
+        header = HEADER.pack(MAGIC, kind.encode(), category.encode(), name.encode()[:56],
+                             count, fanout_bits, bloom_bits, BLOOM_HASHES)
+        partial = f"{output}.tmp"
+        with open(partial, "wb") as out:
+            out.write(header.ljust(HEADER_SIZE, b"\0"))
+            fanout.tofile(out)
+            bloom.tofile(out)
+            for i in range(BUILD_BUCKETS):
+                with open(Path(spill) / f"{i:03d}.sorted", "rb") as f:
+                    while True:
+                        block = f.read(64 * 1024 * 1024)
+                        if not block:
+                            break
+                        out.write(block)
+        os.replace(partial, output)
+    logger.info(f"Built {output}: {count} {kind} known-{category} hashes")
+    return count
+
+
+def _spill(chunk: List[str], kind: str, buckets: List):
+    if not chunk:
+        return
+    keys = hash_keys(chunk, kind)
+    top = (keys[:, 0] >> np.uint64(56)).astype(np.int64)
+    order = np.argsort(top, kind="stable")
+    keys, top = keys[order], top[order]
+    bounds = np.searchsorted(top, np.arange(BUILD_BUCKETS + 1))
+    for i in range(BUILD_BUCKETS):
+        if bounds[i] < bounds[i + 1]:
+            keys[bounds[i]:bounds[i + 1]].tofile(buckets[i])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a known-hash database from NSRL or hash list files")
+    parser.add_argument("output")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--kind", choices=sorted(HASH_KINDS), default="md5")
+    parser.add_argument("--category", choices=CATEGORIES, default="good")
+    parser.add_argument("--name", default="")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    build(args.inputs, args.output, args.kind, args.category, args.name or Path(args.output).stem)
@@ -1,7 +1,14 @@
 # app/core/mft.py
+import struct
 import pytsk3
 from datetime import datetime
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .image import EvidenceSource
+from .path_tree import ROOT_NODE, PathTree
 
 
 logger = logging.getLogger("api.mft")
@@ -46,53 +53,287 @@ def convert_flags(flags):
 def convert_permissions(permissions):
     return oct(permissions)
 
-def scan_directory(fs, directory_path="/"):
-    files = {}
+# DOS attribute flags of $STANDARD_INFORMATION, the same bits GetFileAttributesW returns
+DOS_ATTRIBUTES = (
+    (0x0001, "readonly"),
+    (0x0002, "hidden"),
+    (0x0004, "system"),
+    (0x0020, "archive"),
+    (0x0100, "temporary"),
+    (0x0200, "sparse"),
+    (0x0400, "reparse_point"),
+    (0x0800, "compressed"),
+    (0x1000, "offline"),
+    (0x2000, "not_content_indexed"),
+    (0x4000, "encrypted"),
+)
+# $STANDARD_INFORMATION starts with created, modified, MFT changed and accessed FILETIMEs
+# followed by the DOS flags; $FILE_NAME has the same four times after the parent reference
+# and its namespace at offset 65
+SI_HEADER = struct.Struct("<QQQQI")
+FN_HEADER = struct.Struct("<8xQQQQ25xB")
+SI_TIMES = ("si_crtime", "si_mtime", "si_ctime", "si_atime")
+FN_TIMES = ("fn_crtime", "fn_mtime", "fn_ctime", "fn_atime")
+TIME_FIELDS = SI_TIMES + FN_TIMES
+# Win32 and Win32+DOS names carry the times Windows maintains; DOS-only names go last
+FN_PREFERENCE = {3: 0, 1: 1, 0: 2, 2: 3}
+
+def convert_dos_flags(flags):
+    return [name for bit, name in DOS_ATTRIBUTES if flags & bit]
+
+def read_attributes(entry, block_size):
+    """DOS flags, raw timestamps and $DATA streams of a TSK file from one attribute walk.
+
+    Returns (dos_flags, times, streams): times maps TIME_FIELDS to FILETIMEs, streams are
+    (name, attribute id, size, first byte offset) tuples; the default stream has an empty
+    name, the offset is None for resident data. $STANDARD_INFORMATION and $FILE_NAME are
+    always resident, so they come from the record TSK already loaded. dos_flags is None
+    when it can't be read.
+    """
+    dos_flags = None
+    times = {}
+    fn_rank = None
+    streams = []
     try:
-        directory = fs.open_dir(directory_path)
+        for attr in entry:
+            if attr.info.type == pytsk3.TSK_FS_ATTR_TYPE_NTFS_SI:
+                data = entry.read_random(0, SI_HEADER.size, pytsk3.TSK_FS_ATTR_TYPE_NTFS_SI, attr.info.id)
+                if len(data) == SI_HEADER.size:
+                    *si_times, dos_flags = SI_HEADER.unpack(data)
+                    times.update(zip(SI_TIMES, si_times))
+                continue
+            if attr.info.type == pytsk3.TSK_FS_ATTR_TYPE_NTFS_FNAME:
+                data = entry.read_random(0, FN_HEADER.size, pytsk3.TSK_FS_ATTR_TYPE_NTFS_FNAME, attr.info.id)
+                if len(data) == FN_HEADER.size:
+                    *fn_times, namespace = FN_HEADER.unpack(data)
+                    rank = FN_PREFERENCE.get(namespace, 4)
+                    if fn_rank is None or rank < fn_rank:
+                        fn_rank = rank
+                        times.update(zip(FN_TIMES, fn_times))
+                continue
+            if attr.info.type != pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA:
+                continue
+            name = attr.info.name.decode('utf-8', errors='replace') if attr.info.name else ""
+            offset = None
+            if attr.info.flags & pytsk3.TSK_FS_ATTR_NONRES:
+                for run in attr:
+                    offset = run.addr * block_size
+                    break
+            streams.append((name, attr.info.id, attr.info.size, offset))
+    except IOError as e:
+        # Whatever was read before the failure is kept, the entry itself is still listed
+        inode = entry.info.meta.addr if entry.info.meta else None
+        logger.warning(f"Error reading attributes of MFT entry {inode}: {e}")
+    return dos_flags, times, streams
+
+def format_metadata(raw):
+    """Turn the raw integer fields produced by the MFT engines into the API metadata dict"""
+    metadata = {
+        "size": raw["size"],
+        "created": convert_timestamp(raw["crtime"]),
+        "modified": convert_timestamp(raw["mtime"]),
+        "accessed": convert_timestamp(raw["atime"]),
+        "type": convert_file_type(raw["type"]),
+        "flags": convert_flags(raw["flags"]),
+        "file_id": raw["file_id"],
+        "permissions": convert_permissions(raw["mode"]),
+        "uid": raw["uid"],
+        "gid": raw["gid"],
+        "sequence": raw["sequence"],
+    }
+    # Only set on entries from the deleted-file recovery pass
+    if raw.get("recoverable") is not None:
+        metadata["recoverable"] = raw["recoverable"]
+    if raw.get("dos_flags") is not None:
+        metadata["attributes"] = convert_dos_flags(raw["dos_flags"])
+    # Raw FILETIMEs (100 ns ticks since 1601) of $STANDARD_INFORMATION and $FILE_NAME
+    if any(raw.get(field) for field in TIME_FIELDS):
+        metadata["timestamps"] = {field: raw.get(field) or None for field in TIME_FIELDS}
+    if raw.get("timestamp_anomalies") is not None:
+        metadata["timestamp_anomalies"] = raw["timestamp_anomalies"]
+    # Internal fields used by the content stages, dropped by the response models
+    for key in ("volume", "data_offset", "attribute_id", "dos_flags"):
+        if raw.get(key) is not None:
+            metadata[key] = raw[key]
+    return metadata
+
+def list_directory(fs, directory_path, inode, depth, scan_filter=None):
+    """One directory of the walk: (name, path, metadata, streams, subdirectory inode) per
+    entry, metadata None for an entry the filter rejects, the inode None unless the walk
+    should descend into it. The filter runs on the directory entry alone, so rejected
+    entries never have their attributes read."""
+    listing = []
+    try:
+        directory = fs.open_dir(inode=inode)
         for entry in directory:
             try:
                 # Skip . and .. entries
                 name = entry.info.name.name.decode('utf-8')
                 if name in [".", ".."]:
                     continue
-                    
-                full_path = f"{directory_path}/{name}".replace("//", "/")
-                
+
+                full_path = f"{directory_path}/{name}"
+                meta = entry.info.meta
+                is_directory = meta.type == pytsk3.TSK_FS_META_TYPE_DIR
+                descend = meta.addr if is_directory and (
+                    scan_filter is None or scan_filter.enters(full_path, name, depth)) else None
+                if scan_filter and not scan_filter.accepts(full_path, name, is_directory, meta.size,
+                                                           meta.mtime, depth):
+                    if descend is not None:
+                        listing.append((name, full_path, None, (), descend))
+                    continue
+
                 metadata = {
-                    "size": entry.info.meta.size,
-                    "created": convert_timestamp(entry.info.meta.crtime),
-                    "modified": convert_timestamp(entry.info.meta.mtime),
-                    "accessed": convert_timestamp(entry.info.meta.atime),
-                    "type": convert_file_type(entry.info.meta.type),
-                    "flags": convert_flags(entry.info.meta.flags),
-                    "file_id": entry.info.meta.addr,
-                    "permissions": convert_permissions(entry.info.meta.mode),
-                    "uid": entry.info.meta.uid,
-                    "gid": entry.info.meta.gid,
+                    "size": meta.size,
+                    "crtime": meta.crtime,
+                    "mtime": meta.mtime,
+                    "atime": meta.atime,
+                    "type": int(meta.type),
+                    "flags": int(meta.flags),
+                    "file_id": meta.addr,
+                    "sequence": meta.seq,
+                    "mode": int(meta.mode),
+                    "uid": meta.uid,
+                    "gid": meta.gid,
                 }
-                
-                files[full_path] = metadata
-                
-                # Recursively scan subdirectories
-                if entry.info.meta.type == pytsk3.TSK_FS_META_TYPE_DIR:
-                    sub_files = scan_directory(fs, full_path)
-                    files.update(sub_files)
-                    
+                # Named $DATA attributes (alternate data streams) become child entries
+                # like file.txt:stream, read later by attribute id
+                dos_flags, times, data_streams = read_attributes(entry, fs.info.block_size)
+                metadata["dos_flags"] = dos_flags
+                metadata.update(times)
+                streams = []
+                for stream, attribute_id, size, offset in data_streams:
+                    if stream:
+                        streams.append((stream, attribute_id, size, offset))
+                    elif meta.type == pytsk3.TSK_FS_META_TYPE_REG and "data_offset" not in metadata:
+                        metadata["data_offset"] = offset
+                listing.append((name, full_path, metadata, streams, descend))
+
             except AttributeError as ae:
                 logger.error(f"AttributeError reading entry", exc_info=True)
                 continue
-                
-        return files
+    except Exception as e:
+        logger.error(f"Error scanning directory {directory_path or '/'}: {e}")
+    return listing
+
+def iter_directory(fs, directory_path="/", tree=None, parent=ROOT_NODE, scan_filter=None, workers=1,
+                   open_fs=None):
+    """Yield (path, metadata) for everything below directory_path. Paths come from tree,
+    one node per entry under parent, and every metadata dict carries its node.
+
+    The walk is an explicit queue of directories, opened by record number, so depth is
+    bounded by nothing but the volume. With workers > 1 directories are listed on that
+    many threads, each with its own FS handle from open_fs(); entries then come out
+    directory by directory in completion order.
+    """
+    tree = tree if tree is not None else PathTree()
+    if parent == ROOT_NODE and directory_path.strip("/"):
+        parent = tree.insert(directory_path.rstrip("/"))
+    try:
+        inode = fs.info.root_inum if not directory_path.strip("/") else fs.open(directory_path).info.meta.addr
     except Exception as e:
         logger.error(f"Error scanning directory {directory_path}: {e}")
-        return files
+        return
+    # (tree node, inode, depth of its entries)
+    pending = deque([(parent, inode, 0)])
+
+    def emit(node, depth, listing):
+        for name, full_path, metadata, streams, descend in listing:
+            child = tree.child(node, name)
+            if descend is not None:
+                pending.append((child, descend, depth + 1))
+            if metadata is None:
+                continue
+            metadata["node"] = child
+            yield full_path, metadata
+            for stream, attribute_id, size, offset in streams:
+                stream_node = tree.child(node, f"{name}:{stream}")
+                yield f"{full_path}:{stream}", dict(
+                    metadata, size=size, type=int(pytsk3.TSK_FS_META_TYPE_REG),
+                    attribute_id=attribute_id, data_offset=offset, node=stream_node
+                )
+
+    if workers <= 1 or open_fs is None:
+        while pending:
+            node, inode, depth = pending.popleft()
+            yield from emit(node, depth, list_directory(fs, tree.directory_path(node), inode, depth, scan_filter))
+        return
+
+    handles = threading.local()
+
+    def listing(path, inode, depth):
+        if not hasattr(handles, "fs"):
+            handles.fs = open_fs()
+        return list_directory(handles.fs, path, inode, depth, scan_filter)
+
+    # A few directories in flight per thread keeps them busy without listing the whole
+    # volume ahead of a slow consumer
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="walk") as executor:
+        running = {}
+        while pending or running:
+            while pending and len(running) < 2 * workers:
+                node, inode, depth = pending.popleft()
+                running[executor.submit(listing, tree.directory_path(node), inode, depth)] = (node, depth)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node, depth = running.pop(future)
+                yield from emit(node, depth, future.result())
+
+def scan_directory(fs, directory_path="/", scan_filter=None):
+    return {path: format_metadata(raw) for path, raw in iter_directory(fs, directory_path, scan_filter=scan_filter)}
+
+def iter_mft(source, engine="tsk", raw=False, recover_deleted=False, tree=None, scan_filter=None, workers=1):
+    """Yield (path, metadata) for every volume of the source, as the engine produces them.
+    With raw=True the metadata keeps integer timestamps, type, flags and mode.
+    With recover_deleted=True each volume is followed by its deleted and orphaned entries.
+    Paths are built from tree, a PathTree shared by all volumes, and raw metadata carries
+    the entry's node in it. scan_filter (a ScanFilter) prunes the walk and drops entries
+    before their metadata is built; workers > 1 lists TSK directories on that many threads."""
+    if isinstance(source, str):
+        source = EvidenceSource(source)
+    tree = tree if tree is not None else PathTree()
+
+    for index, volume in enumerate(source.volumes):
+        root = tree.insert(volume["prefix"]) if volume["prefix"] else ROOT_NODE
+        if engine == "raw":
+            from .mft_records import RawNTFSVolume, iter_volume
+            volume_entries = iter_volume(RawNTFSVolume(source.img, volume["offset"]), tree=tree, root=root,
+                                         scan_filter=scan_filter)
+        else:
+            volume_entries = iter_directory(volume["fs"], tree=tree, parent=root, scan_filter=scan_filter,
+                                            workers=workers, open_fs=lambda index=index: source.open_fs(index))
+
+        # Regular paths, so a recovered entry never shadows a live one
+        seen = set()
+        for path, metadata in volume_entries:
+            if recover_deleted:
+                seen.add(path)
+            yield _volume_entry(volume, index, path, metadata, raw)
+
+        if recover_deleted:
+            from .mft_records import RawNTFSVolume, iter_deleted, disambiguate
+            for path, metadata in iter_deleted(RawNTFSVolume(source.img, volume["offset"])):
+                path = f"{volume['prefix']}{path}"
+                name = path.rpartition("/")[2]
+                depth = path.count("/") - volume["prefix"].count("/") - 1
+                if scan_filter and not scan_filter.accepts(path, name, metadata["type"] == pytsk3.TSK_FS_META_TYPE_DIR,
+                                                           metadata["size"], metadata["mtime"], depth):
+                    continue
+                if path in seen:
+                    path = disambiguate(path, metadata["file_id"])
+                seen.add(path)
+                metadata["node"] = tree.insert(path)
+                yield _volume_entry(volume, index, path, metadata, raw)
+
+
+def _volume_entry(volume, index, path, metadata, raw):
+    metadata["volume"] = index
+    if metadata.get("data_offset") is not None:
+        metadata["data_offset"] += volume["offset"]
+    return path, metadata if raw else format_metadata(metadata)
 
-def scan_mft(drive_path):
+def scan_mft(source, engine="tsk"):
     try:
-        raw_device_path = f"\\\\.\\{drive_path.rstrip('\\')}"
-        img = pytsk3.Img_Info(raw_device_path)
-        fs = pytsk3.FS_Info(img)
-        return scan_directory(fs)
+        return dict(iter_mft(source, engine))
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
@@ -0,0 +1,758 @@
+# app/core/mft_records.py
+import struct
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pytsk3
+
+from .mft import format_metadata
+from .path_tree import ROOT_NODE, PathTree
+
+
+logger = logging.getLogger("api.mft_records")
+
+# NTFS layout constants
+ROOT_RECORD = 5
+BITMAP_RECORD = 6
+FIRST_USER_RECORD = 16
+FIXUP_STRIDE = 512
+FILETIME_EPOCH_DIFF = 116444736000000000
+
+ATTR_STANDARD_INFORMATION = 0x10
+ATTR_ATTRIBUTE_LIST = 0x20
+ATTR_FILE_NAME = 0x30
+ATTR_DATA = 0x80
+ATTR_END = 0xFFFFFFFF
+
+RECORD_IN_USE = 0x01
+RECORD_IS_DIRECTORY = 0x02
+
+# $FILE_NAME namespaces, in order of preference when picking a display name
+NAMESPACE_POSIX = 0
+NAMESPACE_WIN32 = 1
+NAMESPACE_DOS = 2
+NAMESPACE_WIN32_DOS = 3
+NAMESPACE_PREFERENCE = {NAMESPACE_WIN32_DOS: 0, NAMESPACE_WIN32: 1, NAMESPACE_POSIX: 2, NAMESPACE_DOS: 3}
+
+DOS_ATTR_READONLY = 0x0001
+
+# Virtual directory holding entries whose parent chain no longer resolves, as TSK names it
+ORPHAN_ROOT = "/$OrphanFiles"
+
+# Precompiled structs, decoding millions of records makes these worth keeping around
+BOOT_SECTOR = struct.Struct("<3s8sHB")
+RECORD_HEADER = struct.Struct("<4sHHQHHHHIIQH2xI")
+ATTR_HEADER = struct.Struct("<IIBBHHH")
+RESIDENT_HEADER = struct.Struct("<IH")
+NONRESIDENT_HEADER = struct.Struct("<QQH6xQQQ")
+SI_TIMES = struct.Struct("<QQQQI")
+FN_HEADER = struct.Struct("<QQQQQQQIIBB")
+ATTR_LIST_ENTRY = struct.Struct("<IHBBQQH")
+U64 = struct.Struct("<Q")
+I8 = struct.Struct("<b")
+
+
+def filetime_to_unix(filetime: int) -> int:
+    if filetime < FILETIME_EPOCH_DIFF:
+        return 0
+    return (filetime - FILETIME_EPOCH_DIFF) // 10_000_000
+
+
+def split_reference(reference: int) -> Tuple[int, int]:
+    """Split a 64-bit MFT file reference into (record number, sequence number)."""
+    return reference & 0xFFFFFFFFFFFF, reference >> 48
+
+
+def apply_fixups(record: memoryview) -> bool:
+    """Restore the sector tail bytes from the update sequence array in place."""
+    usa_offset, usa_count = struct.unpack_from("<HH", record, 4)
+    if usa_count < 2 or usa_offset + usa_count * 2 > len(record):
+        return False
+    usn = record[usa_offset:usa_offset + 2].tobytes()
+    for i in range(1, usa_count):
+        tail = i * FIXUP_STRIDE - 2
+        if tail + 2 > len(record):
+            break
+        if record[tail:tail + 2] != usn:
+            return False
+        entry = usa_offset + i * 2
+        record[tail:tail + 2] = record[entry:entry + 2]
+    return True
+
+
+def parse_runlist(data, offset: int, end: int) -> List[Tuple[Optional[int], int]]:
+    """Decode an NTFS runlist into (lcn, cluster count) tuples, lcn is None for sparse runs."""
+    runs = []
+    lcn = 0
+    while offset < end:
+        header = data[offset]
+        if header == 0:
+            break
+        length_size = header & 0x0F
+        offset_size = header >> 4
+        offset += 1
+        length = int.from_bytes(data[offset:offset + length_size], "little")
+        offset += length_size
+        if offset_size:
+            lcn += int.from_bytes(data[offset:offset + offset_size], "little", signed=True)
+            runs.append((lcn, length))
+        else:
+            runs.append((None, length))
+        offset += offset_size
+    return runs
+
+
+def join_fragments(fragments: List[Tuple[int, List]]) -> List[Tuple[Optional[int], int]]:
+    """Concatenate the runlist fragments of one attribute in starting VCN order."""
+    runs = []
+    for _, fragment in sorted(fragments, key=lambda item: item[0]):
+        runs.extend(fragment)
+    return runs
+
+
+def parse_attribute_list(data) -> List[Tuple[int, int, int]]:
+    """Decode $ATTRIBUTE_LIST content into (attribute type, start vcn, record number) tuples."""
+    items = []
+    offset = 0
+    while offset + ATTR_LIST_ENTRY.size <= len(data):
+        attr_type, length, _, _, start_vcn, reference, _ = ATTR_LIST_ENTRY.unpack_from(data, offset)
+        if length == 0:
+            break
+        items.append((attr_type, start_vcn, split_reference(reference)[0]))
+        offset += length
+    return items
+
+
+def parse_record(record: memoryview, record_number: int) -> Optional[Dict]:
+    """Decode the header, $STANDARD_INFORMATION, $FILE_NAME and unnamed $DATA of one FILE record."""
+    if record[:4] != b"FILE":
+        return None
+    if not apply_fixups(record):
+        logger.debug(f"Fixup mismatch in MFT record {record_number}")
+        return None
+
+    (_, _, _, _, sequence, _, attr_offset, flags, used_size, _,
+     base_reference, _, _) = RECORD_HEADER.unpack_from(record, 0)
+
+    entry = {
+        "record": record_number,
+        "sequence": sequence,
+        "in_use": bool(flags & RECORD_IN_USE),
+        "is_directory": bool(flags & RECORD_IS_DIRECTORY),
+        "base_record": split_reference(base_reference)[0],
+        "si_times": None,
+        "dos_flags": None,
+        "names": [],
+        "data_size": None,
+        "data_runs": None,
+        "data_resident": None,
+        # (start vcn, runs) of each unnamed non-resident $DATA piece, extension records
+        # usually hold the ones that don't start at VCN 0
+        "data_fragments": [],
+        "attribute_list": None,
+        "attribute_list_runs": None,
+        "streams": [],
+    }
+
+    end = min(used_size, len(record))
+    offset = attr_offset
+    while offset + 16 <= end:
+        attr_type, attr_length, non_resident, name_length, name_offset, _, attribute_id = ATTR_HEADER.unpack_from(record, offset)
+        if attr_type == ATTR_END or attr_length == 0 or offset + attr_length > end:
+            break
+
+        if attr_type == ATTR_STANDARD_INFORMATION and not non_resident:
+            content_length, content_offset = RESIDENT_HEADER.unpack_from(record, offset + 16)
+            if content_length >= SI_TIMES.size:
+                crtime, mtime, ctime, atime, dos_flags = SI_TIMES.unpack_from(record, offset + content_offset)
+                entry["si_times"] = (crtime, mtime, ctime, atime)
+                entry["dos_flags"] = dos_flags
+
+        elif attr_type == ATTR_ATTRIBUTE_LIST:
+            if non_resident:
+                _, _, runlist_offset, _, real_size, _ = NONRESIDENT_HEADER.unpack_from(record, offset + 16)
+                entry["attribute_list_runs"] = (parse_runlist(record, offset + runlist_offset, offset + attr_length),
+                                                real_size)
+            else:
+                content_length, content_offset = RESIDENT_HEADER.unpack_from(record, offset + 16)
+                start = offset + content_offset
+                entry["attribute_list"] = record[start:start + content_length].tobytes()
+
+        elif attr_type == ATTR_FILE_NAME and not non_resident:
+            _, content_offset = RESIDENT_HEADER.unpack_from(record, offset + 16)
+            start = offset + content_offset
+            fields = FN_HEADER.unpack_from(record, start)
+            parent_reference, fn_crtime, fn_mtime, fn_ctime, fn_atime = fields[:5]
+            fn_length, namespace = fields[9], fields[10]
+            raw_name = record[start + 66:start + 66 + fn_length * 2].tobytes()
+            entry["names"].append({
+                "parent": split_reference(parent_reference),
+                "name": raw_name.decode("utf-16-le", errors="replace"),
+                "namespace": namespace,
+                "times": (fn_crtime, fn_mtime, fn_ctime, fn_atime),
+            })
+
+        elif attr_type == ATTR_DATA and name_length == 0:
+            if non_resident:
+                start_vcn, _, runlist_offset, _, real_size, _ = NONRESIDENT_HEADER.unpack_from(record, offset + 16)
+                runs = parse_runlist(record, offset + runlist_offset, offset + attr_length)
+                entry["data_fragments"].append((start_vcn, runs))
+                if start_vcn == 0:
+                    entry["data_size"] = real_size
+            else:
+                content_length, content_offset = RESIDENT_HEADER.unpack_from(record, offset + 16)
+                entry["data_size"] = content_length
+                entry["data_resident"] = record[offset + content_offset:offset + content_offset + content_length].tobytes()
+
+        elif attr_type == ATTR_DATA:
+            # Named $DATA: an alternate data stream
+            name = record[offset + name_offset:offset + name_offset + name_length * 2].tobytes()
+            stream = {"name": name.decode("utf-16-le", errors="replace"), "id": attribute_id,
+                      "size": None, "runs": None, "resident": None}
+            if non_resident:
+                start_vcn, _, runlist_offset, _, real_size, _ = NONRESIDENT_HEADER.unpack_from(record, offset + 16)
+                stream["runs"] = parse_runlist(record, offset + runlist_offset, offset + attr_length)
+                if start_vcn == 0:
+                    stream["size"] = real_size
+            else:
+                content_length, content_offset = RESIDENT_HEADER.unpack_from(record, offset + 16)
+                stream["size"] = content_length
+                stream["resident"] = record[offset + content_offset:offset + content_offset + content_length].tobytes()
+            merge_streams(entry["streams"], [stream])
+
+        offset += attr_length
+
+    if entry["data_fragments"]:
+        entry["data_runs"] = join_fragments(entry["data_fragments"])
+    return entry
+
+
+class FileReader:
+    """Minimal positional reader over a raw image file, mirroring pytsk3.Img_Info.read."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.handle = open(path, "rb")
+
+    def read(self, offset: int, length: int) -> bytes:
+        self.handle.seek(offset)
+        return self.handle.read(length)
+
+    def close(self):
+        self.handle.close()
+
+
+class RawNTFSVolume:
+    """Reads the $MFT of an NTFS volume sequentially, straight from the underlying image."""
+
+    def __init__(self, reader, offset: int = 0):
+        self.reader = reader
+        self.offset = offset
+
+        boot = reader.read(offset, 512)
+        _, oem_id, bytes_per_sector, sectors_per_cluster = BOOT_SECTOR.unpack_from(boot, 0)
+        if oem_id != b"NTFS    ":
+            raise ValueError(f"No NTFS boot sector at offset {offset}")
+
+        self.bytes_per_sector = bytes_per_sector
+        self.cluster_size = bytes_per_sector * sectors_per_cluster
+        self.mft_lcn = U64.unpack_from(boot, 0x30)[0]
+        self.volume_serial = U64.unpack_from(boot, 0x48)[0]
+
+        clusters_per_record = I8.unpack_from(boot, 0x40)[0]
+        if clusters_per_record < 0:
+            self.record_size = 1 << -clusters_per_record
+        else:
+            self.record_size = clusters_per_record * self.cluster_size
+
+        self.mft_runs, self.mft_size = self._load_mft_runs()
+
+    def _load_mft_runs(self):
+        raw = bytearray(self.reader.read(self.offset + self.mft_lcn * self.cluster_size, self.record_size))
+        entry = parse_record(memoryview(raw), 0)
+        if not entry or not entry["data_runs"]:
+            raise ValueError("Unable to locate $MFT data runs")
+
+        # A fragmented $MFT lists the rest of its $DATA in extension records, which have
+        # to lie within the part the fragments read so far already map
+        runs = entry["data_runs"]
+        for record_number in self._extension_records(entry, runs):
+            raw = bytearray(self.read_runs(runs, self.record_size, record_number * self.record_size))
+            extension = parse_record(memoryview(raw), record_number) if len(raw) == self.record_size else None
+            if extension is None or extension["base_record"] != 0:
+                logger.warning(f"$MFT extension record {record_number} is unreadable, its runs are skipped")
+                continue
+            entry["data_fragments"].extend(extension["data_fragments"])
+            runs = join_fragments(entry["data_fragments"])
+        return runs, entry["data_size"]
+
+    def _extension_records(self, entry: Dict, runs) -> List[int]:
+        """Records other than the base one holding $DATA pieces of $MFT, from its attribute list."""
+        data = entry["attribute_list"]
+        if data is None and entry["attribute_list_runs"] is not None:
+            list_runs, size = entry["attribute_list_runs"]
+            data = self.read_runs(list_runs, size)
+        if not data:
+            return []
+        records = []
+        for attr_type, _, record_number in parse_attribute_list(data):
+            if attr_type == ATTR_DATA and record_number != entry["record"] and record_number not in records:
+                records.append(record_number)
+        return records
+
+    @property
+    def record_count(self) -> int:
+        return self.mft_size // self.record_size
+
+    def read_runs(self, runs, size: int, start: int = 0) -> bytes:
+        """Read up to size bytes from start within a runlist, zero-filling sparse runs."""
+        chunks = []
+        remaining = size
+        skip = start
+        for lcn, length in runs:
+            if remaining <= 0:
+                break
+            run_bytes = length * self.cluster_size
+            if skip >= run_bytes:
+                skip -= run_bytes
+                continue
+            count = min(run_bytes - skip, remaining)
+            if lcn is None:
+                chunks.append(bytes(count))
+            else:
+                chunks.append(self.reader.read(self.offset + lcn * self.cluster_size + skip, count))
+            remaining -= count
+            skip = 0
+        return b"".join(chunks)
+
+    def read_record(self, record_number: int) -> Optional[Dict]:
+        raw = bytearray(self.read_runs(self.mft_runs, self.record_size, record_number * self.record_size))
+        if len(raw) < self.record_size:
+            return None
+        return parse_record(memoryview(raw), record_number)
+
+    def iter_records(self, chunk_size: int = 4 * 1024 * 1024) -> Iterator[Tuple[int, memoryview]]:
+        """Yield (record number, record buffer) pairs, reading the $MFT in large sequential chunks."""
+        chunk_size = max(chunk_size - chunk_size % self.record_size, self.record_size)
+        record_number = 0
+        remaining = self.mft_size
+        for lcn, length in self.mft_runs:
+            if remaining <= 0:
+                break
+            run_bytes = min(length * self.cluster_size, remaining)
+            remaining -= run_bytes
+            if lcn is None:
+                record_number += run_bytes // self.record_size
+                continue
+            position = self.offset + lcn * self.cluster_size
+            end = position + run_bytes
+            while position < end:
+                buffer = memoryview(bytearray(self.reader.read(position, min(chunk_size, end - position))))
+                for start in range(0, len(buffer) - self.record_size + 1, self.record_size):
+                    yield record_number, buffer[start:start + self.record_size]
+                    record_number += 1
+                position += len(buffer)
+                if not buffer:
+                    break
+
+    def iter_entries(self, chunk_size: int = 4 * 1024 * 1024) -> Iterator[Dict]:
+        for record_number, record in self.iter_records(chunk_size):
+            entry = parse_record(record, record_number)
+            if entry is not None:
+                yield entry
+
+
+def pick_name(names: List[Dict]) -> Optional[Dict]:
+    if not names:
+        return None
+    return min(names, key=lambda n: NAMESPACE_PREFERENCE.get(n["namespace"], 4))
+
+
+def merge_streams(streams: List[Dict], extra: List[Dict]):
+    """Fold stream attributes into a list, joining the runlist fragments of one stream."""
+    for stream in extra:
+        existing = next((s for s in streams if s["name"] == stream["name"]), None)
+        if existing is None:
+            streams.append(stream)
+        elif existing["runs"] is not None and stream["runs"]:
+            if stream["size"] is not None:
+                existing["size"] = stream["size"]
+                existing["runs"] = stream["runs"] + existing["runs"]
+            else:
+                existing["runs"].extend(stream["runs"])
+
+
+def fold_extension(entry: Dict, extension: Dict):
+    """Add the names, $DATA pieces and streams an extension record holds to its base record."""
+    entry["names"].extend(extension["names"])
+    if entry["data_size"] is None and extension["data_size"] is not None:
+        entry["data_size"] = extension["data_size"]
+        entry["data_resident"] = extension["data_resident"]
+    if extension["data_fragments"]:
+        entry["data_fragments"].extend(extension["data_fragments"])
+        entry["data_runs"] = join_fragments(entry["data_fragments"])
+    merge_streams(entry["streams"], extension["streams"])
+
+
+def read_entry(volume: RawNTFSVolume, record_number: int, extensions: List[int] = ()) -> Optional[Dict]:
+    """Decode a base record by number, with its extension records folded in."""
+    entry = volume.read_record(record_number)
+    if entry is None:
+        return None
+    for number in extensions:
+        extension = volume.read_record(number)
+        if extension is not None and extension["base_record"] == record_number:
+            fold_extension(entry, extension)
+    return entry
+
+
+def collect_entries(volume: RawNTFSVolume, chunk_size: int = 4 * 1024 * 1024
+                    ) -> Tuple[Dict[int, Tuple[Optional[str], int, int, int, bool]], Dict[int, List[int]]]:
+    """(name, parent, parent sequence, sequence, in use) of every base record, the fields
+    build_paths needs, and the extension records of each base that has any. Everything
+    else, resident data included, is read again by record number through read_entry."""
+    entries = {}
+    extensions: Dict[int, List[int]] = {}
+    named_extensions = set()
+    for entry in volume.iter_entries(chunk_size):
+        if entry["base_record"]:
+            extensions.setdefault(entry["base_record"], []).append(entry["record"])
+            if entry["names"]:
+                named_extensions.add(entry["base_record"])
+            continue
+        name = pick_name(entry["names"])
+        parent, parent_sequence = name["parent"] if name else (0, 0)
+        entries[entry["record"]] = (name["name"] if name else None, parent, parent_sequence, entry["sequence"],
+                                    entry["in_use"])
+
+    # A name in an extension record can win over the base record's own, so those few are reread whole
+    for record_number in named_extensions & entries.keys():
+        entry = read_entry(volume, record_number, extensions[record_number])
+        name = pick_name(entry["names"]) if entry else None
+        if name:
+            _, _, _, sequence, in_use = entries[record_number]
+            entries[record_number] = (name["name"], *name["parent"], sequence, in_use)
+    return entries, extensions
+
+
+def build_paths(entries: Dict[int, Tuple], tree: PathTree, root: int = ROOT_NODE) -> Dict[int, int]:
+    """Place every record reachable from the root directory in the path tree under root,
+    following parent references; returns record number -> tree node."""
+    nodes = {ROOT_RECORD: root}
+    unresolved = set()
+
+    for record_number in entries:
+        if record_number in nodes or record_number in unresolved:
+            continue
+        chain = []
+        current = record_number
+        while current not in nodes:
+            entry = entries.get(current)
+            if (entry is None or entry[0] is None or current in unresolved or current in chain
+                    or not entry[4]):
+                unresolved.update(chain)
+                chain = None
+                break
+            chain.append(current)
+            _, parent_number, parent_sequence, _, _ = entry
+            parent = entries.get(parent_number)
+            if parent is None or (parent_sequence and parent[3] != parent_sequence):
+                unresolved.update(chain)
+                chain = None
+                break
+            current = parent_number
+        if chain is None:
+            continue
+        node = nodes[current]
+        for number in reversed(chain):
+            node = tree.child(node, entries[number][0])
+            nodes[number] = node
+
+    del nodes[ROOT_RECORD]
+    return nodes
+
+
+def first_run_offset(entry: Dict, cluster_size: int) -> Optional[int]:
+    for lcn, _ in entry["data_runs"] or []:
+        if lcn is not None:
+            return lcn * cluster_size
+    return None
+
+
+def entry_metadata(entry: Dict, cluster_size: int) -> Dict:
+    """Raw metadata fields, in the same form mft.iter_directory yields them."""
+    crtime, mtime, ctime, atime = entry["si_times"] or (0, 0, 0, 0)
+    name = pick_name(entry["names"])
+    fn_crtime, fn_mtime, fn_ctime, fn_atime = name["times"] if name else (0, 0, 0, 0)
+    allocation = pytsk3.TSK_FS_META_FLAG_ALLOC if entry["in_use"] else pytsk3.TSK_FS_META_FLAG_UNALLOC
+    return {
+        "size": entry["data_size"] or 0,
+        "crtime": filetime_to_unix(crtime),
+        "mtime": filetime_to_unix(mtime),
+        "atime": filetime_to_unix(atime),
+        "type": pytsk3.TSK_FS_META_TYPE_DIR if entry["is_directory"] else pytsk3.TSK_FS_META_TYPE_REG,
+        "flags": allocation | pytsk3.TSK_FS_META_FLAG_USED,
+        "file_id": entry["record"],
+        "sequence": entry["sequence"],
+        "mode": 0o555 if (entry["dos_flags"] or 0) & DOS_ATTR_READONLY else 0o777,
+        "uid": 0,
+        "gid": 0,
+        "data_offset": first_run_offset(entry, cluster_size),
+        "dos_flags": entry["dos_flags"],
+        # Raw FILETIMEs of both attribute sets, for the timestamp anomaly pass
+        "si_crtime": crtime,
+        "si_mtime": mtime,
+        "si_ctime": ctime,
+        "si_atime": atime,
+        "fn_crtime": fn_crtime,
+        "fn_mtime": fn_mtime,
+        "fn_ctime": fn_ctime,
+        "fn_atime": fn_atime,
+    }
+
+
+def stream_metadata(metadata: Dict, stream: Dict, cluster_size: int) -> Dict:
+    """Raw metadata of an alternate data stream: its file's fields with the stream's own data."""
+    offset = next((lcn * cluster_size for lcn, _ in stream["runs"] or [] if lcn is not None), None)
+    return dict(metadata, size=stream["size"] or 0, type=pytsk3.TSK_FS_META_TYPE_REG,
+                attribute_id=stream["id"], data_offset=offset)
+
+
+def iter_volume(volume: RawNTFSVolume, chunk_size: int = 4 * 1024 * 1024, tree: Optional[PathTree] = None,
+                root: int = ROOT_NODE, scan_filter=None) -> Iterator[Tuple[str, Dict]]:
+    """Yield (path, metadata) pairs like mft.iter_directory, from a sequential $MFT pass.
+
+    Paths can only be resolved once every record has been decoded, so a name and parent
+    table is held for the whole volume; each record is then read again by number as its
+    path comes up, and the per-path dicts are only built for records scan_filter accepts
+    below directories it would have entered.
+    """
+    tree = tree if tree is not None else PathTree()
+    entries, extensions = collect_entries(volume, chunk_size)
+    nodes = build_paths(entries, tree, root)
+    logger.info(f"Decoded {len(entries)} MFT records, resolved {len(nodes)} paths")
+    # Per directory node: (whether the walk reaches its entries, their depth)
+    reached = {root: (True, 0)}
+
+    def reachable(start: int) -> Tuple[bool, int]:
+        chain = []
+        node = start
+        while node not in reached:
+            chain.append(node)
+            node = tree.parents[node]
+        entered, depth = reached[node]
+        for directory in reversed(chain):
+            entered = entered and scan_filter.enters(tree.directory_path(directory), tree.names[directory], depth)
+            depth += 1
+            reached[directory] = (entered, depth)
+        return reached[start]
+
+    for record_number, node in sorted(nodes.items(), key=lambda item: tree.path(item[1])):
+        entry = read_entry(volume, record_number, extensions.get(record_number, ()))
+        if entry is None:
+            logger.warning(f"MFT record {record_number} became unreadable, skipping it")
+            continue
+        if scan_filter:
+            entered, depth = reachable(tree.parents[node])
+            si_times = entry["si_times"] or (0, 0, 0, 0)
+            if not entered or not scan_filter.accepts(tree.path(node), tree.names[node], entry["is_directory"],
+                                                      entry["data_size"], filetime_to_unix(si_times[1]), depth):
+                continue
+        metadata = entry_metadata(entry, volume.cluster_size)
+        metadata["node"] = node
+        yield tree.path(node), metadata
+        parent = tree.parents[node]
+        for stream in entry["streams"]:
+            stream_node = tree.child(parent, f"{tree.names[node]}:{stream['name']}")
+            yield tree.path(stream_node), dict(stream_metadata(metadata, stream, volume.cluster_size),
+                                               node=stream_node)
+
+
+def scan_volume(volume: RawNTFSVolume, chunk_size: int = 4 * 1024 * 1024) -> Dict[str, Dict]:
+    """Produce the same path -> metadata mapping as mft.scan_directory from a sequential $MFT pass."""
+    return {path: format_metadata(raw) for path, raw in iter_volume(volume, chunk_size)}
+
+
+class ClusterBitmap:
+    """The volume's $Bitmap, read a page at a time on demand so large volumes stay cheap."""
+
+    PAGE_SIZE = 64 * 1024
+
+    def __init__(self, volume: RawNTFSVolume, max_pages: int = 256):
+        entry = volume.read_record(BITMAP_RECORD)
+        if not entry or not entry["data_runs"]:
+            raise ValueError("Unable to locate $Bitmap data runs")
+        self.volume = volume
+        self.runs = entry["data_runs"]
+        self.size = entry["data_size"]
+        self.max_pages = max_pages
+        self.pages: Dict[int, bytes] = {}
+
+    def _page(self, index: int) -> bytes:
+        page = self.pages.get(index)
+        if page is None:
+            if len(self.pages) >= self.max_pages:
+                self.pages.pop(next(iter(self.pages)))
+            start = index * self.PAGE_SIZE
+            page = self.volume.read_runs(self.runs, min(self.PAGE_SIZE, self.size - start), start)
+            self.pages[index] = page
+        return page
+
+    def _read(self, start: int, end: int) -> bytes:
+        chunks = []
+        for index in range(start // self.PAGE_SIZE, (end - 1) // self.PAGE_SIZE + 1):
+            page_start = index * self.PAGE_SIZE
+            chunks.append(self._page(index)[max(start - page_start, 0):end - page_start])
+        return b"".join(chunks)
+
+    def allocated(self, lcn: int, count: int) -> bool:
+        """True if any cluster of the run is allocated, or lies outside the bitmap."""
+        last = lcn + count - 1
+        start, end = lcn >> 3, (last >> 3) + 1
+        if count <= 0 or end > self.size:
+            return True
+        data = bytearray(self._read(start, end))
+        data[0] &= (0xFF << (lcn & 7)) & 0xFF
+        data[-1] &= 0xFF >> (7 - (last & 7))
+        return data.count(0) != len(data)
+
+
+class DirectoryTable:
+    """Name and parent of every directory record, allocated or not, with memoized paths.
+
+    Only directories are kept, so the recovery pass needs memory for the directory tree
+    and not for every file on the volume.
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, Tuple[str, int, int, int, bool]] = {}
+        self.paths: Dict[int, Tuple[str, bool]] = {ROOT_RECORD: ("", False)}
+
+    def add(self, entry: Dict):
+        name = pick_name(entry["names"])
+        if name is None or entry["record"] == ROOT_RECORD:
+            return
+        parent, parent_sequence = name["parent"]
+        self.entries[entry["record"]] = (name["name"], parent, parent_sequence, entry["sequence"], entry["in_use"])
+
+    def matches(self, record_number: int, sequence: int) -> bool:
+        if record_number == ROOT_RECORD:
+            return True
+        directory = self.entries.get(record_number)
+        if directory is None:
+            return False
+        _, _, _, current_sequence, in_use = directory
+        if not sequence or current_sequence == sequence:
+            return True
+        # Deleting a record bumps its sequence number, so its children's references lag one behind
+        return not in_use and current_sequence == (sequence + 1) & 0xFFFF
+
+    def resolve(self, record_number: int, sequence: int) -> Tuple[str, bool]:
+        """(path, orphan) of a directory; chains that break are re-rooted under ORPHAN_ROOT."""
+        if not self.matches(record_number, sequence):
+            return ORPHAN_ROOT, True
+        chain = []
+        current = record_number
+        while current not in self.paths:
+            chain.append(current)
+            _, parent, parent_sequence, _, _ = self.entries[current]
+            if parent in chain or not self.matches(parent, parent_sequence):
+                prefix, orphan = ORPHAN_ROOT, True
+                break
+            current = parent
+        else:
+            prefix, orphan = self.paths[current]
+        for number in reversed(chain):
+            prefix = f"{prefix}/{self.entries[number][0]}"
+            self.paths[number] = (prefix, orphan)
+        return self.paths[record_number]
+
+
+def data_intact(in_use: bool, size: Optional[int], runs, resident, bitmap: ClusterBitmap) -> bool:
+    """Whether a $DATA attribute can still be read as it was."""
+    if resident is not None:
+        return True
+    if size is None or not runs:
+        # Nothing in the base record: the runs lived in an extension record or were wiped
+        return size == 0
+    if in_use:
+        return True
+    # Clusters handed out again since the delete hold someone else's data now
+    return not any(bitmap.allocated(lcn, length) for lcn, length in runs if lcn is not None)
+
+
+def content_recoverable(entry: Dict, bitmap: ClusterBitmap) -> Optional[bool]:
+    """Whether an entry's default stream is intact; None for directories."""
+    if entry["is_directory"]:
+        return None
+    return data_intact(entry["in_use"], entry["data_size"], entry["data_runs"], entry["data_resident"], bitmap)
+
+
+def iter_deleted(volume: RawNTFSVolume, chunk_size: int = 4 * 1024 * 1024) -> Iterator[Tuple[str, Dict]]:
+    """Yield (path, metadata) for deleted records and allocated records no directory reaches.
+
+    Two sequential $MFT passes: the first keeps only the directory table, the second streams
+    every unallocated or orphaned record out as it is decoded. Metadata carries the
+    Unallocated/Orphan flags and "recoverable", telling whether the data runs are still intact.
+    """
+    directories = DirectoryTable()
+    for entry in volume.iter_entries(chunk_size):
+        if entry["is_directory"] and not entry["base_record"]:
+            directories.add(entry)
+
+    bitmap = ClusterBitmap(volume)
+    stats = {"deleted": 0, "orphans": 0, "recoverable": 0}
+    for entry in volume.iter_entries(chunk_size):
+        if entry["base_record"] or entry["record"] < FIRST_USER_RECORD:
+            continue
+        name = pick_name(entry["names"])
+        if name is None:
+            if entry["in_use"] or not entry["data_size"]:
+                continue
+            path, orphan = f"{ORPHAN_ROOT}/OrphanFile-{entry['record']}", True
+        elif entry["is_directory"]:
+            path, orphan = directories.resolve(entry["record"], entry["sequence"])
+        else:
+            parent_path, orphan = directories.resolve(*name["parent"])
+            path = f"{parent_path}/{name['name']}"
+
+        # Allocated entries with a resolvable path were already reported by the regular pass
+        if entry["in_use"] and not orphan:
+            continue
+
+        metadata = entry_metadata(entry, volume.cluster_size)
+        if orphan:
+            metadata["flags"] |= pytsk3.TSK_FS_META_FLAG_ORPHAN
+            stats["orphans"] += 1
+        if not entry["in_use"]:
+            stats["deleted"] += 1
+        metadata["recoverable"] = content_recoverable(entry, bitmap)
+        if metadata["recoverable"]:
+            stats["recoverable"] += 1
+        yield path, metadata
+        for stream in entry["streams"]:
+            stream_raw = stream_metadata(metadata, stream, volume.cluster_size)
+            stream_raw["recoverable"] = data_intact(entry["in_use"], stream["size"], stream["runs"],
+                                                    stream["resident"], bitmap)
+            yield f"{path}:{stream['name']}", stream_raw
+
+    logger.info(f"Recovery pass: {stats['deleted']} deleted, {stats['orphans']} orphaned, "
+                f"{stats['recoverable']} with intact content")
+
+
+def disambiguate(path: str, record_number: int) -> str:
+    """Tag a recovered path that collides with an existing one, keeping its extension."""
+    head, sep, name = path.rpartition("/")
+    stem, dot, extension = name.rpartition(".")
+    if not dot or not stem:
+        stem, extension = name, ""
+    return f"{head}{sep}{stem} (record {record_number}){dot if extension else ''}{extension}"
+
+
+def scan_image(image_path: str, offset: int = 0, chunk_size: int = 4 * 1024 * 1024) -> Dict[str, Dict]:
+    reader = FileReader(image_path)
+    try:
+        return scan_volume(RawNTFSVolume(reader, offset), chunk_size)
+    finally:
+        reader.close()
+
@@ -0,0 +1,94 @@
+# app/core/path_tree.py
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+ROOT_NODE = 0
+NO_PARENT = -1
+
+
+class PathTree:
+    """Interned path tree: every node stores its name once and the index of its parent.
+
+    Full paths are only built when asked for. A directory's path is memoized the first
+    time one of its children is resolved, so a file path costs a single join however deep
+    it sits, and shared prefixes are held once instead of once per file.
+    """
+
+    def __init__(self):
+        self.names: List[str] = [""]
+        self.parents = array("i", [NO_PARENT])
+        self.children: Dict[Tuple[int, str], int] = {}
+        # Memoized paths of directories, in both directions
+        self.memo: Dict[int, str] = {ROOT_NODE: ""}
+        self.directories: Dict[str, int] = {"": ROOT_NODE}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def child(self, parent: int, name: str) -> int:
+        """The node named name under parent, added if it doesn't exist yet."""
+        node = self.children.get((parent, name))
+        if node is None:
+            node = self.children[(parent, name)] = len(self.names)
+            self.names.append(sys.intern(name))
+            self.parents.append(parent)
+        return node
+
+    def directory_path(self, node: int) -> str:
+        """Path of a node that has children, memoized along with its ancestors."""
+        chain = []
+        while node not in self.memo:
+            chain.append(node)
+            node = self.parents[node]
+        prefix = self.memo[node]
+        for node in reversed(chain):
+            prefix = f"{prefix}/{self.names[node]}"
+            self.memo[node] = prefix
+            self.directories[prefix] = node
+        return prefix
+
+    def path(self, node: int) -> str:
+        if node in self.memo:
+            return self.memo[node]
+        return f"{self.directory_path(self.parents[node])}/{self.names[node]}"
+
+    def insert(self, path: str) -> int:
+        """Node of an absolute path such as /dir/file.txt, adding missing components."""
+        head, _, name = path.rpartition("/")
+        parent = self.directories.get(head)
+        if parent is None:
+            # Walk down from the deepest directory already known, however deep the path
+            known = head
+            missing = []
+            while parent is None:
+                known, _, component = known.rpartition("/")
+                missing.append(component)
+                parent = self.directories.get(known)
+            for component in reversed(missing):
+                parent = self.child(parent, component)
+            self.directory_path(parent)
+        return self.child(parent, name)
+
+    def find(self, path: str) -> Optional[int]:
+        head, _, name = path.rpartition("/")
+        parent = self.directories.get(head)
+        if parent is None:
+            known = head
+            missing = []
+            while parent is None:
+                if not known:
+                    return None
+                known, _, component = known.rpartition("/")
+                missing.append(component)
+                parent = self.directories.get(known)
+            for component in reversed(missing):
+                parent = self.children.get((parent, component))
+                if parent is None:
+                    return None
+        return self.children.get((parent, name))
+
+    def as_dict(self) -> Dict[str, List]:
+        """Names and parent indices, the form the visualisation builds its sunburst from."""
+        return {"names": self.names, "parents": self.parents.tolist()}
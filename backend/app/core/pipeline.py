@@ -0,0 +1,316 @@
+# app/core/pipeline.py
+import uuid
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .content import DEFAULT_CONSUMERS
+from .entropy import EntropyConsumer
+from .fuzzy import FuzzyHashConsumer, SimilarityIndex, fuzzy_available
+from .hashing import HashJob, HashPipeline, PARTIAL_BLOCK
+from .incremental import IncrementalScan
+from .hidden_detector import HiddenDetector
+from .file_type_detector import FileTypeDetector
+from .known_hashes import KnownFileFilter
+from .scan_filter import is_system_name
+from .timestamps import TimestampChecker
+from .triage import TriagePolicy
+from .async_virus_scanner import AsyncVirusScanner
+from .yara_scanner import YaraScanner
+
+
+logger = logging.getLogger("api.scan")
+
+# Content not worth a reputation lookup when nothing else needs its full hash
+MEDIA_TYPES = ("image", "audio", "video")
+
+
+class ScanPipeline:
+    """Enriches batches of MFT entries with hashes, reputation, file type and hidden status.
+
+    Every endpoint feeds it fixed-size batches so memory follows the batch size, not the
+    volume. /scan and jobs batch the enumerated volume, in size order when dedup is on so
+    same-size files meet in one batch; the streaming endpoint batches as it enumerates.
+    """
+
+    def __init__(self, source, hash_workers: int = 4, incremental: bool = False, dedup: bool = False,
+                 fuzzy: bool = False, scan_id: Optional[str] = None, triage: Optional[TriagePolicy] = None):
+        self.source = source
+        self.drive = source.source
+        self.scan_id = scan_id or uuid.uuid4().hex
+        self.type_detector = FileTypeDetector()
+        self.hidden_detector = HiddenDetector()
+        # $SI/$FN timestamp anomalies; /scan and jobs check the whole column set up front
+        self.timestamps = TimestampChecker()
+        self.timestamps.add_volumes(source.volumes)
+        consumers = DEFAULT_CONSUMERS + [self.type_detector.content_consumer, EntropyConsumer]
+
+        # ssdeep/TLSH digests in the same read pass, indexed for similarity queries across scans
+        self.similarity = None
+        self.indexed = 0
+        if fuzzy:
+            if fuzzy_available():
+                consumers.append(FuzzyHashConsumer)
+                self.similarity = SimilarityIndex()
+                self.similarity.add_scan(self.scan_id, self.drive)
+            else:
+                logger.error("Fuzzy hashing requested but neither ssdeep nor py-tlsh is installed")
+
+        self.hash_pipeline = HashPipeline(
+            workers=hash_workers,
+            consumers=consumers,
+            dedup=dedup,
+            needs_full=self.needs_full_hash
+        )
+        self.processed = 0
+        # Per-scan limits on what gets read; /scan and jobs also feed batches in its priority order
+        self.triage = triage
+
+        # Rescans reuse hashes of entries whose MFT record is unchanged since the last snapshot
+        self.incremental = IncrementalScan(source) if incremental else None
+
+        # NSRL-style known-good and block-list sets, enabled by KNOWN_HASH_DIR
+        self.known_files = None
+        try:
+            self.known_files = KnownFileFilter.from_env()
+        except Exception as e:
+            logger.error(f"Failed to load known-hash sets: {e}")
+
+        self.virus_scanner = None
+        try:
+            self.virus_scanner = AsyncVirusScanner()
+        except Exception as e:
+            logger.error(f"Failed to initialize VirusScanner: {e}")
+
+        # Offline YARA matching, enabled by pointing YARA_RULES at a rule file or directory
+        self.yara_scanner = None
+        try:
+            self.yara_scanner = YaraScanner.from_env(source)
+        except Exception as e:
+            logger.error(f"Failed to initialize YaraScanner: {e}")
+
+    @staticmethod
+    def is_candidate(filename: str, metadata: Dict) -> bool:
+        # Skip system files, directories and recovered entries whose clusters were reused
+        return not (is_system_name(filename.rpartition("/")[2]) or
+                    metadata['type'] == 'Directory' or
+                    metadata.get('recoverable') is False)
+
+    @property
+    def group_above(self):
+        # In dedup mode same-size files must meet in one batch to be recognised as twins
+        return 2 * PARTIAL_BLOCK if self.hash_pipeline.dedup else None
+
+    def needs_full_hash(self, partial: Optional[Dict]) -> bool:
+        """Whether a file with no same-size, same-partial-hash twin still needs its full hash;
+        with partial None, whether every file does whatever its content."""
+        # YARA results are keyed by hash; reputation and known-hash lookups need one, but
+        # photos and videos aren't worth a lookup on their own
+        if self.yara_scanner:
+            return True
+        if partial is None or not (self.virus_scanner or self.known_files):
+            return False
+        signature = partial.get("signature")
+        return signature is None or signature.mime_type.split("/")[0] not in MEDIA_TYPES
+
+    def hidden_status(self, filename: str, metadata: Dict) -> Optional[Dict]:
+        # The DOS flags were decoded from $STANDARD_INFORMATION during the MFT pass; only a
+        # live file whose record couldn't provide them falls back to asking Windows
+        if metadata.get("attribute_id") is not None:
+            return self.hidden_detector.analyze_stream(filename)
+        if metadata.get("dos_flags") is not None:
+            return self.hidden_detector.analyze_attributes(filename, metadata["dos_flags"])
+        if self.source.is_live:
+            return self.hidden_detector.analyze_file(f"{self.drive}{filename}")
+        return None
+
+    def opener(self, metadata: Dict):
+        # Content always comes from the already open FS handle by MFT record number, for
+        # live drives too: no path resolution, no access-time updates on the evidence,
+        # and locked or in-use files read the same as on an image
+        return self.source.opener(metadata)
+
+    async def process_batch(self, batch: List[Tuple[str, Dict]]):
+        """Enrich every (filename, metadata) pair of the batch in place."""
+        # Streamed entries weren't checked with the rest of the volume
+        self.timestamps.check_batch(batch)
+
+        candidates = []
+        for filename, metadata in batch:
+            # Initialize default hash and file type data
+            metadata["hashes"] = {"md5": None, "sha256": None}
+            metadata["file_type"] = None
+            if not self.is_candidate(filename, metadata):
+                logger.debug(f"Skipping system file/directory: {filename}")
+                continue
+            candidates.append((filename, metadata))
+            metadata["hidden_status"] = self.hidden_status(filename, metadata)
+
+        reused = {}
+        if self.incremental:
+            for filename, metadata in candidates:
+                previous = self.incremental.reusable(metadata)
+                if previous is not None:
+                    reused[filename] = previous
+
+        # Triage what still has to be read: skipped files leave the candidates, large ones
+        # may only get their first and last block read
+        partial = set()
+        if self.triage:
+            admitted = []
+            for filename, metadata in candidates:
+                decision = None
+                if filename not in reused:
+                    decision = self.triage.admit(filename, metadata["size"], 2 * PARTIAL_BLOCK)
+                metadata["triage"] = decision
+                if decision is not None and decision["action"] == "skipped":
+                    logger.debug(f"Triage skipped {filename}: {decision['reason']}")
+                    continue
+                if decision is not None:
+                    partial.add(filename)
+                admitted.append((filename, metadata))
+            candidates = admitted
+
+        # Read every candidate once, concurrently and in physical disk order
+        jobs = [
+            HashJob(filename, f"{self.drive}{filename}", metadata["size"], self.opener(metadata),
+                    metadata.get("data_offset"),
+                    (metadata.get("volume", 0), metadata["file_id"], metadata.get("attribute_id")),
+                    filename in partial)
+            for filename, metadata in candidates
+            if filename not in reused
+        ]
+        hash_results = await asyncio.to_thread(self.hash_pipeline.hash_files, jobs)
+        for filename, previous in reused.items():
+            hash_results[filename] = {"hashes": previous["hashes"]}
+
+        # Known files are settled locally: known-good ones need no further scanning and
+        # known-bad ones are flagged without waiting on a reputation lookup
+        known_results = {}
+        if self.known_files:
+            try:
+                known_results = await asyncio.to_thread(self.known_files.classify, {
+                    result["hashes"]["sha256"]: result["hashes"]
+                    for result in hash_results.values() if "error" not in result and result["hashes"]["sha256"]
+                })
+            except Exception as e:
+                logger.error(f"Known-hash lookup failed: {e}")
+
+        # YARA matches in its worker processes while the reputation lookups are in flight
+        yara_scan = None
+        if self.yara_scanner:
+            yara_scan = asyncio.create_task(asyncio.to_thread(self.yara_scanner.scan, [
+                (hash_results[filename]["hashes"]["sha256"], metadata)
+                for filename, metadata in candidates
+                if "error" not in hash_results[filename] and hash_results[filename]["hashes"]["sha256"]
+                and known_results.get(hash_results[filename]["hashes"]["sha256"], {}).get("status") != "known_good"
+            ]))
+
+        # Reputation lookups for the whole batch, each distinct unknown hash queried once
+        virus_results = {}
+        if self.virus_scanner:
+            try:
+                virus_results = await self.virus_scanner.check_hashes(
+                    result["hashes"]["sha256"] for result in hash_results.values()
+                    if "error" not in result and result["hashes"]["sha256"] not in known_results
+                )
+            except Exception as e:
+                logger.error(f"Batch virus lookup failed: {e}")
+
+        yara_results = {}
+        if yara_scan:
+            try:
+                yara_results = await yara_scan
+            except Exception as e:
+                logger.error(f"Batch YARA scan failed: {e}")
+
+        await asyncio.to_thread(self._analyze, candidates, hash_results, known_results, virus_results,
+                                yara_results, reused)
+
+        if self.similarity:
+            try:
+                self.indexed += await asyncio.to_thread(self.similarity.add, self.scan_id, [
+                    (filename, metadata["hashes"]["sha256"], metadata["hashes"].get("ssdeep"),
+                     metadata["hashes"].get("tlsh"))
+                    for filename, metadata in candidates
+                    if metadata["hashes"].get("sha256")
+                    and (metadata["hashes"].get("ssdeep") or metadata["hashes"].get("tlsh"))
+                ])
+            except Exception as e:
+                logger.error(f"Similarity indexing failed: {e}")
+
+        if self.incremental:
+            for filename, metadata in candidates:
+                self.incremental.record(metadata, filename in reused)
+
+    def _analyze(self, candidates, hash_results, known_results, virus_results, yara_results, reused):
+        for filename, metadata in candidates:
+            self.processed += 1
+            logger.info(f"Processing file {self.processed}: {filename}")
+
+            try:
+                content = hash_results[filename]
+
+                if "error" not in content:
+                    metadata["hashes"] = content["hashes"]
+                    if "fuzzy" in content:
+                        metadata["hashes"].update(content["fuzzy"])
+
+                    known = known_results.get(content["hashes"]["sha256"])
+                    metadata["hashes"]["known_file"] = known
+                    if known and known["status"] == "known_bad":
+                        logger.warning(f"Known-bad file {filename} (listed in {known['source']})")
+
+                    scan_result = virus_results.get(content["hashes"]["sha256"])
+                    metadata["hashes"]["virus_scan"] = scan_result
+                    if scan_result:
+                        logger.info(f"Scan completed for {filename}: {scan_result['message']}")
+
+                    yara_matches = yara_results.get(content["hashes"]["sha256"])
+                    metadata["hashes"]["yara"] = yara_matches
+                    if yara_matches:
+                        logger.info(f"YARA matches for {filename}: {', '.join(m['rule'] for m in yara_matches)}")
+
+                    # File type from the signature identified during the hashing read
+                    if filename in reused:
+                        metadata["file_type"] = reused[filename]["file_type"]
+                    else:
+                        metadata["file_type"] = self.type_detector.analyze_signature(
+                            filename, content["header"], metadata["size"], content["signature"],
+                            content.get("entropy")
+                        )
+
+            except Exception as e:
+                logger.error(f"Failed to analyze {filename}: {str(e)}")
+
+    def finish(self):
+        """Persist the incremental snapshot once every batch has been processed."""
+        if self.incremental:
+            self.incremental.commit()
+
+    async def close(self):
+        """Stop the YARA workers, close the VirusTotal session and reputation store and release
+        the known-hash sets, snapshot store and similarity index; safe to call twice."""
+        if self.virus_scanner:
+            await self.virus_scanner.close()
+        if self.yara_scanner:
+            self.yara_scanner.close()
+        if self.known_files:
+            self.known_files.close()
+        if self.incremental:
+            self.incremental.close()
+        if self.similarity:
+            self.similarity.close()
+            self.similarity = None
+
+    def summary(self) -> Dict:
+        return {
+            "hashing": self.hash_pipeline.stats,
+            "known_files": self.known_files.stats if self.known_files else None,
+            "virus_scan": self.virus_scanner.stats if self.virus_scanner else None,
+            "yara": self.yara_scanner.summary() if self.yara_scanner else None,
+            "triage": self.triage.report() if self.triage else None,
+            "timestamps": self.timestamps.stats if self.timestamps.stats["checked"] else None,
+            "similarity": {"scan_id": self.scan_id, "indexed": self.indexed} if self.indexed else None,
+            "incremental": self.incremental.stats if self.incremental else None
+        }
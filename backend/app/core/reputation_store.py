@@ -0,0 +1,191 @@
+# app/core/reputation_store.py
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+logger = logging.getLogger("api.reputation_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reputation (
+    hash TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL
+);
+CREATE INDEX IF NOT EXISTS reputation_expires ON reputation (expires);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+DAY = 24 * 60 * 60
+
+
+class ReputationStore:
+    """Persistent hash -> VirusTotal result cache backed by SQLite in WAL mode.
+
+    Every thread gets its own connection and every process opens the file independently,
+    so workers can share one cache; WAL lets readers run while a writer commits.
+    Writes are buffered and committed in batches of `batch_size`.
+    """
+
+    def __init__(self, path: str = "hash_cache.db", ttl: float = 30 * DAY, negative_ttl: float = 1 * DAY,
+                 batch_size: int = 500, legacy_json: Optional[str] = "hash_cache.json"):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.batch_size = batch_size
+        self.local = threading.local()
+        # Every thread's connection, so close() can release them all
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.pending_lock = threading.Lock()
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        if legacy_json:
+            self.import_json(legacy_json)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            # Only used by the thread that opened it, but closed by whichever thread calls close()
+            conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self.local.conn = conn
+            with self.connections_lock:
+                self.connections.append(conn)
+        return conn
+
+    def _expiry(self, result: Dict[str, Any], now: float) -> Optional[float]:
+        ttl = self.negative_ttl if result.get("status_code") == 404 else self.ttl
+        return now + ttl if ttl else None
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM reputation").fetchone()[0]
+
+    def get(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        with self.pending_lock:
+            if file_hash in self.pending:
+                return self.pending[file_hash]
+        row = self._connection().execute(
+            "SELECT result FROM reputation WHERE hash = ? AND (expires IS NULL OR expires > ?)",
+            (file_hash, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        hashes = list(hashes)
+        found = {}
+        conn = self._connection()
+        now = time.time()
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 900):
+            batch = hashes[start:start + 900]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT hash, result FROM reputation WHERE hash IN ({placeholders}) "
+                f"AND (expires IS NULL OR expires > ?)",
+                (*batch, now)
+            )
+            for file_hash, result in rows:
+                found[file_hash] = json.loads(result)
+        with self.pending_lock:
+            for file_hash in hashes:
+                if file_hash in self.pending:
+                    found[file_hash] = self.pending[file_hash]
+        return found
+
+    def put(self, file_hash: str, result: Dict[str, Any]):
+        with self.pending_lock:
+            self.pending[file_hash] = result
+            full = len(self.pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def put_many(self, results: Dict[str, Dict[str, Any]]):
+        with self.pending_lock:
+            self.pending.update(results)
+        self.flush()
+
+    def delete(self, file_hash: str):
+        with self.pending_lock:
+            self.pending.pop(file_hash, None)
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM reputation WHERE hash = ?", (file_hash,))
+
+    def flush(self):
+        with self.pending_lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO reputation (hash, result, created, expires) VALUES (?, ?, ?, ?)",
+                [(h, json.dumps(r), now, self._expiry(r, now)) for h, r in pending.items()]
+            )
+        logger.debug(f"Flushed {len(pending)} reputation entries")
+
+    def purge_expired(self) -> int:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM reputation WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def import_json(self, json_path: str) -> int:
+        """One-off import of the legacy hash_cache.json, skipped once it has been done."""
+        source = Path(json_path)
+        conn = self._connection()
+        marker = f"imported:{source.resolve()}"
+        if not source.exists() or conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+            return 0
+        try:
+            with open(source, "r") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading legacy cache {source}: {e}")
+            return 0
+
+        now = time.time()
+        rows = [
+            (h, json.dumps(r), now, self._expiry(r, now))
+            for h, r in legacy.items()
+            if isinstance(r, dict) and "message" in r
+        ]
+        with conn:
+            # Existing entries win, they are at least as fresh as the JSON file
+            conn.executemany(
+                "INSERT OR IGNORE INTO reputation (hash, result, created, expires) VALUES (?, ?, ?, ?)", rows
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (marker, str(now)))
+        logger.info(f"Imported {len(rows)} entries from {source}")
+        return len(rows)
+
+    def close(self):
+        """Commit buffered results, fold the WAL back into the database and close the
+        connections of every thread; the store reopens on next use."""
+        self.flush()
+        with self.connections_lock:
+            connections, self.connections = self.connections, []
+            self.local = threading.local()
+        if not connections:
+            return
+        for conn in connections[1:]:
+            conn.close()
+        try:
+            connections[0].execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logger.warning(f"WAL checkpoint of {self.path} failed: {e}")
+        connections[0].close()
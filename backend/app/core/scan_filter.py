@@ -0,0 +1,92 @@
+# app/core/scan_filter.py
+import re
+import fnmatch
+from datetime import datetime, timezone
+from typing import List, Optional, Union
+
+
+# Directory entries that are filesystem bookkeeping rather than user content
+SYSTEM_NAMES = (".", "System Volume Information")
+
+
+def is_system_name(name: str) -> bool:
+    # NTFS metadata files ($MFT, $Extend, ...) all start with $
+    return name.startswith("$") or name in SYSTEM_NAMES
+
+
+def to_epoch(value: Union[datetime, float, None]) -> Optional[float]:
+    """Unix seconds of a bound; naive datetimes are UTC, like the scan's own timestamps."""
+    if value is None or not isinstance(value, datetime):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def compile_globs(patterns: Optional[List[str]]):
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in patterns), re.IGNORECASE)
+
+
+class ScanFilter:
+    """Which entries a traversal yields and which directories it descends into.
+
+    Globs match the full path case-insensitively, with * spanning separators as in
+    fnmatch. Excludes prune whole directories; includes only select what is yielded, so
+    *.docx still walks every directory. Size and modified-time bounds apply to files,
+    depth counts directories below the volume root (0 is the root's own entries). Every
+    decision is made from the directory entry alone, before attributes are read and
+    metadata is built.
+    """
+
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 max_depth: Optional[int] = None, min_size: Optional[int] = None, max_size: Optional[int] = None,
+                 modified_after: Union[datetime, float, None] = None,
+                 modified_before: Union[datetime, float, None] = None, skip_system: bool = False):
+        self.include = compile_globs(include)
+        self.exclude = compile_globs(exclude)
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = to_epoch(modified_after)
+        self.modified_before = to_epoch(modified_before)
+        self.skip_system = skip_system
+
+    @classmethod
+    def create(cls, **params) -> Optional["ScanFilter"]:
+        """A filter for the given request parameters, or None when none of them restrict anything."""
+        if not any(value not in (None, False, []) for value in params.values()):
+            return None
+        return cls(**params)
+
+    def enters(self, path: str, name: str, depth: int) -> bool:
+        """Whether to descend into the directory at path, itself at depth."""
+        if self.max_depth is not None and depth >= self.max_depth:
+            return False
+        if self.skip_system and is_system_name(name):
+            return False
+        return not (self.exclude and self.exclude.match(path))
+
+    def accepts(self, path: str, name: str, is_directory: bool, size: Optional[int], mtime: Optional[float],
+                depth: int) -> bool:
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if self.skip_system and is_system_name(name):
+            return False
+        if self.exclude and self.exclude.match(path):
+            return False
+        if self.include and not self.include.match(path):
+            return False
+        if is_directory:
+            return True
+        size = size or 0
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.modified_after is not None and (mtime or 0) < self.modified_after:
+            return False
+        if self.modified_before is not None and (mtime or 0) > self.modified_before:
+            return False
+        return True
@@ -1,7 +1,14 @@
+import os
 import ctypes
+from pathlib import Path
 from typing import List
 
+IMAGE_EXTENSIONS = {".dd", ".raw", ".img", ".001", ".aa"}
+
 def get_removable_drives() -> List[str]:
+    if os.name != "nt":
+        return get_removable_block_devices() + list_evidence_images()
+
     DRIVE_REMOVABLE = 2
     drives = []
     
@@ -16,4 +23,25 @@ def get_removable_drives() -> List[str]:
             bitmask >>= 1
     except Exception as e:
         print(f"Error detecting drives: {e}")
-    return drives
\ No newline at end of file
+    return drives + list_evidence_images()
+
+def get_removable_block_devices() -> List[str]:
+    devices = []
+    try:
+        for device in sorted(Path("/sys/block").iterdir()):
+            removable = device / "removable"
+            if removable.exists() and removable.read_text().strip() == "1":
+                devices.append(f"/dev/{device.name}")
+    except Exception as e:
+        print(f"Error detecting block devices: {e}")
+    return devices
+
+def list_evidence_images() -> List[str]:
+    # Acquired images dropped into EVIDENCE_DIR are offered alongside physical drives
+    evidence_dir = os.getenv("EVIDENCE_DIR")
+    if not evidence_dir or not Path(evidence_dir).is_dir():
+        return []
+    return [
+        str(path) for path in sorted(Path(evidence_dir).iterdir())
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    ]
@@ -0,0 +1,366 @@
+# app/core/signatures.py
+import os
+import json
+import struct
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .content import ContentConsumer
+
+
+logger = logging.getLogger("api.signatures")
+
+DEFAULT_RULES = Path(__file__).with_name("signatures.json")
+# Bytes kept from the end of a file for inspectors that need it (ZIP central directory)
+TAIL_LENGTH = 64 * 1024
+
+ZIP_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+ZIP_CENTRAL_NAMES = struct.Struct("<HHH")
+ZIP_EOCD_OFFSETS = struct.Struct("<II")
+
+OLE_ENTRY_SIZE = 128
+# Root storage CLSIDs of the Windows Installer formats, as stored on disk
+OLE_CLSIDS = {
+    bytes.fromhex("84100C0000000000C000000000000046"): "msi",
+    bytes.fromhex("86100C0000000000C000000000000046"): "msp",
+    bytes.fromhex("82100C0000000000C000000000000046"): "mst",
+}
+
+PE_FILE_DLL = 0x2000
+PE_SUBSYSTEM_NATIVE = 1
+PE_SUBSYSTEM_EFI = (10, 11, 12, 13)
+
+
+@dataclass
+class FileSignature:
+    extension: str
+    mime_type: str
+    description: str
+    aliases: Tuple[str, ...] = field(default=(), compare=False)
+    # Compressed or encrypted by design, so high entropy is expected
+    compressed: bool = field(default=False, compare=False)
+
+    @property
+    def extensions(self) -> Tuple[str, ...]:
+        return (self.extension,) + self.aliases
+
+
+class SignatureRule:
+    """One rule of the database: every (offset, value, mask) pattern has to match."""
+
+    def __init__(self, index: int, signature: FileSignature, patterns: List[Tuple[int, bytes, bytes]],
+                 inspect: Optional[str] = None, priority: int = 0):
+        self.index = index
+        self.signature = signature
+        self.inspect = inspect
+        self.priority = priority
+        self.patterns = []
+        self.specificity = 0
+        for offset, value, mask in patterns:
+            exact = all(byte == 0xFF for byte in mask)
+            self.patterns.append((offset, len(value), value if exact else int.from_bytes(value, "big"),
+                                  None if exact else int.from_bytes(mask, "big")))
+            self.specificity += sum(bin(byte).count("1") for byte in mask)
+        self.extent = max(offset + len(value) for offset, value, _ in patterns)
+        self.raw_patterns = patterns
+
+    def known_runs(self) -> List[Tuple[int, bytes]]:
+        """Maximal runs of fully known bytes, the candidates for the trie anchor."""
+        runs = []
+        for offset, value, mask in self.raw_patterns:
+            start = None
+            for i, byte in enumerate(mask + b"\x00"):
+                if byte == 0xFF and start is None:
+                    start = i
+                elif byte != 0xFF and start is not None:
+                    runs.append((offset + start, value[start:i]))
+                    start = None
+        return runs
+
+    def verify(self, head: bytes) -> bool:
+        for offset, length, value, mask in self.patterns:
+            data = head[offset:offset + length]
+            if len(data) < length:
+                return False
+            if mask is None:
+                if data != value:
+                    return False
+            elif int.from_bytes(data, "big") & mask != value:
+                return False
+        return True
+
+    @property
+    def rank(self) -> Tuple[int, int, int]:
+        return self.priority, self.specificity, -self.index
+
+
+def parse_pattern(offset: int, text: str, mask_text: Optional[str] = None) -> Tuple[int, bytes, bytes]:
+    """Decode "4D5A??00" style hex, ?? being a wildcard byte, with an optional explicit bit mask."""
+    text = text.replace(" ", "")
+    value = bytes.fromhex(text.replace("??", "00"))
+    mask = bytes(0x00 if text[i:i + 2] == "??" else 0xFF for i in range(0, len(text), 2))
+    if mask_text:
+        mask = bytes(a & b for a, b in zip(mask, bytes.fromhex(mask_text)))
+    value = bytes(a & b for a, b in zip(value, mask))
+    return offset, value, mask
+
+
+class SignatureEngine:
+    """Matches file headers against a signature database in time independent of its size.
+
+    Each rule is anchored on its most distinctive run of known bytes. Anchors are compiled
+    into one byte trie per offset, so a header is walked once per distinct offset and only
+    rules whose anchor matched are verified. Matches of container formats are refined by
+    an inspector (ZIP -> DOCX/JAR/APK, OLE -> DOC/XLS/MSI, PE -> DLL/SYS).
+    """
+
+    def __init__(self, rules: List[SignatureRule], subtypes: Optional[List[FileSignature]] = None):
+        self.rules = rules
+        self.subtypes: Dict[str, FileSignature] = {}
+        for signature in subtypes or []:
+            self.subtypes.setdefault(signature.extension, signature)
+            self.subtypes.setdefault(signature.mime_type, signature)
+
+        # Prefer the rarest anchor so shared prefixes (RIFF, FORM, ftyp) don't crowd one node
+        frequency = Counter(run for rule in rules for run in set(rule.known_runs()))
+        self.tries: Dict[int, Tuple[List[Dict[int, int]], List[List[SignatureRule]]]] = {}
+        self.depths: Dict[int, int] = {}
+        self.unanchored: List[SignatureRule] = []
+        for rule in rules:
+            runs = rule.known_runs()
+            if not runs:
+                self.unanchored.append(rule)
+                continue
+            offset, anchor = min(runs, key=lambda run: (frequency[run], -len(run[1]), run[0]))
+            children, outputs = self.tries.setdefault(offset, ([{}], [[]]))
+            node = 0
+            for byte in anchor:
+                child = children[node].get(byte)
+                if child is None:
+                    child = children[node][byte] = len(children)
+                    children.append({})
+                    outputs.append([])
+                node = child
+            outputs[node].append(rule)
+            self.depths[offset] = max(self.depths.get(offset, 0), len(anchor))
+
+        self.offsets = sorted(self.tries)
+        self.header_length = max((rule.extent for rule in rules), default=0)
+        logger.info(f"Compiled {len(rules)} signature rules into {len(self.offsets)} anchor tries")
+
+    @classmethod
+    def from_file(cls, path) -> "SignatureEngine":
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+
+        rules, subtypes = [], []
+        for index, spec in enumerate(document["rules"]):
+            try:
+                signature = FileSignature(spec["extension"], spec["mime_type"], spec["description"],
+                                          tuple(spec.get("aliases", ())), spec.get("compressed", False))
+                if "container" in spec:
+                    subtypes.append(signature)
+                    continue
+                patterns = [parse_pattern(*pattern) for pattern in spec["patterns"]]
+                rules.append(SignatureRule(index, signature, patterns, spec.get("inspect"), spec.get("priority", 0)))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid signature rule #{index} in {path}: {e}")
+        return cls(rules, subtypes)
+
+    def match_rule(self, head: bytes) -> Optional[SignatureRule]:
+        best = None
+        for offset in self.offsets:
+            children, outputs = self.tries[offset]
+            node = 0
+            for byte in head[offset:offset + self.depths[offset]]:
+                node = children[node].get(byte)
+                if node is None:
+                    break
+                for rule in outputs[node]:
+                    if (best is None or rule.rank > best.rank) and rule.verify(head):
+                        best = rule
+        for rule in self.unanchored:
+            if (best is None or rule.rank > best.rank) and rule.verify(head):
+                best = rule
+        return best
+
+    def needs_tail(self, head: bytes) -> bool:
+        rule = self.match_rule(head)
+        return rule is not None and rule.inspect in TAIL_INSPECTORS
+
+    def identify(self, head: bytes, tail: bytes = b"", size: Optional[int] = None) -> Optional[FileSignature]:
+        """Best matching signature, refined through the container inspector when the rule has one."""
+        rule = self.match_rule(head)
+        if rule is None:
+            return None
+        if rule.inspect:
+            try:
+                subtype = INSPECTORS[rule.inspect](head, tail, len(head) if size is None else size)
+            except (struct.error, IndexError, UnicodeDecodeError):
+                subtype = None
+            if subtype and subtype in self.subtypes:
+                return self.subtypes[subtype]
+        return rule.signature
+
+
+def zip_entries(head: bytes, tail: bytes, size: int) -> Tuple[List[str], Optional[str]]:
+    """Entry names from the local headers at the start and the central directory at the end,
+    plus the stored "mimetype" member ODF and EPUB put first."""
+    names = []
+    mimetype = None
+    offset = 0
+    while offset + ZIP_LOCAL_HEADER.size <= len(head):
+        (signature, _, flags, method, _, _, _, compressed, _,
+         name_length, extra_length) = ZIP_LOCAL_HEADER.unpack_from(head, offset)
+        if signature != b"PK\x03\x04":
+            break
+        start = offset + ZIP_LOCAL_HEADER.size
+        name = head[start:start + name_length].decode("utf-8", errors="replace")
+        names.append(name)
+        data = start + name_length + extra_length
+        if offset == 0 and name == "mimetype" and method == 0:
+            mimetype = head[data:data + compressed].decode("ascii", errors="replace").strip()
+        # Sizes come after the data when bit 3 is set, the next header can't be located
+        if flags & 0x08 and compressed == 0:
+            break
+        offset = data + compressed
+
+    eocd = tail.rfind(b"PK\x05\x06")
+    if eocd >= 0 and eocd + 20 <= len(tail):
+        _, directory_offset = ZIP_EOCD_OFFSETS.unpack_from(tail, eocd + 12)
+        position = directory_offset - (size - len(tail))
+        if position < 0 or position >= eocd:
+            # Directory starts before the kept tail (or ZIP64): take the entries that are in it
+            position = tail.find(b"PK\x01\x02")
+        while 0 <= position and position + 46 <= eocd and tail[position:position + 4] == b"PK\x01\x02":
+            name_length, extra_length, comment_length = ZIP_CENTRAL_NAMES.unpack_from(tail, position + 28)
+            names.append(tail[position + 46:position + 46 + name_length].decode("utf-8", errors="replace"))
+            position += 46 + name_length + extra_length + comment_length
+    return names, mimetype
+
+
+def inspect_zip(head: bytes, tail: bytes, size: int) -> Optional[str]:
+    names, mimetype = zip_entries(head, tail, size)
+    if mimetype:
+        return mimetype
+    entries = set(names)
+    if "AndroidManifest.xml" in entries:
+        return "apk"
+    if any(name.startswith("Payload/") and ".app/" in name for name in names):
+        return "ipa"
+    if "[Content_Types].xml" in entries or any(name.startswith(("word/", "xl/", "ppt/", "visio/")) for name in names):
+        for prefix, extension in (("word/", "docx"), ("xl/", "xlsx"), ("ppt/", "pptx"), ("visio/", "vsdx")):
+            if any(name.startswith(prefix) for name in names):
+                return extension
+    if "AppxMetadata/AppxBundleManifest.xml" in entries:
+        return "appxbundle"
+    if "AppxManifest.xml" in entries:
+        return "appx"
+    if "FixedDocumentSequence.fdseq" in entries or "FixedDocSeq.fdseq" in entries:
+        return "xps"
+    if "3D/3dmodel.model" in entries:
+        return "3mf"
+    if "doc.kml" in entries:
+        return "kmz"
+    if "META-INF/container.xml" in entries:
+        return "epub"
+    if any(name.endswith(".dist-info/WHEEL") for name in names):
+        return "whl"
+    if any(name.endswith(".nuspec") and "/" not in name for name in names):
+        return "nupkg"
+    if "META-INF/mozilla.rsa" in entries:
+        return "xpi"
+    if "META-INF/MANIFEST.MF" in entries:
+        return "jar"
+    return None
+
+
+def inspect_ole(head: bytes, tail: bytes, size: int) -> Optional[str]:
+    sector_shift, = struct.unpack_from("<H", head, 0x1E)
+    first_directory, = struct.unpack_from("<I", head, 0x30)
+    sector_size = 1 << sector_shift
+    start = (first_directory + 1) * sector_size
+    directory = head[start:start + sector_size]
+    if len(directory) < OLE_ENTRY_SIZE:
+        return None
+
+    subtype = OLE_CLSIDS.get(directory[0x50:0x60])
+    if subtype:
+        return subtype
+    names = set()
+    for offset in range(0, len(directory) - OLE_ENTRY_SIZE + 1, OLE_ENTRY_SIZE):
+        length, = struct.unpack_from("<H", directory, offset + 0x40)
+        if 2 <= length <= 64:
+            names.add(directory[offset:offset + length - 2].decode("utf-16-le", errors="replace"))
+    for stream, extension in (("WordDocument", "doc"), ("Workbook", "xls"), ("Book", "xls"),
+                              ("PowerPoint Document", "ppt"), ("VisioDocument", "vsd"), ("Catalog", "db")):
+        if stream in names:
+            return extension
+    if any(name.startswith("__substg1.0_") or name == "__properties_version1.0" for name in names):
+        return "msg"
+    return None
+
+
+def inspect_pe(head: bytes, tail: bytes, size: int) -> Optional[str]:
+    pe_offset, = struct.unpack_from("<I", head, 0x3C)
+    if head[pe_offset:pe_offset + 4] != b"PE\x00\x00":
+        return None
+    characteristics, = struct.unpack_from("<H", head, pe_offset + 22)
+    subsystem, = struct.unpack_from("<H", head, pe_offset + 24 + 68)
+    if subsystem in PE_SUBSYSTEM_EFI:
+        return "efi"
+    if subsystem == PE_SUBSYSTEM_NATIVE:
+        return "sys"
+    if characteristics & PE_FILE_DLL:
+        return "dll"
+    return None
+
+
+INSPECTORS: Dict[str, Callable[[bytes, bytes, int], Optional[str]]] = {
+    "zip": inspect_zip,
+    "ole": inspect_ole,
+    "pe": inspect_pe,
+}
+TAIL_INSPECTORS = {"zip"}
+
+
+@lru_cache(maxsize=None)
+def load_engine(path: Optional[str] = None) -> SignatureEngine:
+    """The shared engine for a rule file, SIGNATURE_RULES or the bundled database by default."""
+    return SignatureEngine.from_file(path or os.getenv("SIGNATURE_RULES") or DEFAULT_RULES)
+
+
+class SignatureConsumer(ContentConsumer):
+    """Identifies the file type during the single read pass: keeps the head the rules need,
+    and the tail only when the head turned out to be a container that needs it."""
+
+    name = "signature"
+    # The head and tail rules need both fit in the blocks of a partial read
+    partial_ok = True
+
+    def __init__(self, engine: SignatureEngine):
+        self.engine = engine
+        self.head = bytearray()
+        self.tail = b""
+        self.size = 0
+        self.keep_tail: Optional[bool] = None
+
+    def update(self, view: memoryview):
+        self.size += len(view)
+        missing = self.engine.header_length - len(self.head)
+        if missing > 0:
+            self.head += view[:missing]
+        elif self.keep_tail is None:
+            self.keep_tail = self.engine.needs_tail(bytes(self.head))
+        if self.keep_tail is not False:
+            self.tail = (self.tail + view[-TAIL_LENGTH:])[-TAIL_LENGTH:]
+
+    def skip(self, count: int):
+        self.size += count
+
+    def finish(self) -> Dict:
+        return {"signature": self.engine.identify(bytes(self.head), self.tail, self.size)}
@@ -0,0 +1,134 @@
+# app/core/timestamps.py
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .mft import TIME_FIELDS, read_attributes
+
+
+logger = logging.getLogger("api.timestamps")
+
+
+FILETIME_PER_SECOND = 10_000_000
+FILETIME_EPOCH_DIFF = 116444736000000000
+MFT_RECORD = 0
+# Clock slack around the volume's lifetime before a time counts as outside it
+LIFETIME_SLACK = 60 * FILETIME_PER_SECOND
+
+SI_BEFORE_FN = 0x1
+ZEROED_SUBSECOND = 0x2
+BEFORE_VOLUME = 0x4
+AFTER_SCAN = 0x8
+ANOMALIES = (
+    (SI_BEFORE_FN, "si_created_before_fn"),
+    (ZEROED_SUBSECOND, "zeroed_subsecond"),
+    (BEFORE_VOLUME, "before_volume_created"),
+    (AFTER_SCAN, "after_scan_time"),
+)
+# Times that can't predate the volume: creation and MFT change are set on this volume,
+# while $SI modified/accessed legitimately keep the values of a copied or extracted file
+LIFETIME_FIELDS = ("si_crtime", "si_ctime", "fn_crtime", "fn_mtime", "fn_ctime", "fn_atime")
+# Times set through SetFileTime by timestomping tools, usually to whole seconds; modified
+# times are left out since archive and FAT copies routinely round them
+SUBSECOND_FIELDS = ("si_crtime", "si_ctime")
+
+
+def unix_to_filetime(seconds: float) -> int:
+    return int(seconds * FILETIME_PER_SECOND) + FILETIME_EPOCH_DIFF
+
+
+def decode_anomalies(mask: int) -> List[str]:
+    return [name for bit, name in ANOMALIES if mask & bit]
+
+
+def volume_created(fs) -> Optional[int]:
+    """$SI creation time of a volume's $MFT, written when the volume was formatted."""
+    try:
+        entry = fs.open_meta(inode=MFT_RECORD)
+    except Exception as e:
+        logger.warning(f"Unable to read $MFT for the volume creation time: {e}")
+        return None
+    _, times, _ = read_attributes(entry, fs.info.block_size)
+    return times.get("si_crtime") or None
+
+
+def rows_created(times: Dict[str, np.ndarray], file_id: np.ndarray, volume: np.ndarray) -> Dict[int, int]:
+    """Volume creation times from the $MFT rows among the given ones, if any."""
+    rows = np.flatnonzero((file_id == MFT_RECORD) & (times["si_crtime"] > 0))
+    return {int(volume[row]): int(times["si_crtime"][row]) for row in rows}
+
+
+def detect_anomalies(times: Dict[str, np.ndarray], volume: np.ndarray, created: Dict[int, int],
+                     now: int) -> np.ndarray:
+    """Anomaly bitmask per row, computed as whole-column operations. A time of 0 is unknown."""
+    mask = np.zeros(len(volume), dtype=np.uint8)
+
+    si_crtime, fn_crtime = times["si_crtime"], times["fn_crtime"]
+    mask[(si_crtime > 0) & (fn_crtime > 0) & (si_crtime < fn_crtime)] |= SI_BEFORE_FN
+
+    zeroed = np.zeros(len(volume), dtype=bool)
+    for field in SUBSECOND_FIELDS:
+        column = times[field]
+        zeroed |= (column > 0) & (column % FILETIME_PER_SECOND == 0)
+    mask[zeroed] |= ZEROED_SUBSECOND
+
+    lower = np.zeros(len(volume), dtype=np.int64)
+    for index, created_at in created.items():
+        lower[volume == index] = created_at - LIFETIME_SLACK
+    before = np.zeros(len(volume), dtype=bool)
+    for field in LIFETIME_FIELDS:
+        column = times[field]
+        before |= (column > 0) & (column < lower)
+    mask[before] |= BEFORE_VOLUME
+
+    after = np.zeros(len(volume), dtype=bool)
+    for field in TIME_FIELDS:
+        after |= times[field] > now + LIFETIME_SLACK
+    mask[after] |= AFTER_SCAN
+    return mask
+
+
+class TimestampChecker:
+    """Runs the $SI/$FN anomaly pass over whole columns, or over batches when the
+    volume is streamed. Volume creation times are read from each volume's $MFT up front,
+    since a scan filter may keep its row out of the results; a $MFT row seen in the data
+    only stands in when that read failed."""
+
+    def __init__(self, now: Optional[float] = None):
+        self.now = unix_to_filetime(now if now is not None else time.time())
+        self.created: Dict[int, int] = {}
+        self.stats = {"checked": 0, "flagged": 0, **{name: 0 for _, name in ANOMALIES}}
+
+    def add_volumes(self, volumes: List[Dict]):
+        """Creation times of the volumes of an EvidenceSource, by volume index."""
+        for index, volume in enumerate(volumes):
+            created = volume_created(volume["fs"])
+            if created:
+                self.created[index] = created
+
+    def check(self, times: Dict[str, np.ndarray], file_id: np.ndarray, volume: np.ndarray) -> np.ndarray:
+        for index, created in rows_created(times, file_id, volume).items():
+            self.created.setdefault(index, created)
+        mask = detect_anomalies(times, volume, self.created, self.now)
+        self.stats["checked"] += len(mask)
+        self.stats["flagged"] += int(np.count_nonzero(mask))
+        for bit, name in ANOMALIES:
+            self.stats[name] += int(np.count_nonzero(mask & bit))
+        return mask
+
+    def check_batch(self, batch: List[Tuple[str, Dict]]):
+        """Set timestamp_anomalies on formatted entries that don't have it yet."""
+        pending = [metadata for _, metadata in batch
+                   if "timestamp_anomalies" not in metadata and metadata.get("timestamps")]
+        if not pending:
+            return
+        times = {
+            field: np.array([metadata["timestamps"][field] or 0 for metadata in pending], dtype=np.int64)
+            for field in TIME_FIELDS
+        }
+        file_id = np.array([metadata["file_id"] for metadata in pending], dtype=np.uint64)
+        volume = np.array([metadata.get("volume", 0) for metadata in pending], dtype=np.int64)
+        for metadata, mask in zip(pending, self.check(times, file_id, volume).tolist()):
+            metadata["timestamp_anomalies"] = decode_anomalies(mask)
@@ -0,0 +1,137 @@
+# app/core/triage.py
+import time
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger("api.triage")
+
+# Extensions worth a verdict first when a request doesn't name its own: executables and
+# scripts, then documents that carry macros or exploits, then archives that hide either
+DEFAULT_PRIORITY_EXTENSIONS = [
+    "exe", "dll", "scr", "sys", "com", "msi", "ps1", "bat", "cmd", "vbs", "js", "jse", "hta", "lnk",
+    "docm", "xlsm", "pptm", "doc", "xls", "ppt", "rtf", "pdf", "docx", "xlsx", "pptx",
+    "zip", "rar", "7z", "iso", "img",
+]
+# Skipped paths listed per reason in the report; the counts cover all of them
+REPORT_EXAMPLES = 100
+
+TOO_LARGE = "too_large"
+PARTIAL = "above_partial_threshold"
+BYTE_BUDGET = "byte_budget_exhausted"
+TIME_BUDGET = "time_budget_exhausted"
+
+
+def extension(path: str) -> str:
+    name = path.rpartition("/")[2]
+    stem, dot, ext = name.rpartition(".")
+    return ext.lower() if dot and stem else ""
+
+
+class TriagePolicy:
+    """Per-scan limits on content analysis, so a huge device still gets a first verdict fast.
+
+    Files above max_file_bytes are skipped and files above partial_above only get their
+    first and last block read. The byte and time budgets cover the whole scan; once
+    one is spent, the remaining candidates are skipped. /scan and jobs hand files to the
+    pipeline in priority order, so whatever a budget cuts off is the least valuable part:
+    listed extensions first (in list order), then files modified within recent_days,
+    then smaller files first. Every skipped or partially read file is reported with its
+    reason.
+    """
+
+    def __init__(self, max_file_bytes: Optional[int] = None, partial_above: Optional[int] = None,
+                 priority_extensions: Optional[List[str]] = None, recent_days: Optional[float] = None,
+                 byte_budget: Optional[int] = None, time_budget: Optional[float] = None):
+        self.max_file_bytes = max_file_bytes
+        self.partial_above = partial_above
+        extensions = priority_extensions or DEFAULT_PRIORITY_EXTENSIONS
+        self.priority_extensions = [ext.lower().lstrip(".") for ext in extensions]
+        self.tiers = {ext: tier for tier, ext in reversed(list(enumerate(self.priority_extensions)))}
+        self.recent_days = recent_days
+        self.byte_budget = byte_budget
+        self.time_budget = time_budget
+
+        self.started: Optional[float] = None
+        self.bytes_planned = 0
+        self.stats = {"analyzed": 0, "partial": 0, "skipped": 0, "bytes_planned": 0}
+        self.reasons: Dict[str, Dict] = {}
+
+    @classmethod
+    def create(cls, **params) -> Optional["TriagePolicy"]:
+        """A policy for the given request parameters, or None when none of them is set."""
+        if not any(value not in (None, []) for value in params.values()):
+            return None
+        return cls(**params)
+
+    def settings(self) -> Dict:
+        return {
+            "max_file_bytes": self.max_file_bytes,
+            "partial_above": self.partial_above,
+            "priority_extensions": self.priority_extensions,
+            "recent_days": self.recent_days,
+            "byte_budget": self.byte_budget,
+            "time_budget": self.time_budget,
+        }
+
+    def order(self, names: List[str], size: np.ndarray, mtime: np.ndarray) -> np.ndarray:
+        """Row indices, highest value first, from the names, sizes and unix mtimes of every row."""
+        lowest = len(self.priority_extensions)
+        tier = np.fromiter((self.tiers.get(extension(name), lowest) for name in names),
+                           dtype=np.int32, count=len(names))
+        if self.recent_days is not None:
+            stale = mtime < time.time() - self.recent_days * 86400
+        else:
+            stale = np.zeros(len(names), dtype=bool)
+        # lexsort sorts by the last key first
+        return np.lexsort((size, stale, tier))
+
+    def start(self):
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def _record(self, reason: str, path: str, size: int):
+        entry = self.reasons.setdefault(reason, {"files": 0, "bytes": 0, "examples": []})
+        entry["files"] += 1
+        entry["bytes"] += size
+        if len(entry["examples"]) < REPORT_EXAMPLES:
+            entry["examples"].append(path)
+
+    def admit(self, path: str, size: int, partial_bytes: int) -> Optional[Dict]:
+        """Decide for one candidate in processing order: None to analyze it fully, or the
+        {action, reason} recorded on the file when it is read partially or skipped."""
+        self.start()
+        size = size or 0
+        decision = None
+        cost = size
+        if self.max_file_bytes is not None and size > self.max_file_bytes:
+            decision = {"action": "skipped", "reason": TOO_LARGE}
+        elif self.time_budget is not None and time.monotonic() - self.started > self.time_budget:
+            decision = {"action": "skipped", "reason": TIME_BUDGET}
+        else:
+            if self.partial_above is not None and size > self.partial_above:
+                decision = {"action": "partial", "reason": PARTIAL}
+                cost = min(size, partial_bytes)
+            if self.byte_budget is not None and self.bytes_planned + cost > self.byte_budget:
+                decision = {"action": "skipped", "reason": BYTE_BUDGET}
+
+        if decision is None or decision["action"] == "partial":
+            self.bytes_planned += cost
+            self.stats["bytes_planned"] = self.bytes_planned
+            self.stats["analyzed" if decision is None else "partial"] += 1
+        else:
+            self.stats["skipped"] += 1
+        if decision is not None:
+            self._record(decision["reason"], path, size)
+        return decision
+
+    def report(self) -> Dict:
+        elapsed = time.monotonic() - self.started if self.started is not None else 0.0
+        return {
+            "policy": self.settings(),
+            **self.stats,
+            "seconds": round(elapsed, 3),
+            "reasons": self.reasons,
+        }
@@ -1,12 +1,13 @@
 import os
 from dotenv import load_dotenv
 import requests
-from pathlib import Path
 import json
 from datetime import datetime
 import logging
 from typing import Optional, Dict, Any
 
+from .reputation_store import DAY, ReputationStore
+
 
 # Load environment variables
 load_dotenv()
@@ -23,8 +24,12 @@ class VirusScanner:
             self.logger.error("VIRUSTOTAL_API_KEY not found")
             raise ValueError("VIRUSTOTAL_API_KEY not found")
             
-        self.cache_file = Path("hash_cache.json")
-        self.cache = self._load_cache()
+        self.cache = ReputationStore(
+            os.getenv('REPUTATION_DB', 'hash_cache.db'),
+            ttl=float(os.getenv('REPUTATION_TTL_DAYS', '30')) * DAY,
+            negative_ttl=float(os.getenv('REPUTATION_NEGATIVE_TTL_DAYS', '1')) * DAY,
+            legacy_json="hash_cache.json"
+        )
         self.logger.info("VirusScanner initialized successfully")
 
     def _convert_timestamp(self, timestamp):
@@ -36,42 +41,94 @@ class VirusScanner:
             self.logger.error(f"Error converting timestamp: {e}")
             return None  
         
-    def _load_cache(self):
-        try:
-            if self.cache_file.exists():
-                with open(self.cache_file, 'r') as f:
-                    cache_data = json.load(f)
-                    self.logger.info(f"Cache loaded successfully with {len(cache_data)} entries")
-                    return cache_data
-            self.logger.info("No cache file found, creating new cache")
-            return {}
-        except Exception as e:
-            self.logger.error(f"Error loading cache: {e}")
-            return {}
-
     def _save_cache(self):
-        """Save virus scan results to cache"""
+        """Commit buffered virus scan results to the reputation store"""
         try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=4)
+            self.cache.flush()
         except Exception as e:
-            print(f"Error saving cache: {e}")
+            self.logger.error(f"Error saving cache: {e}")
+
+    def _build_result(self, file_hash: str, status_code: int, body: str) -> Dict[str, Any]:
+        """Turn a raw VirusTotal response into the result dict returned and cached by check_hash"""
+        result = {
+            "status_code": status_code,
+            "data": None,
+            "message": "Unknown error",  # Default message
+            "error_details": None,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+        if status_code == 200:
+            try:
+                json_response = json.loads(body)
+
+                # Validate response structure
+                if not isinstance(json_response, dict) or "data" not in json_response:
+                    raise ValueError("Invalid response format from VirusTotal API")
+
+                data = json_response.get("data", {})
+                attrs = data.get("attributes", {})
+
+                filtered_data = {
+                    "last_analysis_stats": attrs.get("last_analysis_stats", {}),
+                    "signature_verified": attrs.get("signature_info", {}).get("verified", False),
+                    "total_votes": attrs.get("total_votes", {}),
+                    "last_analysis_date": self._convert_timestamp(attrs.get("last_analysis_date"))
+                }
+
+                result.update({
+                    "data": filtered_data,
+                    "message": "File analysis complete",
+                    "error_details": None
+                })
+                self.logger.info(f"Successfully parsed data for hash: {file_hash}")
+
+            except (KeyError, ValueError, json.JSONDecodeError) as e:
+                self.logger.error(f"Failed to parse API response for hash {file_hash}: {str(e)}")
+                result.update({
+                    "message": "Error parsing API response",
+                    "error_details": str(e)
+                })
+
+        elif status_code == 404:
+            result["message"] = "File not found in VirusTotal database"
+        elif status_code == 401:
+            result["message"] = "Invalid API key"
+            self.logger.error("API authentication failed")
+        else:
+            result.update({
+                "message": f"Unexpected API response: {status_code}",
+                "error_details": body[:200]  # Limit error text length
+            })
+
+        return result
+
+    def _cached_result(self, file_hash: str, cache_data: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if cache_data is None:
+            cache_data = self.cache.get(file_hash)
+        if cache_data is None:
+            return None
+        self.logger.info(f"Cache hit for hash: {file_hash}")
+
+        # Validate cached data structure
+        if not isinstance(cache_data, dict) or "message" not in cache_data:
+            self.logger.warning(f"Invalid cache data for hash {file_hash}, fetching fresh data")
+            self.cache.delete(file_hash)
+            return None
+        return cache_data
+
+    @staticmethod
+    def _is_cacheable(result: Dict[str, Any]) -> bool:
+        return result["status_code"] in (200, 404) and result["message"] != "Error parsing API response"
 
     # virus_scanner.py
     def check_hash(self, file_hash: str) -> Dict[str, Any]:
         self.logger.info(f"Checking hash: {file_hash}")
         
         try:
-            if file_hash in self.cache:
-                cache_data = self.cache[file_hash]
-                self.logger.info(f"Cache hit for hash: {file_hash}")
-                
-                # Validate cached data structure
-                if not isinstance(cache_data, dict) or "message" not in cache_data:
-                    self.logger.warning(f"Invalid cache data for hash {file_hash}, fetching fresh data")
-                    del self.cache[file_hash]
-                else:
-                    return cache_data
+            cache_data = self._cached_result(file_hash)
+            if cache_data is not None:
+                return cache_data
             
             headers = {
                 "accept": "application/json",
@@ -86,61 +143,11 @@ class VirusScanner:
             )
             
             self.logger.info(f"API Response received - Status: {response.status_code}")
-            
-            result = {
-                "status_code": response.status_code,
-                "data": None,
-                "message": "Unknown error",  # Default message
-                "error_details": None,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-
-            if response.status_code == 200:
-                try:
-                    json_response = response.json()
-                    
-                    # Validate response structure
-                    if not isinstance(json_response, dict) or "data" not in json_response:
-                        raise ValueError("Invalid response format from VirusTotal API")
-                        
-                    data = json_response.get("data", {})
-                    attrs = data.get("attributes", {})
-                    
-                    filtered_data = {
-                        "last_analysis_stats": attrs.get("last_analysis_stats", {}),
-                        "signature_verified": attrs.get("signature_info", {}).get("verified", False),
-                        "total_votes": attrs.get("total_votes", {}),
-                        "last_analysis_date": self._convert_timestamp(attrs.get("last_analysis_date"))
-                    }
-                    
-                    result.update({
-                        "data": filtered_data,
-                        "message": "File analysis complete",
-                        "error_details": None
-                    })
-                    self.logger.info(f"Successfully parsed data for hash: {file_hash}")
-                    
-                except (KeyError, ValueError, json.JSONDecodeError) as e:
-                    self.logger.error(f"Failed to parse API response for hash {file_hash}: {str(e)}")
-                    result.update({
-                        "message": "Error parsing API response",
-                        "error_details": str(e)
-                    })
-                    
-            elif response.status_code == 404:
-                result["message"] = "File not found in VirusTotal database"
-            elif response.status_code == 401:
-                result["message"] = "Invalid API key"
-                self.logger.error("API authentication failed")
-            else:
-                result.update({
-                    "message": f"Unexpected API response: {response.status_code}",
-                    "error_details": response.text[:200]  # Limit error text length
-                })
+            result = self._build_result(file_hash, response.status_code, response.text)
 
             # Cache only valid responses
-            if response.status_code in (200, 404) and result["message"] != "Error parsing API response":
-                self.cache[file_hash] = result
+            if self._is_cacheable(result):
+                self.cache.put(file_hash, result)
                 self._save_cache()
                 self.logger.debug(f"Cached result for hash: {file_hash}")
 
@@ -0,0 +1,262 @@
+# app/core/yara_scanner.py
+import os
+import time
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .image import EvidenceSource
+
+
+logger = logging.getLogger("api.yara")
+
+RULE_SUFFIXES = (".yar", ".yara")
+# Files are matched in windows of CHUNK_SIZE; consecutive windows overlap by CHUNK_OVERLAP
+# so a string straddling a boundary is still seen whole by one of them
+CHUNK_SIZE = 64 * 1024 * 1024
+CHUNK_OVERLAP = 1024 * 1024
+# One file in PROFILE_EVERY per worker has its first window matched against every rule
+# file on its own as well, timing what each one costs
+PROFILE_EVERY = 25
+
+
+def import_yara():
+    try:
+        import yara
+    except ImportError:
+        raise RuntimeError("yara-python is required for YARA scanning")
+    return yara
+
+
+def rule_files(path: str) -> List[Path]:
+    root = Path(path)
+    if root.is_file():
+        return [root]
+    return sorted(p for p in root.rglob("*") if p.suffix.lower() in RULE_SUFFIXES and p.is_file())
+
+
+def rule_namespaces(path: str) -> Dict[str, str]:
+    """Rule files under path by namespace: the file stem, or its path below a directory."""
+    files = rule_files(path)
+    if not files:
+        raise RuntimeError(f"No YARA rules found in {path}")
+    if Path(path).is_file():
+        return {files[0].stem: str(files[0])}
+    return {file.relative_to(path).with_suffix("").as_posix(): str(file) for file in files}
+
+
+def compile_namespaces(namespaces: Dict[str, str], cache_dir: str) -> str:
+    """Compile rule files into one ruleset, returning the compiled ruleset on disk.
+
+    The compiled file is named after a digest of the yara version and every rule source,
+    so unchanged rules are compiled once and later scans only load them.
+    """
+    yara = import_yara()
+    digest = hashlib.sha256(yara.__version__.encode())
+    for namespace, file in namespaces.items():
+        digest.update(namespace.encode() + b"\0" + Path(file).read_bytes() + b"\0")
+
+    cache = Path(cache_dir)
+    compiled = cache / f"{digest.hexdigest()[:32]}.yarc"
+    if compiled.exists():
+        logger.info(f"Using compiled YARA rules {compiled}")
+        return str(compiled)
+
+    start = time.perf_counter()
+    rules = yara.compile(filepaths=namespaces)
+    cache.mkdir(parents=True, exist_ok=True)
+    partial = compiled.with_suffix(f".{os.getpid()}.tmp")
+    rules.save(str(partial))
+    os.replace(partial, compiled)
+    logger.info(f"Compiled {len(namespaces)} YARA rule file(s) into {compiled} in {time.perf_counter() - start:.2f}s")
+    return str(compiled)
+
+
+def compile_rules(path: str, cache_dir: str) -> str:
+    """Compile the rule file or directory at path, each file in its own namespace."""
+    return compile_namespaces(rule_namespaces(path), cache_dir)
+
+
+# Per worker process state, set once by _init_worker
+_worker: Dict = {}
+
+
+def _init_worker(drive: str, compiled: str, chunk_size: int, timeout: int, profiled: Optional[Dict[str, str]]):
+    # Compiled rules and TSK handles don't pickle: every worker loads its own copy
+    yara = import_yara()
+    _worker.update(
+        yara=yara,
+        rules=yara.load(compiled),
+        source=EvidenceSource(drive),
+        chunk_size=chunk_size,
+        timeout=timeout,
+        # Every rule file compiled on its own, for timing them one by one
+        namespaces={namespace: yara.load(path) for namespace, path in (profiled or {}).items()},
+        files=0,
+    )
+
+
+def _window_buffer() -> memoryview:
+    """The worker's window buffer: the overlap carried over plus one chunk, allocated once."""
+    view = _worker.get("window")
+    if view is None:
+        _worker["window"] = view = memoryview(bytearray(CHUNK_OVERLAP + _worker["chunk_size"]))
+    return view
+
+
+def _time_namespaces(window: memoryview) -> Dict[str, float]:
+    """Seconds each rule file takes to match window on its own."""
+    costs = {}
+    for namespace, rules in _worker["namespaces"].items():
+        start = time.perf_counter()
+        rules.match(data=window, timeout=_worker["timeout"])
+        costs[namespace] = time.perf_counter() - start
+    return costs
+
+
+def _scan_entry(metadata: Dict) -> Dict:
+    """Match one file in overlapping chunks read by MFT record number. Runs in a worker."""
+    yara = _worker["yara"]
+    rules = _worker["rules"]
+    chunk_size = _worker["chunk_size"]
+    matches: Dict = {}
+
+    def callback(data):
+        matches.setdefault((data["namespace"], data["rule"]), {
+            "rule": data["rule"],
+            "namespace": data["namespace"],
+            "tags": list(data["tags"]),
+            "meta": data["meta"],
+        })
+        return yara.CALLBACK_CONTINUE
+
+    profile = _worker["namespaces"] and _worker["files"] % PROFILE_EVERY == 0
+    _worker["files"] += 1
+    costs = None
+    bytes_read = 0
+    windows = 0
+    # Each chunk is read in behind the tail of the previous one, so a window is never copied
+    view = _window_buffer()
+    kept = 0
+    with _worker["source"].open_file(metadata) as f:
+        while True:
+            count = f.readinto(view[kept:kept + chunk_size])
+            if not count:
+                break
+            bytes_read += count
+            windows += 1
+            end = kept + count
+            rules.match(data=view[:end], callback=callback, which_callbacks=yara.CALLBACK_MATCHES,
+                        timeout=_worker["timeout"])
+            if profile and costs is None:
+                costs = _time_namespaces(view[:end])
+            kept = min(CHUNK_OVERLAP, end)
+            view[:kept] = view[end - kept:end]
+
+    return {"matches": list(matches.values()), "bytes_read": bytes_read, "windows": windows, "costs": costs}
+
+
+class YaraScanner:
+    """Offline YARA matching of file content in a pool of worker processes.
+
+    Matching runs outside the GIL in separate processes, each with its own evidence handle
+    and copy of the compiled rules, so the hashing threads and the scan loop keep running.
+    Files are read in CHUNK_SIZE windows: memory per worker stays bounded on huge files,
+    at the cost of filesize conditions seeing the window length rather than the file's.
+    Workers read content again instead of receiving it from the hashing pass, which would
+    mean pickling every window across processes; only distinct content that isn't known
+    good gets that second read. Rule costs are measured by matching a sample of windows
+    against every rule file compiled on its own, and reported per rule file.
+    """
+
+    def __init__(self, source, rules: str, workers: Optional[int] = None, cache_dir: Optional[str] = None,
+                 chunk_size: int = CHUNK_SIZE, timeout: int = 60, profile: bool = True):
+        cache_dir = cache_dir or os.getenv("YARA_CACHE_DIR", "yara_cache")
+        namespaces = rule_namespaces(rules)
+        self.compiled = compile_namespaces(namespaces, cache_dir)
+        self.workers = workers or int(os.getenv("YARA_WORKERS", "0")) or os.cpu_count() or 1
+        self.profiling = profile
+        profiled = None
+        if profile:
+            profiled = {namespace: compile_namespaces({namespace: file}, cache_dir)
+                        for namespace, file in namespaces.items()}
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(source.source, self.compiled, max(chunk_size, 2 * CHUNK_OVERLAP), timeout, profiled),
+        )
+        self.rule_matches: Dict[Tuple[str, str], int] = {}
+        # Per rule file: seconds spent matching sampled windows, and how many were sampled
+        self.namespace_costs: Dict[str, List] = {}
+        self.stats = {"files_scanned": 0, "files_matched": 0, "errors": 0, "bytes_scanned": 0,
+                      "windows_scanned": 0, "seconds": 0.0}
+
+    @classmethod
+    def from_env(cls, source) -> Optional["YaraScanner"]:
+        """A scanner over the YARA_RULES file or directory, or None when no rules are configured."""
+        rules = os.getenv("YARA_RULES")
+        if not rules:
+            return None
+        return cls(source, rules, profile=os.getenv("YARA_PROFILE", "1") != "0")
+
+    def scan(self, entries: Iterable[Tuple[str, Dict]]) -> Dict[str, Optional[List[Dict]]]:
+        """Match every (sha256, metadata) entry, keyed by sha256. Identical content is scanned once."""
+        start = time.perf_counter()
+        unique = {}
+        for sha256, metadata in entries:
+            unique.setdefault(sha256, metadata)
+
+        futures = {
+            sha256: self.executor.submit(_scan_entry, {
+                "volume": metadata.get("volume", 0),
+                "file_id": metadata["file_id"],
+                "attribute_id": metadata.get("attribute_id"),
+                "size": metadata["size"],
+            })
+            for sha256, metadata in unique.items()
+        }
+
+        results = {}
+        for sha256, future in futures.items():
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"YARA scan failed for record {unique[sha256]['file_id']}: {e}")
+                self.stats["errors"] += 1
+                results[sha256] = None
+                continue
+            results[sha256] = result["matches"]
+            self.stats["files_scanned"] += 1
+            self.stats["files_matched"] += bool(result["matches"])
+            self.stats["bytes_scanned"] += result["bytes_read"]
+            self.stats["windows_scanned"] += result["windows"]
+            for match in result["matches"]:
+                key = (match["namespace"], match["rule"])
+                self.rule_matches[key] = self.rule_matches.get(key, 0) + 1
+            for namespace, seconds in (result["costs"] or {}).items():
+                cost = self.namespace_costs.setdefault(namespace, [0.0, 0])
+                cost[0] += seconds
+                cost[1] += 1
+        self.stats["seconds"] += time.perf_counter() - start
+        return results
+
+    def slowest_rules(self, limit: int = 20) -> Optional[List[Dict]]:
+        """Rule files by their mean time on a sampled window, the slowest first; None when
+        costs aren't measured. Disabling a costly rule means dropping or fixing its file."""
+        if not self.profiling:
+            return None
+        ranked = sorted(self.namespace_costs.items(), key=lambda item: item[1][0] / item[1][1], reverse=True)
+        rules = []
+        for namespace, (seconds, samples) in ranked[:limit]:
+            rules.append({"namespace": namespace, "mean_ms": round(seconds / samples * 1000, 3), "samples": samples,
+                          "matches": sum(count for (name, _), count in self.rule_matches.items()
+                                         if name == namespace)})
+        return rules
+
+    def summary(self) -> Dict:
+        return {**self.stats, "seconds": round(self.stats["seconds"], 3), "rule_costs": self.slowest_rules()}
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import Dict, Optional, List, Any
 
@@ -5,6 +6,7 @@ class FileTypeAnalysis(BaseModel):
     is_suspicious: bool
     confidence: str
     reasons: List[str]
+    entropy: Optional[float] = None
 
 class DetectedType(BaseModel):
     extension: str
@@ -21,16 +23,45 @@ class VirusScanResult(BaseModel):
     error: Optional[str] = None
     message: Optional[str] = None
 
+class YaraMatch(BaseModel):
+    rule: str
+    namespace: str
+    tags: List[str] = []
+    meta: Dict[str, Any] = {}
+
+class KnownFileMatch(BaseModel):
+    status: str
+    source: str
+
 class HashData(BaseModel):
     md5: Optional[str] = None
     sha256: Optional[str] = None
+    partial_hash: Optional[str] = None
+    ssdeep: Optional[str] = None
+    tlsh: Optional[str] = None
+    known_file: Optional[KnownFileMatch] = None
     virus_scan: Optional[VirusScanResult] = None
+    yara: Optional[List[YaraMatch]] = None
 
 class HiddenAnalysis(BaseModel):
     is_hidden: bool
     hidden_type: str
     reasons: List[str]
     
+class TriageDecision(BaseModel):
+    action: str
+    reason: str
+
+class NTFSTimestamps(BaseModel):
+    si_crtime: Optional[int] = None
+    si_mtime: Optional[int] = None
+    si_ctime: Optional[int] = None
+    si_atime: Optional[int] = None
+    fn_crtime: Optional[int] = None
+    fn_mtime: Optional[int] = None
+    fn_ctime: Optional[int] = None
+    fn_atime: Optional[int] = None
+
 class MFTMetadata(BaseModel):
     size: int
     created: str
@@ -42,10 +73,82 @@ class MFTMetadata(BaseModel):
     permissions: str
     uid: int
     gid: int
+    recoverable: Optional[bool] = None
+    attributes: Optional[List[str]] = None
+    timestamps: Optional[NTFSTimestamps] = None
+    timestamp_anomalies: Optional[List[str]] = None
     hidden_status: Optional[HiddenAnalysis] = None
     hashes: Optional[HashData] = None
     file_type: Optional[FileTypeInfo] = None
+    triage: Optional[TriageDecision] = None
+
+class PathTreeData(BaseModel):
+    # Entry i of data is node nodes[i]; a node's parent index is -1 for the root
+    names: List[str]
+    parents: List[int]
+    nodes: List[int]
 
 class ScanResponse(BaseModel):
     status: str
-    data: Dict[str, MFTMetadata]
\ No newline at end of file
+    data: Dict[str, MFTMetadata]
+    tree: Optional[PathTreeData] = None
+    summary: Optional[Dict[str, Any]] = None
+
+
+class ScanJobRequest(BaseModel):
+    drive: str
+    engine: str = "tsk"
+    hash_workers: int = 4
+    batch_size: int = 256
+    incremental: bool = False
+    recover_deleted: bool = False
+    dedup: bool = False
+    fuzzy: bool = False
+    walk_workers: int = 1
+    include: Optional[List[str]] = None
+    exclude: Optional[List[str]] = None
+    max_depth: Optional[int] = None
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    modified_after: Optional[datetime] = None
+    modified_before: Optional[datetime] = None
+    skip_system: bool = False
+    max_file_bytes: Optional[int] = None
+    partial_above: Optional[int] = None
+    priority_extensions: Optional[List[str]] = None
+    recent_days: Optional[float] = None
+    byte_budget: Optional[int] = None
+    time_budget: Optional[float] = None
+
+class ScanJobStatus(BaseModel):
+    job_id: str
+    drive: str
+    engine: str
+    status: str
+    error: Optional[str] = None
+    created: float
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    files_enumerated: int
+    files_processed: int
+    files_hashed: int
+    files_looked_up: int
+    bytes_read: int
+    bytes_total: int
+    eta_seconds: Optional[float] = None
+
+class ScanJobResults(BaseModel):
+    status: str
+    total: int
+    data: Dict[str, MFTMetadata]
+    summary: Optional[Dict[str, Any]] = None
+
+class SimilarFile(BaseModel):
+    scan_id: str
+    path: str
+
+class SimilarContent(BaseModel):
+    sha256: str
+    ssdeep_score: Optional[int] = None
+    tlsh_distance: Optional[int] = None
+    files: List[SimilarFile]
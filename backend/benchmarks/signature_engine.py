@@ -0,0 +1,46 @@
+# benchmarks/signature_engine.py
+# Run from backend/: python -m benchmarks.signature_engine [rules.json]
+# Pads the database with random rules to show per-file cost stays flat as it grows.
+import sys
+import time
+import random
+import logging
+
+from app.core.signatures import DEFAULT_RULES, FileSignature, SignatureEngine, SignatureRule
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    base = SignatureEngine.from_file(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RULES)
+    rng = random.Random(0)
+    samples = [rng.randbytes(base.header_length) for _ in range(500)]
+    for rule in base.rules[:500]:
+        sample = bytearray(rng.randbytes(base.header_length))
+        for offset, value, _ in rule.raw_patterns:
+            sample[offset:offset + len(value)] = value
+        samples.append(bytes(sample))
+    offsets = sorted({offset for rule in base.rules for offset, _, _ in rule.raw_patterns})
+
+    print(f"{'rules':>8} {'tries':>6} {'trie us/file':>13} {'linear us/file':>15}")
+    for extra in (0, 1000, 10000, 100000):
+        rules = list(base.rules)
+        for i in range(extra):
+            magic = rng.randbytes(rng.randint(4, 8))
+            signature = FileSignature(f"x{i}", "application/octet-stream", "Synthetic")
+            rules.append(SignatureRule(len(rules), signature, [(rng.choice(offsets), magic, b"\xff" * len(magic))]))
+        engine = SignatureEngine(rules)
+
+        started = time.perf_counter()
+        for sample in samples:
+            engine.match_rule(sample)
+        trie_cost = (time.perf_counter() - started) / len(samples) * 1e6
+
+        started = time.perf_counter()
+        for sample in samples:
+            max((rule for rule in rules if rule.verify(sample)), key=lambda rule: rule.rank, default=None)
+        linear_cost = (time.perf_counter() - started) / len(samples) * 1e6
+        print(f"{len(rules):>8} {len(engine.offsets):>6} {trie_cost:>13.1f} {linear_cost:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
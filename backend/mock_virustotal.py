@@ -0,0 +1,73 @@
+# Local stand-in for the VirusTotal v3 /files endpoint, for offline load tests.
+# Usage: python mock_virustotal.py --port 8099 --quota 60 --latency 0.05
+# then set VIRUSTOTAL_API_URL=http://127.0.0.1:8099/api/v3
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+state = {"window_start": time.monotonic(), "count": 0, "lock": threading.Lock()}
+
+def make_handler(args):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *params):
+            if args.verbose:
+                super().log_message(format, *params)
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if not self.path.startswith("/api/v3/files/"):
+                self.send_json(404, {"error": {"code": "NotFoundError"}})
+                return
+            file_hash = self.path.rsplit("/", 1)[-1]
+
+            # Per-minute quota, like the public API
+            with state["lock"]:
+                now = time.monotonic()
+                if now - state["window_start"] >= 60:
+                    state["window_start"], state["count"] = now, 0
+                state["count"] += 1
+                over_quota = args.quota and state["count"] > args.quota
+                retry_after = int(60 - (now - state["window_start"])) + 1
+
+            time.sleep(args.latency)
+            if over_quota:
+                self.send_json(429, {"error": {"code": "QuotaExceededError"}}, {"Retry-After": str(retry_after)})
+                return
+            if random.random() < args.error_rate:
+                self.send_json(503, {"error": {"code": "TransientError"}})
+                return
+            # Hashes ending in 0 are "unknown", everything else gets a canned report
+            if file_hash.endswith("0"):
+                self.send_json(404, {"error": {"code": "NotFoundError"}})
+                return
+            self.send_json(200, {"data": {"id": file_hash, "attributes": {
+                "last_analysis_stats": {"malicious": int(file_hash[-1], 16) % 3, "undetected": 60},
+                "signature_info": {"verified": False},
+                "total_votes": {"harmless": 0, "malicious": 0},
+                "last_analysis_date": int(time.time()),
+            }}})
+
+    return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--quota", type=int, default=0, help="requests per minute before 429, 0 = unlimited")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    print(f"Mock VirusTotal listening on http://127.0.0.1:{args.port}/api/v3")
+    ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args)).serve_forever()
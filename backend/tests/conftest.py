@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+
+# Tests import the backend as `app`, the way main.py does, and share the builders next to them
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND, os.path.dirname(os.path.abspath(__file__))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,163 @@
+# tests/ntfs_image.py
+"""Builders for small synthetic NTFS volumes, enough for the raw $MFT parser and pytsk3-free tests."""
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CLUSTER_SIZE = 4096
+RECORD_SIZE = 1024
+SECTOR_SIZE = 512
+FILETIME_EPOCH_DIFF = 116444736000000000
+# 2020-09-13 12:26:40.1234567 UTC, with a sub-second part so nothing looks timestomped by default
+FILETIME = FILETIME_EPOCH_DIFF + 1600000000 * 10_000_000 + 1234567
+
+IN_USE = 0x01
+DIRECTORY = 0x02
+ROOT = 5
+
+
+def encode_runlist(runs: Sequence[Tuple[Optional[int], int]]) -> bytes:
+    """Encode absolute (lcn, length) runs, lcn None for sparse, as an NTFS runlist."""
+    out = bytearray()
+    previous = 0
+    for lcn, length in runs:
+        length_bytes = length.to_bytes((length.bit_length() + 8) // 8, "little")
+        if lcn is None:
+            out.append(len(length_bytes))
+            out += length_bytes
+            continue
+        delta = lcn - previous
+        previous = lcn
+        delta_bytes = delta.to_bytes(max((delta.bit_length() + 8) // 8, 1), "little", signed=True)
+        out.append(len(length_bytes) | len(delta_bytes) << 4)
+        out += length_bytes + delta_bytes
+    return bytes(out + b"\0")
+
+
+def _pad(data: bytes) -> bytes:
+    return data.ljust((len(data) + 7) // 8 * 8, b"\0")
+
+
+def resident(attr_type: int, content: bytes, name: str = "", attribute_id: int = 0) -> bytes:
+    raw_name = name.encode("utf-16-le")
+    content_offset = len(_pad(bytes(24) + raw_name))
+    length = len(_pad(bytes(content_offset) + content))
+    header = struct.pack("<IIBBHHHIH2x", attr_type, length, 0, len(name), 24, 0, attribute_id,
+                         len(content), content_offset)
+    return _pad((header + raw_name).ljust(content_offset, b"\0") + content)
+
+
+def nonresident(attr_type: int, runs: Sequence[Tuple[Optional[int], int]], size: int, start_vcn: int = 0,
+                name: str = "", attribute_id: int = 0) -> bytes:
+    raw_name = name.encode("utf-16-le")
+    runlist_offset = len(_pad(bytes(64) + raw_name))
+    runlist = encode_runlist(runs)
+    length = len(_pad(bytes(runlist_offset) + runlist))
+    last_vcn = start_vcn + sum(count for _, count in runs) - 1
+    allocated = (size + CLUSTER_SIZE - 1) // CLUSTER_SIZE * CLUSTER_SIZE
+    header = struct.pack("<IIBBHHHQQH6xQQQ", attr_type, length, 1, len(name), 64, 0, attribute_id,
+                         start_vcn, last_vcn, runlist_offset, allocated, size, size)
+    return _pad((header + raw_name).ljust(runlist_offset, b"\0") + runlist)
+
+
+def standard_information(times: Optional[Sequence[int]] = None, dos_flags: int = 0) -> bytes:
+    crtime, mtime, ctime, atime = times or (FILETIME,) * 4
+    return resident(0x10, struct.pack("<QQQQI", crtime, mtime, ctime, atime, dos_flags).ljust(48, b"\0"))
+
+
+def file_name(parent: int, name: str, parent_sequence: int = 0, namespace: int = 1,
+              times: Optional[Sequence[int]] = None) -> bytes:
+    crtime, mtime, ctime, atime = times or (FILETIME,) * 4
+    content = struct.pack("<QQQQQQQIIBB", parent | parent_sequence << 48, crtime, mtime, ctime, atime,
+                          0, 0, 0, 0, len(name), namespace) + name.encode("utf-16-le")
+    return resident(0x30, content)
+
+
+def data(content: bytes, name: str = "", attribute_id: int = 0) -> bytes:
+    return resident(0x80, content, name, attribute_id)
+
+
+def attribute_list(items: Sequence[Tuple[int, int, int]]) -> bytes:
+    """Resident $ATTRIBUTE_LIST from (attribute type, start vcn, record number) tuples."""
+    content = b"".join(struct.pack("<IHBBQQH6x", attr_type, 32, 0, 26, start_vcn, record, 0)
+                       for attr_type, start_vcn, record in items)
+    return resident(0x20, content)
+
+
+def record(number: int, attributes: List[bytes], sequence: int = 1, flags: int = IN_USE, base: int = 0,
+           torn: bool = False) -> bytes:
+    """A FILE record with its update sequence array applied, as it sits on disk.
+    torn leaves one sector tail unmatched, the way an interrupted write does."""
+    body = b"".join(attributes) + struct.pack("<I4x", 0xFFFFFFFF)
+    used = 56 + len(body)
+    header = struct.pack("<4sHHQHHHHIIQH2xI", b"FILE", 48, 3, 0, sequence, 1, 56, flags, used, RECORD_SIZE,
+                         base, 0, number)
+    raw = bytearray((header.ljust(56, b"\0") + body).ljust(RECORD_SIZE, b"\0"))
+    usn = b"\x07\x00"
+    raw[48:50] = usn
+    for i in (1, 2):
+        tail = i * SECTOR_SIZE - 2
+        raw[48 + i * 2:50 + i * 2] = raw[tail:tail + 2]
+        raw[tail:tail + 2] = usn
+    if torn:
+        raw[SECTOR_SIZE * 2 - 2:SECTOR_SIZE * 2] = b"\xff\xff"
+    return bytes(raw)
+
+
+class BytesReader:
+    """In-memory stand-in for pytsk3.Img_Info."""
+
+    def __init__(self, image: bytes):
+        self.image = bytes(image)
+
+    def read(self, offset: int, length: int) -> bytes:
+        return self.image[offset:offset + length]
+
+
+class NTFSImage:
+    """A volume whose $MFT lives in mft_runs, holding the system records a parser needs:
+    $MFT (0), the root directory (5) and $Bitmap (6). Other records are added with put."""
+
+    def __init__(self, clusters: int = 128, mft_runs: Sequence[Tuple[int, int]] = ((4, 8),),
+                 bitmap_lcn: int = 100):
+        self.image = bytearray(clusters * CLUSTER_SIZE)
+        self.mft_runs = list(mft_runs)
+        self.records: Dict[int, bytes] = {}
+        boot = struct.pack("<3s8sHB", b"\xebR\x90", b"NTFS    ", SECTOR_SIZE, CLUSTER_SIZE // SECTOR_SIZE)
+        self.image[:len(boot)] = boot
+        struct.pack_into("<Q", self.image, 0x30, self.mft_runs[0][0])
+        struct.pack_into("<b", self.image, 0x40, -10)
+        struct.pack_into("<Q", self.image, 0x48, 0x1234ABCD)
+        self.image[510:512] = b"\x55\xaa"
+
+        mft_size = sum(count for _, count in self.mft_runs) * CLUSTER_SIZE
+        self.put(0, record(0, [standard_information(), file_name(ROOT, "$MFT", ROOT),
+                               nonresident(0x80, self.mft_runs, mft_size)]))
+        self.put(ROOT, record(ROOT, [standard_information(), file_name(ROOT, ".", ROOT)],
+                              sequence=ROOT, flags=IN_USE | DIRECTORY))
+        self.put(6, record(6, [standard_information(), file_name(ROOT, "$Bitmap", ROOT),
+                               nonresident(0x80, [(bitmap_lcn, 1)], (clusters + 7) // 8)]))
+        self.bitmap_lcn = bitmap_lcn
+        self.mark_allocated(0, 8)
+
+    def record_offset(self, number: int) -> int:
+        position = number * RECORD_SIZE
+        for lcn, count in self.mft_runs:
+            if position < count * CLUSTER_SIZE:
+                return lcn * CLUSTER_SIZE + position
+            position -= count * CLUSTER_SIZE
+        raise ValueError(f"Record {number} lies outside the $MFT")
+
+    def put(self, number: int, raw: bytes):
+        offset = self.record_offset(number)
+        self.image[offset:offset + RECORD_SIZE] = raw
+        self.records[number] = raw
+
+    def write(self, lcn: int, content: bytes):
+        self.image[lcn * CLUSTER_SIZE:lcn * CLUSTER_SIZE + len(content)] = content
+
+    def mark_allocated(self, lcn: int, count: int):
+        for cluster in range(lcn, lcn + count):
+            self.image[self.bitmap_lcn * CLUSTER_SIZE + cluster // 8] |= 1 << cluster % 8
+
+    def reader(self) -> BytesReader:
+        return BytesReader(self.image)
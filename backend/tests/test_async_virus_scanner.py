@@ -0,0 +1,92 @@
+# tests/test_async_virus_scanner.py
+import json
+import time
+import asyncio
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from app.core.async_virus_scanner import AsyncVirusScanner, TokenBucket
+
+KNOWN = "a" * 64
+
+
+def test_token_bucket_bursts_then_limits_rate():
+    async def run():
+        bucket = TokenBucket(rate=20, period=1.0, capacity=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # Two tokens are there at once, the next two take 1/20 s each
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_token_bucket_drain_empties_quota():
+    async def run():
+        bucket = TokenBucket(rate=20, period=1.0, capacity=5)
+        bucket.drain()
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.04
+
+
+@pytest.fixture
+def scanner_env(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("VIRUSTOTAL_API_KEY", "test")
+    monkeypatch.setenv("REPUTATION_DB", str(tmp_path / "reputation.db"))
+
+
+async def serve(calls):
+    throttled = set()
+
+    async def lookup(request):
+        file_hash = request.match_info["hash"]
+        calls.append(file_hash)
+        if file_hash.startswith("b") and file_hash not in throttled:
+            throttled.add(file_hash)
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if file_hash == KNOWN:
+            body = {"data": {"attributes": {"last_analysis_stats": {"malicious": 3}}}}
+            return web.json_response(body)
+        return web.Response(status=404, text=json.dumps({"error": {}}))
+
+    app = web.Application()
+    app.router.add_get("/files/{hash}", lookup)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_batches_share_one_session_and_rate_limit(scanner_env, monkeypatch):
+    async def run():
+        calls = []
+        runner, url = await serve(calls)
+        monkeypatch.setenv("VIRUSTOTAL_API_URL", url)
+        scanner = AsyncVirusScanner(concurrency=2, rate_limit=6000, max_retries=2)
+        try:
+            first = await scanner.check_hashes([KNOWN, KNOWN, "c" * 64])
+            session = scanner.session
+            second = await scanner.check_hashes([KNOWN, "b" * 64])
+            assert scanner.session is session and not session.closed
+        finally:
+            await scanner.close()
+            await runner.cleanup()
+        return scanner, session, calls, first, second
+
+    scanner, session, calls, first, second = asyncio.run(run())
+    assert first[KNOWN]["data"]["last_analysis_stats"] == {"malicious": 3}
+    assert first["c" * 64]["status_code"] == 404
+    assert second["b" * 64]["status_code"] == 404
+    # The repeated hash is looked up once, then served from the cache
+    assert calls.count(KNOWN) == 1
+    assert scanner.stats["cache_hits"] == 1 and scanner.stats["retries"] == 1
+    assert session.closed and scanner.session is None
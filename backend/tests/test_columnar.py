@@ -0,0 +1,109 @@
+# tests/test_columnar.py
+import hashlib
+
+import pytest
+
+pytsk3 = pytest.importorskip("pytsk3")
+
+from app.core.columnar import MAX_GROUP_BATCHES, ColumnarScanResult
+from app.core.mft import format_metadata
+
+
+def raw_entry(file_id, size, **extra):
+    return {"size": size, "crtime": 1600000000, "mtime": 1600000100, "atime": 0, "file_id": file_id,
+            "sequence": 1, "volume": 0, "mode": 0o644, "uid": 0, "gid": 0, "type": pytsk3.TSK_FS_META_TYPE_REG,
+            "flags": pytsk3.TSK_FS_META_FLAG_ALLOC, **extra}
+
+
+ENTRIES = [
+    ("/docs/a.txt", raw_entry(16, 300)),
+    ("/docs/b.txt", raw_entry(17, 100, data_offset=4096, dos_flags=0x2)),
+    ("/c.bin", raw_entry(18, 300, recoverable=False)),
+    ("/docs/a.txt:hidden", raw_entry(16, 5, attribute_id=4)),
+]
+
+
+@pytest.fixture
+def results():
+    return ColumnarScanResult.from_entries(ENTRIES)
+
+
+def test_records_match_the_dict_they_replace(results):
+    assert len(results) == 4
+    assert list(results) == [path for path, _ in ENTRIES]
+    for path, raw in ENTRIES:
+        assert results[path] == format_metadata(raw)
+    # Type and flags are stored once however many rows share them
+    assert len(results.type.values) == 1 and len(results.flags.values) == 1
+
+
+def test_raw_round_trips_optional_fields(results):
+    assert results.raw(0)["data_offset"] is None and results.raw(0)["recoverable"] is None
+    assert results.raw(1)["data_offset"] == 4096 and results.raw(1)["dos_flags"] == 0x2
+    assert results.raw(2)["recoverable"] is False
+    assert results.raw(3)["attribute_id"] == 4
+
+
+def test_mapping_interface(results):
+    assert "/docs/a.txt" in results and "/docs" not in results and "/missing" not in results
+    with pytest.raises(KeyError):
+        results["/docs"]
+    with pytest.raises(KeyError):
+        results["/new.txt"] = {}
+    with pytest.raises(TypeError):
+        del results["/c.bin"]
+
+    results["/c.bin"] = {**results["/c.bin"], "hashes": {"sha256": "cc"}, "file_type": None}
+    assert results["/c.bin"]["hashes"] == {"sha256": "cc"}
+    assert "file_type" not in results["/c.bin"]
+    assert results.completed_rows().tolist() == [2]
+    assert dict(results.items()) == results.as_dict()
+
+
+def test_enrichment_is_stored_in_columns(results):
+    md5, sha256 = hashlib.md5(b"a").hexdigest(), hashlib.sha256(b"a").hexdigest()
+    file_type = {"declared_extension": "txt", "detected_type": {"extension": "txt"}, "analysis": {"reasons": []}}
+    for path in ("/docs/a.txt", "/docs/b.txt"):
+        results[path] = {"hashes": {"md5": md5, "sha256": sha256, "known_file": None}, "file_type": file_type,
+                         "hidden_status": {"is_hidden": False, "hidden_type": "none", "reasons": []}}
+    results["/c.bin"] = {"hashes": {"md5": None, "sha256": None, "partial_hash": "ab" * 16},
+                         "triage": {"action": "partial", "reason": "above_partial_threshold"}}
+
+    assert results["/docs/a.txt"]["hashes"] == {"md5": md5, "sha256": sha256, "known_file": None}
+    assert results["/docs/b.txt"]["file_type"] == file_type
+    assert results["/c.bin"]["hashes"] == {"partial_hash": "ab" * 16, "md5": None, "sha256": None}
+    assert results["/c.bin"]["triage"]["action"] == "partial" and "file_type" not in results["/c.bin"]
+    # Digests live in the binary columns, equal nested values are kept once
+    assert bytes(results.digests["sha256"][32:64]).hex() == sha256
+    assert len(results.encoded["file_type"].values) == 2
+    assert len(results.hash_details.values) == 3
+    # Records are decoded fresh, so changing one never changes the store
+    results["/docs/a.txt"]["file_type"]["declared_extension"] = "exe"
+    assert results["/docs/a.txt"]["file_type"] == file_type
+
+
+def test_batches_keep_same_size_runs_together(results):
+    plain = [[path for path, _ in batch] for batch in results.batches(2)]
+    assert plain == [["/docs/a.txt", "/docs/b.txt"], ["/c.bin", "/docs/a.txt:hidden"]]
+
+    grouped = [[path for path, _ in batch] for batch in results.batches(2, group_above=200)]
+    assert grouped == [["/docs/a.txt:hidden", "/docs/b.txt"], ["/docs/a.txt", "/c.bin"]]
+    # A batch only grows past batch_size to keep a same-size run whole
+    assert [len(batch) for batch in results.batches(1, group_above=200)] == [1, 1, 2]
+
+    ordered = [[path for path, _ in batch] for batch in results.batches(3, order=[2, 0, 1, 3])]
+    assert ordered == [["/c.bin", "/docs/a.txt", "/docs/b.txt"], ["/docs/a.txt:hidden"]]
+
+
+def test_long_same_size_runs_are_split():
+    limit = 2 * MAX_GROUP_BATCHES
+    entries = [(f"/f{index}", raw_entry(16 + index, 4096)) for index in range(2 * limit + 1)]
+    fragments = ColumnarScanResult.from_entries(entries + [("/big", raw_entry(99, 8192))])
+    # The run is cut at the limit, but the last row of the size still gets a same-size neighbour
+    assert [len(batch) for batch in fragments.batches(2, group_above=200)] == [limit, limit + 1, 1]
+
+
+def test_tree_dict_lists_every_row_node(results):
+    tree = results.tree_dict()
+    assert len(tree["nodes"]) == len(results)
+    assert [tree["names"][node] for node in tree["nodes"]] == ["a.txt", "b.txt", "c.bin", "a.txt:hidden"]
@@ -0,0 +1,81 @@
+# tests/test_content.py
+import hashlib
+import io
+import os
+
+from app.core.content import ContentConsumer, ContentReader, HashConsumer, HeaderConsumer
+
+
+class Recorder(ContentConsumer):
+    name = "recorder"
+    partial_ok = True
+
+    def __init__(self):
+        self.chunks = []
+        self.skipped = 0
+
+    def update(self, view):
+        self.chunks.append((view.obj, bytes(view)))
+
+    def skip(self, count):
+        self.skipped += count
+
+    def finish(self):
+        return {"chunks": len(self.chunks)}
+
+
+class CountingFile(io.FileIO):
+    opened = 0
+
+    def __init__(self, path):
+        super().__init__(path, "rb")
+        CountingFile.opened += 1
+
+
+def test_one_read_feeds_every_consumer(tmp_path):
+    content = os.urandom(10000)
+    path = tmp_path / "file.bin"
+    path.write_bytes(content)
+    reader = ContentReader(buffer_size=4096)
+    recorder = Recorder()
+    CountingFile.opened = 0
+
+    result = reader.read(str(path), [HashConsumer(), HeaderConsumer(), recorder],
+                         opener=lambda: CountingFile(str(path)))
+
+    assert CountingFile.opened == 1
+    assert result["bytes_read"] == len(content) and result["chunks"] == 3
+    assert result["hashes"] == {"md5": hashlib.md5(content).hexdigest(),
+                                "sha256": hashlib.sha256(content).hexdigest()}
+    assert result["header"] == content[:8]
+    assert b"".join(chunk for _, chunk in recorder.chunks) == content
+    # Every chunk was a view into the same preallocated buffer
+    assert len({id(buffer) for buffer, _ in recorder.chunks}) == 1
+
+
+def test_buffer_is_reused_across_files(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"abc")
+    reader = ContentReader(buffer_size=16)
+    first, second = Recorder(), Recorder()
+    reader.read(str(path), [first])
+    reader.read(str(path), [second])
+    assert first.chunks[0][0] is second.chunks[0][0]
+
+
+def test_partial_reads_feed_only_partial_consumers(tmp_path):
+    content = os.urandom(10000)
+    path = tmp_path / "file.bin"
+    path.write_bytes(content)
+    reader = ContentReader(buffer_size=4096)
+    recorder, hashes = Recorder(), HashConsumer()
+
+    result = reader.read_partial(str(path), [hashes, recorder], len(content), 1000)
+
+    assert result["bytes_read"] == 2000 and "hashes" not in result
+    assert [chunk for _, chunk in recorder.chunks] == [content[:1000], content[-1000:]]
+    assert recorder.skipped == len(content) - 2000
+    # Same head, tail and size give the same partial hash whatever the middle holds
+    other = tmp_path / "other.bin"
+    other.write_bytes(content[:1000] + bytes(8000) + content[-1000:])
+    assert reader.read_partial(str(other), [], len(content), 1000)["partial_hash"] == result["partial_hash"]
@@ -0,0 +1,69 @@
+# tests/test_entropy.py
+import os
+
+import numpy as np
+import pytest
+
+from app.core.entropy import (SAMPLE_MIN_CHUNK, WINDOW_SIZE, EntropyConsumer, byte_histogram, entropy_reasons,
+                              shannon_entropy)
+
+
+def feed(content, chunk, **kwargs):
+    consumer = EntropyConsumer(**kwargs)
+    view = memoryview(content)
+    for start in range(0, len(content), chunk):
+        consumer.update(view[start:start + chunk])
+    return consumer.finish()["entropy"]
+
+
+def executable_with_payload():
+    # Low-entropy code around a random blob four windows long, starting mid-window
+    filler = bytes(range(16)) * (WINDOW_SIZE // 16)
+    return b"MZ" + filler * 3 + os.urandom(4 * WINDOW_SIZE) + filler * 3
+
+
+def test_pair_histogram_matches_bincount():
+    data = np.frombuffer(os.urandom(100001), dtype=np.uint8)
+    assert np.array_equal(byte_histogram(data), np.bincount(data, minlength=256))
+    assert shannon_entropy(np.bincount(np.zeros(100, dtype=np.uint8), minlength=256)) == 0.0
+    assert shannon_entropy(np.ones(256, dtype=np.int64)) == pytest.approx(8.0)
+
+
+def test_windows_do_not_depend_on_chunking():
+    content = executable_with_payload()
+    whole = feed(content, len(content))
+    assert feed(content, 7777) == whole
+    assert whole["max_window_entropy"] > 7.9
+
+    [region] = whole["high_entropy_regions"]
+    # Windows step by half a window, so the region edges land within that of the payload's
+    start, end = 2 + 3 * WINDOW_SIZE, 2 + 7 * WINDOW_SIZE
+    assert abs(region["offset"] - start) < WINDOW_SIZE // 2
+    assert abs(region["offset"] + region["length"] - end) < WINDOW_SIZE // 2
+
+
+def test_only_executables_get_windows():
+    result = feed(os.urandom(4 * WINDOW_SIZE), WINDOW_SIZE)
+    assert result["entropy"] > 7.9
+    assert result["max_window_entropy"] is None and result["high_entropy_regions"] == []
+
+
+def test_large_buffers_are_sampled():
+    content = os.urandom(2 * SAMPLE_MIN_CHUNK)
+    result = feed(content, SAMPLE_MIN_CHUNK)
+    assert result["sampled"] is True and result["entropy"] == pytest.approx(8.0, abs=0.01)
+    assert feed(content, SAMPLE_MIN_CHUNK, sample_stride=1)["sampled"] is False
+
+
+def test_reasons():
+    encrypted = {"entropy": 7.99, "high_entropy_regions": []}
+    assert entropy_reasons(encrypted, 1 << 20, expected_high=False)[0].startswith("Entropy 7.99")
+    assert entropy_reasons(encrypted, 1 << 20, expected_high=True) == []
+    assert entropy_reasons(encrypted, 100, expected_high=False) == []
+
+    packed = {"entropy": 7.95, "high_entropy_regions": [{"offset": 0, "length": 10 * WINDOW_SIZE, "entropy": 7.97}]}
+    assert entropy_reasons(packed, 10 * WINDOW_SIZE, expected_high=True) == [
+        "Executable is high-entropy throughout (7.97 bits/byte): likely packed"]
+    region = {"entropy": 6.0, "high_entropy_regions": [{"offset": 0x18000, "length": WINDOW_SIZE, "entropy": 7.8}]}
+    assert entropy_reasons(region, 10 * WINDOW_SIZE, expected_high=False) == [
+        "High-entropy region at offset 0x18000 (32768 bytes, 7.80 bits/byte): possibly packed or encrypted code"]
@@ -0,0 +1,95 @@
+# tests/test_export.py
+import sqlite3
+
+import pytest
+
+from app.core.export import COLUMN_NAMES, export_results
+
+METADATA = {
+    "size": 11,
+    "created": "2020-09-13 12:26:40",
+    "modified": "2020-09-13 12:26:40",
+    "accessed": "2020-09-13 12:26:40",
+    "type": "File",
+    "flags": "Allocated",
+    "file_id": 17,
+    "permissions": "rwxrwxrwx",
+    "uid": 0,
+    "gid": 0,
+    "recoverable": True,
+    "attributes": ["hidden", "system"],
+    "timestamps": {"si_crtime": 132445203000000000, "fn_crtime": 132445203001234567},
+    "timestamp_anomalies": ["si_created_before_fn", "zeroed_subsecond"],
+    "triage": {"action": "partial", "reason": "above_partial_threshold"},
+    "hashes": {
+        "md5": "5eb63bbbe01eeed093cb22bb8f5acdc3",
+        "sha256": "b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9",
+        "known_file": {"status": "known_bad"},
+        "virus_scan": {"status_code": 200, "message": "File analysis complete",
+                       "data": {"last_analysis_stats": {"malicious": 4}}},
+        "yara": [{"rule": "Evil"}, {"rule": "Packed"}],
+    },
+    "file_type": {
+        "declared_extension": "txt",
+        "detected_type": {"extension": "exe", "mime_type": "application/x-msdownload"},
+        "analysis": {"is_suspicious": True, "reasons": ["extension mismatch"], "entropy": 7.5},
+    },
+    "hidden_status": {"is_hidden": False, "hidden_type": None, "reasons": []},
+}
+EXPECTED = {
+    "path": "/docs/a.txt",
+    "recoverable": True,
+    "is_suspicious": True,
+    "is_hidden": False,
+    "si_crtime": 132445203000000000,
+    "si_mtime": None,
+    "timestamp_anomalies": "si_created_before_fn, zeroed_subsecond",
+    "known_file": "known_bad",
+    "virus_malicious": 4,
+    "yara_matches": "Evil, Packed",
+    "entropy": 7.5,
+    "triage": "partial: above_partial_threshold",
+}
+ROWS = [("/docs/a.txt", METADATA), ("/docs/empty", {"type": "Directory"})]
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_arrow_formats_round_trip(tmp_path, file_format):
+    pa = pytest.importorskip("pyarrow")
+    path = tmp_path / f"scan.{file_format}"
+    assert export_results(ROWS, str(path), file_format) == 2
+
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        import pyarrow.ipc as ipc
+        table = ipc.open_file(pa.memory_map(str(path))).read_all()
+
+    assert table.column_names == COLUMN_NAMES
+    assert table.schema.field("is_hidden").type == pa.bool_()
+    first, second = table.to_pylist()
+    assert {name: first[name] for name in EXPECTED} == EXPECTED
+    assert second["path"] == "/docs/empty" and second["recoverable"] is None
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = tmp_path / "scan.db"
+    assert export_results(ROWS, str(path), "sqlite") == 2
+
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    first = dict(conn.execute("SELECT * FROM files WHERE path = ?", ("/docs/a.txt",)).fetchone())
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+
+    assert list(first) == COLUMN_NAMES
+    # SQLite has no boolean type, flags come back as 0/1
+    assert {name: first[name] for name in EXPECTED} == {**EXPECTED, "recoverable": 1, "is_suspicious": 1,
+                                                          "is_hidden": 0}
+    assert "files_sha256" in indexes
+
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        export_results(ROWS, str(tmp_path / "scan.csv"), "csv")
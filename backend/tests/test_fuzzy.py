@@ -0,0 +1,75 @@
+# tests/test_fuzzy.py
+import random
+
+import pytest
+
+from app.core.fuzzy import SimilarityIndex, ssdeep_grams, tlsh_bands
+
+SSDEEP = "3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C"
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SimilarityIndex(str(tmp_path / "similarity.db"))
+    index.add_scan("scan1", "image.dd")
+    yield index
+    index.close()
+
+
+def count(index, table, content):
+    return index.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE content = ?", (content,)).fetchone()[0]
+
+
+def test_ssdeep_grams_cover_both_block_sizes_and_collapse_runs():
+    grams = ssdeep_grams("3:aaaaaaabcdefg:hijklmnop,\"name\"")
+    # aaaaaaa collapses to aaa before grams are cut
+    assert (3, "aaabcde") in grams and (3, "aaaaaaa") not in grams
+    assert {size for size, _ in grams} == {3, 6}
+    assert (6, "hijklmn") in grams
+
+
+def test_tlsh_bands_split_the_body():
+    digest = "T1" + "AB" * 3 + "0123456789ABCDEF" * 4 + "00"
+    bands = tlsh_bands(digest)
+    assert len(bands) == 16 and bands[0] == (0, "0123")
+
+
+def test_missing_digests_are_filled_in_later(index):
+    index.add("scan1", [("/a.bin", "sha-a", None, None)])
+    content, ssdeep_digest, tlsh_digest = index.digests("sha-a")
+    assert ssdeep_digest is None and count(index, "ssdeep_grams", content) == 0
+
+    tlsh_digest = "T1" + "0123456789ABCDEF" * 4 + "0011223344"
+    index.add("scan1", [("/copy.bin", "sha-a", SSDEEP, tlsh_digest)])
+    assert index.digests("sha-a") == (content, SSDEEP, tlsh_digest)
+    assert count(index, "ssdeep_grams", content) == len(ssdeep_grams(SSDEEP))
+    assert count(index, "tlsh_bands", content) == len(tlsh_bands(tlsh_digest))
+
+    # Stored digests win over later ones, which are not indexed a second time
+    index.add("scan1", [("/other.bin", "sha-a", "3:zzzzzzzzzz:zzzzzzzzzzzz", None)])
+    assert index.digests("sha-a")[1] == SSDEEP
+    assert count(index, "ssdeep_grams", content) == len(ssdeep_grams(SSDEEP))
+    assert index.conn.execute("SELECT COUNT(*) FROM files WHERE content = ?", (content,)).fetchone()[0] == 3
+
+
+def test_tlsh_candidates_find_near_duplicates(index):
+    tlsh = pytest.importorskip("tlsh")
+    rng = random.Random(7)
+    words = [bytes(rng.choice(b"abcdefghijklmnop") for _ in range(rng.randint(3, 9))) for _ in range(400)]
+    original = b" ".join(rng.choice(words) for _ in range(4000))
+    edited = original[:1000] + b" inserted paragraph " + original[1000:]
+    unrelated = bytes(rng.getrandbits(8) for _ in range(len(original)))
+
+    index.add("scan1", [
+        ("/original.txt", "sha-original", None, tlsh.hash(original)),
+        ("/unrelated.bin", "sha-unrelated", None, tlsh.hash(unrelated)),
+    ])
+    # Added without a TLSH digest first, then filled in: it must still be found
+    index.add("scan1", [("/edited.txt", "sha-edited", None, None)])
+    index.add("scan1", [("/edited.txt", "sha-edited", None, tlsh.hash(edited))])
+
+    similar = index.similar(sha256="sha-original")
+    assert [match["sha256"] for match in similar] == ["sha-edited"]
+    assert similar[0]["files"] == [{"scan_id": "scan1", "path": "/edited.txt"}]
+    assert index.similar(sha256="sha-original", scan_id="other") == []
+    assert index.similar(sha256="missing") == []
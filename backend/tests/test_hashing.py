@@ -0,0 +1,148 @@
+# tests/test_hashing.py
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from app.core.hashing import PARTIAL_BLOCK, ByteBudget, HashJob, HashPipeline
+
+LARGE = 3 * PARTIAL_BLOCK
+
+
+@pytest.fixture
+def files(tmp_path):
+    shared = os.urandom(LARGE)
+    contents = {
+        "twin1": shared,
+        "twin2": shared,
+        # Same size, head and tail as the twins, only the middle differs
+        "lookalike": shared[:PARTIAL_BLOCK] + bytes(PARTIAL_BLOCK) + shared[-PARTIAL_BLOCK:],
+        "loner": os.urandom(LARGE + 1),
+        "small": b"small file",
+    }
+    paths = {}
+    for name, content in contents.items():
+        path = tmp_path / name
+        path.write_bytes(content)
+        paths[name] = str(path)
+    return contents, paths
+
+
+def counting(pipeline):
+    reads = Counter()
+    read, read_partial = pipeline.reader.read, pipeline.reader.read_partial
+
+    def full(path, *args, **kwargs):
+        reads[("full", os.path.basename(path))] += 1
+        return read(path, *args, **kwargs)
+
+    def partial(path, *args, **kwargs):
+        reads[("probe", os.path.basename(path))] += 1
+        return read_partial(path, *args, **kwargs)
+
+    pipeline.reader.read, pipeline.reader.read_partial = full, partial
+    return reads
+
+
+def jobs_for(contents, paths):
+    return [HashJob(name, paths[name], len(content)) for name, content in contents.items()]
+
+
+def test_dedup_probes_only_large_files(files):
+    contents, paths = files
+    pipeline = HashPipeline(workers=2, dedup=True, needs_full=lambda partial: False)
+    reads = counting(pipeline)
+    results = pipeline.hash_files(jobs_for(contents, paths))
+
+    assert reads == Counter({("probe", "twin1"): 1, ("probe", "twin2"): 1, ("probe", "lookalike"): 1,
+                             ("probe", "loner"): 1, ("full", "twin1"): 1, ("full", "twin2"): 1,
+                             ("full", "lookalike"): 1, ("full", "small"): 1})
+    assert results["twin1"]["hashes"]["sha256"] == hashlib.sha256(contents["twin1"]).hexdigest()
+    assert results["lookalike"]["hashes"]["sha256"] != results["twin1"]["hashes"]["sha256"]
+    # No same-size file, so the probe stands in for the full read
+    assert results["loner"]["hashes"]["sha256"] is None and results["loner"]["hashes"]["partial_hash"]
+    stats = pipeline.stats["dedup"]
+    assert stats["duplicates"] == 1 and stats["partial_only"] == 1
+    assert stats["bytes_skipped"] == LARGE + 1 - 2 * PARTIAL_BLOCK
+
+
+def test_dedup_skips_probes_when_every_file_is_read(files):
+    contents, paths = files
+    pipeline = HashPipeline(workers=2, dedup=True, needs_full=lambda partial: True)
+    reads = counting(pipeline)
+    results = pipeline.hash_files(jobs_for(contents, paths))
+
+    assert reads == Counter({("full", name): 1 for name in contents})
+    assert pipeline.stats["dedup"]["probed"] == 0 and pipeline.stats["dedup"]["duplicates"] == 1
+    assert all(result["hashes"]["sha256"] for result in results.values())
+
+
+def test_hard_links_are_read_once(files):
+    contents, paths = files
+    pipeline = HashPipeline(workers=2, dedup=True, needs_full=lambda partial: True)
+    reads = counting(pipeline)
+    jobs = [HashJob("a", paths["small"], 10, content_key=(0, 40)),
+            HashJob("b", paths["small"], 10, content_key=(0, 40))]
+    results = pipeline.hash_files(jobs)
+
+    assert reads == Counter({("full", "small"): 1})
+    assert results["a"]["hashes"] == results["b"]["hashes"]
+    assert results["a"]["hashes"] is not results["b"]["hashes"]
+    assert pipeline.stats["dedup"]["linked"] == 1
+
+
+def test_partial_jobs_read_first_and_last_block(files):
+    contents, paths = files
+    pipeline = HashPipeline(workers=1)
+    reads = counting(pipeline)
+    results = pipeline.hash_files([HashJob("loner", paths["loner"], LARGE + 1, partial=True)])
+
+    assert reads == Counter({("probe", "loner"): 1})
+    assert results["loner"]["bytes_read"] == 2 * PARTIAL_BLOCK
+    assert results["loner"]["hashes"]["md5"] is None
+
+
+def test_jobs_run_in_physical_disk_order():
+    jobs = [HashJob("resident", "r", 10), HashJob("far", "f", 10, physical_offset=9000),
+            HashJob("near", "n", 10, physical_offset=100)]
+    assert [job.key for job in HashPipeline.order_jobs(jobs)] == ["near", "far", "resident"]
+
+
+def test_byte_budget_bounds_bytes_in_flight():
+    budget = ByteBudget(100)
+    peak = []
+
+    def worker(amount):
+        reserved = budget.acquire(amount)
+        peak.append(budget.in_flight)
+        time.sleep(0.01)
+        budget.release(reserved)
+
+    threads = [threading.Thread(target=worker, args=(amount,)) for amount in (60, 60, 30, 500)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A job larger than the whole budget still runs, alone
+    assert max(peak) <= 100 and budget.in_flight == 0
+
+
+def test_full_reads_hash_every_file(files):
+    contents, paths = files
+    pipeline = HashPipeline(workers=3, max_in_flight=PARTIAL_BLOCK, chunk_size=PARTIAL_BLOCK)
+    results = pipeline.hash_files(jobs_for(contents, paths))
+
+    for name, content in contents.items():
+        assert results[name]["hashes"]["md5"] == hashlib.md5(content).hexdigest()
+        assert results[name]["bytes_read"] == len(content)
+    assert pipeline.stats["files"] == len(contents)
+    assert pipeline.stats["bytes"] == sum(len(content) for content in contents.values())
+
+
+def test_unreadable_files_are_counted_as_errors(tmp_path):
+    pipeline = HashPipeline(workers=1)
+    results = pipeline.hash_files([HashJob("gone", str(tmp_path / "gone"), 10)])
+    assert "error" in results["gone"] and pipeline.stats["errors"] == 1
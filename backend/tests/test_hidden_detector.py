@@ -0,0 +1,45 @@
+# tests/test_hidden_detector.py
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytsk3")
+
+from app.core.hidden_detector import HiddenDetector
+from app.core.mft import convert_dos_flags, format_metadata
+from app.core.mft_records import RawNTFSVolume, iter_volume
+from app.core.pipeline import ScanPipeline
+from ntfs_image import ROOT, NTFSImage, data, file_name, record, standard_information
+
+
+@pytest.mark.parametrize("path, flags, hidden_type, reasons", [
+    ("/docs/a.txt", 0x20, "none", []),
+    ("/docs/a.txt", 0x2, "windows_hidden", ["Windows hidden attribute set"]),
+    ("/pagefile.sys", 0x6, "windows_system", ["Windows hidden attribute set", "Windows system attribute set"]),
+    ("/home/.bashrc", 0, "unix_hidden", ["Filename starts with dot"]),
+    ("/.config/settings.ini", 0, "none", []),
+])
+def test_attributes_classify_hidden_files(path, flags, hidden_type, reasons):
+    assert HiddenDetector().analyze_attributes(path, flags) == {
+        "is_hidden": bool(reasons), "hidden_type": hidden_type, "reasons": reasons}
+
+
+def test_flags_come_from_the_mft_pass():
+    image = NTFSImage()
+    image.put(16, record(16, [standard_information(dos_flags=0x4006), file_name(ROOT, "secret.bin", ROOT),
+                              data(b"x")]))
+    entries = dict(iter_volume(RawNTFSVolume(image.reader())))
+    assert entries["/secret.bin"]["dos_flags"] == 0x4006
+    assert format_metadata(entries["/secret.bin"])["attributes"] == ["hidden", "system", "encrypted"]
+    assert convert_dos_flags(0x400 | 0x1) == ["readonly", "reparse_point"]
+
+
+def test_pipeline_never_asks_windows_for_images(monkeypatch):
+    detector = HiddenDetector()
+    monkeypatch.setattr(detector, "analyze_file", lambda path: pytest.fail(f"Win32 lookup for {path}"))
+    pipeline = SimpleNamespace(hidden_detector=detector, source=SimpleNamespace(is_live=False), drive="image.dd")
+
+    assert ScanPipeline.hidden_status(pipeline, "/a.txt", {"dos_flags": 0x2})["hidden_type"] == "windows_hidden"
+    assert ScanPipeline.hidden_status(pipeline, "/a.txt:ads", {"dos_flags": 0, "attribute_id": 3})[
+        "hidden_type"] == "alternate_data_stream"
+    assert ScanPipeline.hidden_status(pipeline, "/a.txt", {}) is None
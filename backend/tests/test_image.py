@@ -0,0 +1,112 @@
+# tests/test_image.py
+import io
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytsk3")
+
+from app.core.content import ContentReader, HashConsumer
+from app.core.image import (EvidenceSource, SplitImgInfo, TskFileObject, find_segments, is_drive_letter,
+                            raw_device_path)
+
+
+def write_segments(tmp_path, names, content, size):
+    paths = []
+    for index, name in enumerate(names):
+        path = tmp_path / name
+        path.write_bytes(content[index * size:(index + 1) * size])
+        paths.append(str(path))
+    return paths
+
+
+def test_drive_letters_map_to_raw_devices():
+    assert is_drive_letter("C:") and is_drive_letter("d:\\")
+    assert not is_drive_letter("C:\\image.dd") and not is_drive_letter("image.001")
+    assert raw_device_path("C:\\") == "\\\\.\\C:"
+
+
+@pytest.mark.parametrize("names", [
+    ["disk.001", "disk.002", "disk.003"],
+    ["disk.aa", "disk.ab", "disk.ac"],
+    ["disk.dd.000", "disk.dd.001", "disk.dd.002"],
+])
+def test_split_images_are_found_from_the_first_segment(tmp_path, names):
+    paths = write_segments(tmp_path, names, bytes(30), 10)
+    assert find_segments(paths[0]) == paths
+
+
+def test_single_files_stay_single(tmp_path):
+    path = tmp_path / "disk.dd"
+    path.write_bytes(b"x")
+    assert find_segments(str(path)) == [str(path)]
+    lone = tmp_path / "lone.001"
+    lone.write_bytes(b"x")
+    assert find_segments(str(lone)) == [str(lone)]
+
+
+def test_split_image_reads_across_segment_boundaries(tmp_path):
+    content = os.urandom(3000)
+    paths = write_segments(tmp_path, ["disk.001", "disk.002", "disk.003"], content, 1024)
+    image = SplitImgInfo(paths)
+    try:
+        assert image.get_size() == 3000
+        assert image.read(1000, 100) == content[1000:1100]
+        assert image.read(0, 3000) == content
+        assert image.read(2900, 500) == content[2900:]
+    finally:
+        image.close()
+
+
+class FakeTskFile:
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def read_random(self, offset, length, *attribute):
+        self.calls.append((offset, length, attribute))
+        return self.content[offset:offset + length]
+
+
+def test_tsk_file_object_streams_a_stream_by_attribute():
+    tsk_file = FakeTskFile(b"0123456789")
+    handle = io.BufferedReader(TskFileObject(tsk_file, attribute_id=3, size=10), buffer_size=4)
+    assert handle.read(6) == b"012345"
+    handle.seek(-2, io.SEEK_END)
+    assert handle.read() == b"89"
+    assert all(attribute[1] == 3 for _, _, attribute in tsk_file.calls)
+
+
+class FakeFS:
+    def __init__(self, files):
+        self.files = files
+        self.opened = []
+
+    def open_meta(self, inode):
+        self.opened.append(inode)
+        content = self.files[inode]
+        tsk_file = FakeTskFile(content)
+        tsk_file.info = SimpleNamespace(meta=SimpleNamespace(size=len(content)))
+        return tsk_file
+
+
+def evidence(*filesystems):
+    source = EvidenceSource.__new__(EvidenceSource)
+    source.source = "image.dd"
+    source.volumes = [{"offset": 0, "fs": fs} for fs in filesystems]
+    return source
+
+
+def test_content_is_read_by_inode_through_the_shared_handle():
+    first, second = FakeFS({40: b"first volume"}), FakeFS({40: b"second volume", 41: b"stream host"})
+    source = evidence(first, second)
+
+    with source.open_file({"file_id": 40}) as f:
+        assert f.read() == b"first volume"
+    result = ContentReader().read("/ignored", [HashConsumer()], opener=source.opener({"file_id": 40, "volume": 1}))
+    assert result["bytes_read"] == len(b"second volume")
+    assert first.opened == [40] and second.opened == [40]
+
+    stream = source.open_file({"file_id": 41, "volume": 1, "attribute_id": 5, "size": 6})
+    assert stream.read() == b"stream"
@@ -0,0 +1,156 @@
+# tests/test_incremental.py
+import asyncio
+import sqlite3
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.incremental import (USN_MAX, USN_RECORD_HEADER, IncrementalScan, SnapshotStore, parse_usn_records,
+                                  read_usn_changes, snapshot_key)
+
+SERIAL = 0x1122334455667788
+JOURNAL_ID = 42
+MTIME = 132444736001234567
+
+
+def usn_record(file_id, sequence=1, major=2):
+    reference = file_id | sequence << 48
+    name = "f.txt".encode("utf-16-le")
+    length = (USN_RECORD_HEADER.size + len(name) + 7) & ~7
+    header = USN_RECORD_HEADER.pack(length, major, 0, reference, 5, 0, 0, 0, 0, 0, 0, len(name),
+                                    USN_RECORD_HEADER.size)
+    return (header + name).ljust(length, b"\0")
+
+
+class FakeJournal:
+    def __init__(self, data, journal_id=JOURNAL_ID, lowest_valid=0):
+        self.streams = {b"$J": data, b"$Max": USN_MAX.pack(0, 0, journal_id, lowest_valid)}
+
+    def __iter__(self):
+        for index, name in enumerate(self.streams):
+            yield SimpleNamespace(info=SimpleNamespace(name=name, type=128, id=index,
+                                                       size=len(self.streams[name])))
+
+    def read_random(self, offset, length, attr_type, attr_id):
+        return list(self.streams.values())[attr_id][offset:offset + length]
+
+
+class FakeFS:
+    def __init__(self, journal=None):
+        self.journal = journal
+
+    def open(self, path):
+        assert path == "/$Extend/$UsnJrnl"
+        if self.journal is None:
+            raise IOError("no journal")
+        return self.journal
+
+
+def source(fs):
+    boot = bytearray(512)
+    struct.pack_into("<Q", boot, 0x48, SERIAL)
+    img = SimpleNamespace(read=lambda offset, length: bytes(boot[:length]))
+    return SimpleNamespace(img=img, volumes=[{"offset": 0, "fs": fs}])
+
+
+def entry(file_id, size=100, mtime=MTIME, sequence=1, sha256="aa", **extra):
+    return {"file_id": file_id, "sequence": sequence, "size": size, "modified": "2020-09-13 12:26:40",
+            "timestamps": {"si_mtime": mtime}, "hashes": {"md5": "m", "sha256": sha256},
+            "file_type": {"mime": "text/plain"}, **extra}
+
+
+def test_usn_records_skip_page_padding():
+    data = usn_record(30) + bytes(16) + usn_record(31, major=3) + usn_record(99)[:20]
+    changed = set()
+    consumed = parse_usn_records(data, changed)
+    assert changed == {30, 31}
+    assert consumed == len(data) - 20
+
+
+def test_journal_changes_are_read_from_the_last_usn():
+    first = usn_record(20)
+    journal = FakeJournal(first + usn_record(21) + usn_record(22))
+    assert read_usn_changes(FakeFS(journal), JOURNAL_ID, len(first)) == (JOURNAL_ID, len(journal.streams[b"$J"]),
+                                                                         {21, 22})
+    # A recreated or wrapped journal, or none at all, means falling back to the MFT itself
+    assert read_usn_changes(FakeFS(journal), JOURNAL_ID + 1, 0)[2] is None
+    assert read_usn_changes(FakeFS(FakeJournal(first, lowest_valid=64)), JOURNAL_ID, 0)[2] is None
+    assert read_usn_changes(FakeFS(), JOURNAL_ID, 0) == (None, None, None)
+
+
+def test_streams_get_their_own_snapshot_key():
+    assert snapshot_key({"file_id": 40}) == 40
+    assert snapshot_key({"file_id": 40, "attribute_id": 3}) != snapshot_key({"file_id": 40, "attribute_id": 4})
+
+
+def test_rescans_reuse_unchanged_entries(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    try:
+        first = IncrementalScan(source(FakeFS()), store)
+        assert first.reusable(entry(20)) is None
+        for file_id in (20, 21, 22):
+            first.record(entry(file_id), reused=False)
+        first.record(entry(23, sha256=None), reused=False)
+        first.commit()
+
+        second = IncrementalScan(source(FakeFS()), store)
+        assert second.reusable(entry(20)) == {"hashes": {"md5": "m", "sha256": "aa"},
+                                              "file_type": {"mime": "text/plain"}}
+        assert second.reusable(entry(21, size=101)) is None
+        assert second.reusable(entry(22, sequence=2)) is None
+        assert second.reusable(entry(23)) is None
+        # Rewritten within the same second: only the 100 ns FILETIME tells
+        assert second.reusable(entry(20, mtime=MTIME + 5000)) is None
+        assert second.reusable(dict(entry(20), timestamps=None)) is None
+        assert second.stats["journal_used"] is False
+    finally:
+        store.close()
+
+
+def test_journal_changes_force_a_rehash(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots.db"))
+    try:
+        first = IncrementalScan(source(FakeFS(FakeJournal(b""))), store)
+        first.record(entry(20), reused=False)
+        first.record(entry(21), reused=False)
+        first.commit()
+
+        # Record 21 was written in place: same size, sequence and mtime, only the journal knows
+        second = IncrementalScan(source(FakeFS(FakeJournal(usn_record(21)))), store)
+        assert second.stats["journal_used"] is True
+        assert second.reusable(entry(20)) is not None
+        assert second.reusable(entry(21)) is None
+    finally:
+        store.close()
+
+
+def test_outdated_snapshots_are_dropped(tmp_path):
+    path = str(tmp_path / "snapshots.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (serial TEXT, file_id INTEGER, sequence INTEGER, size INTEGER, "
+                 "modified TEXT, hashes TEXT, file_type TEXT, PRIMARY KEY (serial, file_id))")
+    conn.execute("INSERT INTO entries VALUES ('A', 20, 1, 100, '2024-01-01', '{}', NULL)")
+    conn.commit()
+    conn.close()
+
+    store = SnapshotStore(path)
+    try:
+        assert store.entries("A") == {}
+        store.save_entries("A", [(20, 1, 100, MTIME, "{}", None)])
+        assert store.entries("A") == {20: (1, 100, MTIME, "{}", None)}
+    finally:
+        store.close()
+
+
+def test_pipeline_close_closes_the_snapshot_store(tmp_path, monkeypatch):
+    pytest.importorskip("pytsk3")
+    from app.core.pipeline import ScanPipeline
+
+    for name in ("VIRUSTOTAL_API_KEY", "YARA_RULES", "KNOWN_HASH_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("SNAPSHOT_DB", str(tmp_path / "snapshots.db"))
+    pipeline = ScanPipeline(SimpleNamespace(source="image.dd", volumes=[]), hash_workers=1, incremental=True)
+    asyncio.run(pipeline.close())
+    with pytest.raises(sqlite3.ProgrammingError):
+        pipeline.incremental.store.conn.execute("SELECT 1")
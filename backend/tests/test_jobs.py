@@ -0,0 +1,142 @@
+# tests/test_jobs.py
+import threading
+
+import pytest
+
+pytsk3 = pytest.importorskip("pytsk3")
+
+from app.core import jobs
+from app.core.jobs import CANCELLED, COMPLETED, ScanJob
+from app.core.pipeline import ScanPipeline
+from app.core.triage import TriagePolicy
+
+FILES = [("/a.txt", 10), ("/b.exe", 20), ("/c.txt", 30), ("/d.exe", 40), ("/e.txt", 50)]
+
+
+def raw_entry(file_id: int, size: int):
+    return {"size": size, "crtime": 0, "mtime": 1600000000, "atime": 0, "file_id": file_id, "mode": 0o777,
+            "uid": 0, "gid": 0, "type": pytsk3.TSK_FS_META_TYPE_REG, "flags": pytsk3.TSK_FS_META_FLAG_ALLOC}
+
+
+class FakeSource:
+    opened = []
+
+    def __init__(self, drive):
+        self.source = drive
+        self.volumes = []
+        self.closed = False
+        FakeSource.opened.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def paused_job(monkeypatch):
+    """Jobs over FILES whose pipeline blocks in its second batch until released, so the
+    first batch is stored and the job is still running."""
+    for name in ("VIRUSTOTAL_API_KEY", "YARA_RULES", "KNOWN_HASH_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(jobs, "EvidenceSource", FakeSource)
+    monkeypatch.setattr(jobs, "iter_mft", lambda source, **kwargs: (
+        (path, raw_entry(16 + index, size)) for index, (path, size) in enumerate(FILES)))
+
+    second_batch = threading.Event()
+    release = threading.Event()
+
+    async def process_batch(self, batch):
+        for _, metadata in batch:
+            metadata["hidden_status"] = {"is_hidden": False}
+        self.processed += 1
+        if self.processed == 2:
+            second_batch.set()
+            release.wait(5)
+
+    monkeypatch.setattr(ScanPipeline, "process_batch", process_batch)
+
+    def start(job):
+        thread = threading.Thread(target=job.run)
+        thread.start()
+        assert second_batch.wait(5)
+        return thread
+
+    yield start, release
+    release.set()
+
+
+def finish(thread, release, job):
+    release.set()
+    thread.join(5)
+    assert job.status == COMPLETED
+
+
+def test_running_triage_job_returns_completed_rows(paused_job):
+    start, release = paused_job
+    job = ScanJob("image.dd", batch_size=2, triage=TriagePolicy(priority_extensions=["exe"]))
+    thread = start(job)
+
+    results = job.results()
+    # Priority order put the two executables first; a prefix of the rows would be a.txt, b.exe
+    assert list(results["data"]) == ["/b.exe", "/d.exe"]
+    assert results["total"] == 2
+    assert list(job.results(offset=1)["data"]) == ["/d.exe"]
+
+    finish(thread, release, job)
+    assert list(job.results()["data"]) == [path for path, _ in FILES]
+    assert list(job.results(offset=1, limit=2)["data"]) == ["/b.exe", "/c.txt"]
+
+
+def test_running_dedup_job_returns_completed_rows(paused_job, monkeypatch):
+    start, release = paused_job
+    monkeypatch.setattr(jobs, "iter_mft", lambda source, **kwargs: (
+        (path, raw_entry(16 + index, size)) for index, (path, size) in enumerate(reversed(FILES))))
+    job = ScanJob("image.dd", batch_size=2, dedup=True)
+    thread = start(job)
+
+    # Dedup batches smallest first, which is the end of the enumeration here
+    assert list(job.results()["data"]) == ["/b.exe", "/a.txt"]
+
+    finish(thread, release, job)
+    assert list(job.results()["data"]) == [path for path, _ in reversed(FILES)]
+
+
+def test_cancelling_during_enumeration_releases_the_pipeline(monkeypatch):
+    for name in ("VIRUSTOTAL_API_KEY", "YARA_RULES", "KNOWN_HASH_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(jobs, "EvidenceSource", FakeSource)
+    closed = []
+
+    async def close(self):
+        closed.append(self)
+
+    monkeypatch.setattr(ScanPipeline, "close", close)
+    job = ScanJob("image.dd")
+
+    def entries(source, **kwargs):
+        for index, (path, size) in enumerate(FILES):
+            if index == 2:
+                job.cancel_event.set()
+            yield path, raw_entry(16 + index, size)
+
+    monkeypatch.setattr(jobs, "iter_mft", entries)
+    job.run()
+    assert job.status == CANCELLED
+    assert closed == [job.pipeline] and FakeSource.opened[-1].closed
+
+
+def test_finished_jobs_are_pruned_and_can_be_deleted():
+    manager = jobs.JobManager(max_concurrent=1, retention=2)
+    finished = []
+    for index in range(3):
+        job = ScanJob(f"image{index}.dd")
+        job.finished = 100.0 + index
+        manager.jobs[job.id] = job
+        finished.append(job)
+    running = ScanJob("running.dd")
+    manager.jobs[running.id] = running
+
+    manager.prune()
+    assert set(manager.jobs) == {finished[1].id, finished[2].id, running.id}
+    # DELETE on a finished job forgets it, on a running one it only cancels
+    assert manager.cancel(finished[2].id) is finished[2] and finished[2].id not in manager.jobs
+    assert manager.cancel(running.id) is running and running.cancelled and running.id in manager.jobs
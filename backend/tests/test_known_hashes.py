@@ -0,0 +1,87 @@
+# tests/test_known_hashes.py
+import hashlib
+import sqlite3
+
+import numpy as np
+import pytest
+
+from app.core.known_hashes import KnownFileFilter, KnownHashSet, build, hash_keys, read_hashes
+
+
+def digests(count, kind="md5", salt="x"):
+    return [getattr(hashlib, kind)(f"{salt}{i}".encode()).hexdigest() for i in range(count)]
+
+
+def file_hashes(md5, sha256):
+    return {"md5": md5, "sha256": sha256}
+
+
+def test_readers_handle_nsrl_csv_sqlite_and_plain_lists(tmp_path):
+    md5s = digests(3)
+    plain = tmp_path / "list.txt"
+    plain.write_text(f"{md5s[0]}  setup.exe\n# comment\nnot-a-hash\n{md5s[1].upper()}\n")
+    assert list(read_hashes(str(plain), "md5")) == [md5s[0], md5s[1].upper()]
+
+    legacy = tmp_path / "NSRLFile.txt"
+    legacy.write_text('"SHA-1","MD5","CRC32","FileName"\n' + "".join(f'"{"0" * 40}","{m}","0","f"\n' for m in md5s))
+    assert list(read_hashes(str(legacy), "md5")) == md5s
+
+    rds = tmp_path / "RDS.db"
+    conn = sqlite3.connect(rds)
+    conn.execute("CREATE TABLE FILE (md5 TEXT, sha256 TEXT)")
+    conn.executemany("INSERT INTO FILE VALUES (?, ?)", [(m, None) for m in md5s + md5s])
+    conn.commit()
+    conn.close()
+    assert sorted(read_hashes(str(rds), "md5")) == sorted(md5s)
+
+
+def test_built_set_answers_membership(tmp_path):
+    known = digests(5000)
+    source = tmp_path / "good.txt"
+    # Duplicates across lines are stored once
+    source.write_text("\n".join(known + known[:100]))
+    output = tmp_path / "good.khdb"
+    assert build([str(source)], str(output), "md5", "good", "stock") == len(known)
+
+    hash_set = KnownHashSet(str(output))
+    try:
+        assert (hash_set.kind, hash_set.category, hash_set.name, hash_set.count) == ("md5", "good", "stock", 5000)
+        assert hash_set.contains(hash_keys(known, "md5")).all()
+        assert not hash_set.contains(hash_keys(digests(5000, salt="y"), "md5")).any()
+        assert hash_set.contains(np.empty((0, 2), dtype=">u8")).tolist() == []
+        assert (np.lexsort((hash_set.table[:, 1], hash_set.table[:, 0])) == np.arange(5000)).all()
+    finally:
+        hash_set.close()
+
+
+def test_known_bad_wins_over_known_good(tmp_path):
+    good, bad = digests(10, salt="good"), digests(3, "sha256", salt="bad")
+    (tmp_path / "good.txt").write_text("\n".join(good))
+    (tmp_path / "bad.txt").write_text("\n".join(bad))
+    build([str(tmp_path / "good.txt")], str(tmp_path / "stock.khdb"), "md5", "good", "stock")
+    build([str(tmp_path / "bad.txt")], str(tmp_path / "blocklist.khdb"), "sha256", "bad", "blocklist")
+
+    known = KnownFileFilter(str(tmp_path))
+    try:
+        other, unknown = digests(2, "sha256", salt="other")
+        hashes = {
+            bad[0]: file_hashes(good[0], bad[0]),
+            other: file_hashes(good[1], other),
+            unknown: file_hashes(digests(1, salt="new")[0], unknown),
+        }
+        assert known.classify(hashes) == {
+            bad[0]: {"status": "known_bad", "source": "blocklist"},
+            other: {"status": "known_good", "source": "stock"},
+        }
+        assert known.stats == {"checked": 3, "known_good": 1, "known_bad": 1}
+    finally:
+        known.close()
+
+
+def test_filter_is_off_without_sets(tmp_path, monkeypatch):
+    monkeypatch.delenv("KNOWN_HASH_DIR", raising=False)
+    assert KnownFileFilter.from_env() is None
+    monkeypatch.setenv("KNOWN_HASH_DIR", str(tmp_path))
+    assert KnownFileFilter.from_env() is None
+    with pytest.raises(ValueError):
+        build([], str(tmp_path / "x.khdb"), "sha1")
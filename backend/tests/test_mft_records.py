@@ -0,0 +1,98 @@
+# tests/test_mft_records.py
+import pytest
+
+pytest.importorskip("pytsk3")
+
+from app.core.mft_records import (RawNTFSVolume, apply_fixups, collect_entries, parse_record, parse_runlist,
+                                  read_entry, scan_volume)
+from ntfs_image import (DIRECTORY, IN_USE, ROOT, NTFSImage, data, encode_runlist, file_name, nonresident,
+                        attribute_list, record, standard_information)
+
+
+def test_fixups_restore_sector_tails():
+    raw = bytearray(record(20, [standard_information(), file_name(ROOT, "a.txt", ROOT)]))
+    assert raw[510:512] == b"\x07\x00"
+    assert apply_fixups(memoryview(raw))
+    assert raw[510:512] == b"\x00\x00"
+
+
+def test_torn_record_is_rejected():
+    raw = bytearray(record(20, [standard_information(), file_name(ROOT, "a.txt", ROOT)], torn=True))
+    assert parse_record(memoryview(raw), 20) is None
+
+
+def test_runlist_round_trip_with_sparse_and_backward_runs():
+    runs = [(100, 4), (None, 2), (50, 3), (70000, 300), (1, 1)]
+    encoded = encode_runlist(runs)
+    assert parse_runlist(encoded, 0, len(encoded)) == runs
+
+
+def test_parse_record_reads_names_data_and_streams():
+    raw = bytearray(record(20, [
+        standard_information(dos_flags=0x2),
+        file_name(ROOT, "REPORT~1.DOC", ROOT, namespace=2),
+        file_name(ROOT, "report.doc", ROOT, namespace=1),
+        data(b"hello"),
+        data(b"zone", name="Zone.Identifier", attribute_id=3),
+    ]))
+    entry = parse_record(memoryview(raw), 20)
+    assert entry["dos_flags"] == 0x2
+    assert [name["name"] for name in entry["names"]] == ["REPORT~1.DOC", "report.doc"]
+    assert entry["data_size"] == 5 and entry["data_resident"] == b"hello"
+    assert entry["streams"] == [{"name": "Zone.Identifier", "id": 3, "size": 4, "runs": None, "resident": b"zone"}]
+
+
+def test_extension_fragments_merge_in_vcn_order():
+    image = NTFSImage()
+    image.put(20, record(20, [standard_information(), file_name(ROOT, "big.bin", ROOT),
+                              nonresident(0x80, [(60, 2)], 6 * 4096)]))
+    # The later fragment sits in the earlier extension record, and neither starts at VCN 0
+    image.put(21, record(21, [nonresident(0x80, [(80, 1)], 0, start_vcn=5)], base=20))
+    image.put(22, record(22, [nonresident(0x80, [(70, 3)], 0, start_vcn=2)], base=20))
+
+    volume = RawNTFSVolume(image.reader())
+    entries, extensions = collect_entries(volume)
+    assert 21 not in entries and 22 not in entries
+    assert entries[20] == ("big.bin", ROOT, ROOT, 1, True) and extensions == {20: [21, 22]}
+    entry = read_entry(volume, 20, extensions[20])
+    assert entry["data_runs"] == [(60, 2), (70, 3), (80, 1)]
+    assert entry["data_size"] == 6 * 4096
+
+
+def test_names_in_extension_records_are_picked():
+    image = NTFSImage()
+    image.put(20, record(20, [standard_information(), file_name(ROOT, "LONGNA~1.TXT", ROOT, namespace=2),
+                              data(b"x")]))
+    image.put(21, record(21, [file_name(ROOT, "long name.txt", ROOT, namespace=1)], base=20))
+
+    entries, _ = collect_entries(RawNTFSVolume(image.reader()))
+    assert entries[20][0] == "long name.txt"
+    assert "/long name.txt" in scan_volume(RawNTFSVolume(image.reader()))
+
+
+def test_fragmented_mft_resolves_attribute_list():
+    image = NTFSImage(mft_runs=((4, 4), (20, 4)))
+    # Record 0 only maps the first 16 records itself, the rest is in extension record 12
+    image.put(0, record(0, [standard_information(), attribute_list([(0x80, 0, 0), (0x80, 4, 12)]),
+                            file_name(ROOT, "$MFT", ROOT), nonresident(0x80, [(4, 4)], 8 * 4096)]))
+    image.put(12, record(12, [nonresident(0x80, [(20, 4)], 0, start_vcn=4)], base=0))
+    image.put(16, record(16, [standard_information(), file_name(ROOT, "docs", ROOT)], flags=IN_USE | DIRECTORY))
+    image.put(20, record(20, [standard_information(), file_name(16, "late.txt", 1), data(b"late")]))
+
+    volume = RawNTFSVolume(image.reader())
+    assert volume.mft_runs == [(4, 4), (20, 4)]
+    assert volume.record_count == 32
+    assert volume.read_record(20)["data_resident"] == b"late"
+    assert "/docs/late.txt" in scan_volume(volume)
+
+
+def test_scan_volume_builds_paths_and_streams():
+    image = NTFSImage()
+    image.put(16, record(16, [standard_information(), file_name(ROOT, "docs", ROOT)], flags=IN_USE | DIRECTORY))
+    image.put(17, record(17, [standard_information(), file_name(16, "a.txt", 1), data(b"hello"),
+                              data(b"x", name="ads", attribute_id=2)]))
+
+    results = scan_volume(RawNTFSVolume(image.reader()))
+    assert results["/docs/a.txt"]["size"] == 5
+    assert "/docs/a.txt:ads" in results
+    assert results["/docs"]["type"] == "Directory"
@@ -0,0 +1,49 @@
+# tests/test_path_tree.py
+import sys
+
+from app.core.path_tree import NO_PARENT, ROOT_NODE, PathTree
+
+
+def test_insert_shares_prefixes_and_rebuilds_paths():
+    tree = PathTree()
+    a = tree.insert("/docs/reports/a.txt")
+    b = tree.insert("/docs/reports/b.txt")
+    assert tree.insert("/docs/reports/a.txt") == a
+    assert tree.names == ["", "docs", "reports", "a.txt", "b.txt"]
+    assert tree.parents[a] == tree.parents[b]
+    assert tree.path(a) == "/docs/reports/a.txt"
+    assert tree.path(tree.parents[a]) == "/docs/reports"
+
+
+def test_find_never_adds_nodes():
+    tree = PathTree()
+    node = tree.insert("/docs/a.txt")
+    assert tree.find("/docs/a.txt") == node
+    assert tree.find("/docs/missing.txt") is None
+    assert tree.find("/other/deeper/a.txt") is None
+    assert len(tree) == 3
+
+
+def test_deep_paths_do_not_recurse():
+    tree = PathTree()
+    depth = sys.getrecursionlimit() * 3
+    path = "".join(f"/d{i}" for i in range(depth))
+    node = tree.insert(f"{path}/leaf")
+    assert len(tree) == depth + 2
+    assert tree.path(node) == f"{path}/leaf"
+
+    # Built node by node, the way the raw engine does, no directory path is memoized yet
+    other = PathTree()
+    parent = ROOT_NODE
+    for i in range(depth):
+        parent = other.child(parent, f"d{i}")
+    leaf = other.child(parent, "leaf")
+    assert other.find(f"{path}/leaf") == leaf
+    assert other.find(f"{path}/missing") is None
+    assert other.insert(f"{path}/leaf") == leaf
+
+
+def test_as_dict_lists_names_and_parents():
+    tree = PathTree()
+    tree.insert("/a/b")
+    assert tree.as_dict() == {"names": ["", "a", "b"], "parents": [NO_PARENT, ROOT_NODE, 1]}
@@ -0,0 +1,55 @@
+# tests/test_recovery.py
+import pytest
+
+pytsk3 = pytest.importorskip("pytsk3")
+
+from app.core.mft_records import RawNTFSVolume, disambiguate, iter_deleted
+from ntfs_image import DIRECTORY, IN_USE, ROOT, NTFSImage, data, file_name, nonresident, record, standard_information
+
+DELETED = 0
+
+
+@pytest.fixture
+def recovered():
+    image = NTFSImage()
+    image.put(16, record(16, [standard_information(), file_name(ROOT, "docs", ROOT)], flags=IN_USE | DIRECTORY))
+    image.put(17, record(17, [standard_information(), file_name(16, "gone.txt", 1),
+                              nonresident(0x80, [(40, 2)], 5000), data(b"zone", name="Zone.Identifier",
+                                                                       attribute_id=3)], flags=DELETED))
+    # Its only cluster went to another file after the delete
+    image.put(18, record(18, [standard_information(), file_name(16, "reused.bin", 1),
+                              nonresident(0x80, [(50, 1)], 100)], flags=DELETED))
+    image.mark_allocated(50, 1)
+    # A deleted directory: its sequence was bumped, its children still carry the old one
+    image.put(19, record(19, [standard_information(), file_name(16, "old", 1)], sequence=2, flags=DIRECTORY))
+    image.put(20, record(20, [standard_information(), file_name(19, "inner.txt", 1), data(b"in")], flags=DELETED))
+    # Allocated, but the parent record was reused by something else
+    image.put(21, record(21, [standard_information(), file_name(25, "lost.txt", 3), data(b"lost")]))
+    image.put(22, record(22, [standard_information(), file_name(16, "live.txt", 1), data(b"live")]))
+    image.put(23, record(23, [standard_information(), data(b"nameless")], flags=DELETED))
+    return dict(iter_deleted(RawNTFSVolume(image.reader())))
+
+
+def test_deleted_and_orphaned_records_are_found(recovered):
+    assert sorted(recovered) == ["/$OrphanFiles/OrphanFile-23", "/$OrphanFiles/lost.txt", "/docs/gone.txt",
+                                 "/docs/gone.txt:Zone.Identifier", "/docs/old", "/docs/old/inner.txt",
+                                 "/docs/reused.bin"]
+    assert recovered["/docs/gone.txt"]["flags"] & pytsk3.TSK_FS_META_FLAG_UNALLOC
+    assert not recovered["/docs/gone.txt"]["flags"] & pytsk3.TSK_FS_META_FLAG_ORPHAN
+    lost = recovered["/$OrphanFiles/lost.txt"]["flags"]
+    assert lost & pytsk3.TSK_FS_META_FLAG_ORPHAN and lost & pytsk3.TSK_FS_META_FLAG_ALLOC
+
+
+def test_recoverable_tracks_the_cluster_bitmap(recovered):
+    assert recovered["/docs/gone.txt"]["recoverable"] is True
+    assert recovered["/docs/gone.txt"]["data_offset"] == 40 * 4096
+    assert recovered["/docs/gone.txt:Zone.Identifier"]["recoverable"] is True
+    assert recovered["/docs/reused.bin"]["recoverable"] is False
+    assert recovered["/docs/old/inner.txt"]["recoverable"] is True
+    assert recovered["/docs/old"]["recoverable"] is None
+
+
+def test_colliding_paths_are_tagged_with_their_record():
+    assert disambiguate("/docs/report.doc", 17) == "/docs/report (record 17).doc"
+    assert disambiguate("/docs/README", 18) == "/docs/README (record 18)"
+    assert disambiguate("/docs/.profile", 19) == "/docs/.profile (record 19)"
@@ -0,0 +1,66 @@
+# tests/test_reputation_store.py
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.reputation_store import ReputationStore
+
+FOUND = {"status_code": 200, "message": "File analysis complete", "data": {}}
+MISSING = {"status_code": 404, "message": "File not found in VirusTotal database", "data": None}
+
+
+def test_results_round_trip_and_expire(tmp_path):
+    store = ReputationStore(str(tmp_path / "r.db"), ttl=60, negative_ttl=-1, legacy_json=None)
+    store.put("a", FOUND)
+    store.put("b", MISSING)
+    # Buffered results are visible before they are committed
+    assert store.get("a") == FOUND
+    store.flush()
+    assert store.get_many(["a", "b", "c"]) == {"a": FOUND}
+    store.close()
+
+
+def test_close_releases_every_thread_and_checkpoints(tmp_path):
+    path = tmp_path / "r.db"
+    store = ReputationStore(str(path), legacy_json=None)
+
+    def worker(index):
+        store.put(f"hash{index}", FOUND)
+        store.flush()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.connections) == 5
+
+    store.close()
+    assert store.connections == []
+    wal = tmp_path / "r.db-wal"
+    assert not wal.exists() or wal.stat().st_size == 0
+
+    reopened = ReputationStore(str(path), legacy_json=None)
+    assert len(reopened) == 4
+    reopened.close()
+
+
+def test_pipeline_close_closes_reputation_store(tmp_path, monkeypatch):
+    pytest.importorskip("aiohttp")
+    from app.core.pipeline import ScanPipeline
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("VIRUSTOTAL_API_KEY", "test")
+    monkeypatch.setenv("REPUTATION_DB", str(tmp_path / "r.db"))
+    monkeypatch.delenv("YARA_RULES", raising=False)
+    monkeypatch.delenv("KNOWN_HASH_DIR", raising=False)
+
+    pipeline = ScanPipeline(SimpleNamespace(source="image.dd", volumes=[]), hash_workers=1)
+    store = pipeline.virus_scanner.cache
+    store.put("a", FOUND)
+    asyncio.run(pipeline.close())
+
+    assert store.connections == [] and store.pending == {}
+    assert ReputationStore(str(tmp_path / "r.db"), legacy_json=None).get("a") == FOUND
@@ -0,0 +1,106 @@
+# tests/test_scan_filter.py
+import sys
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytsk3 = pytest.importorskip("pytsk3")
+
+from app.core.mft import iter_directory
+from app.core.scan_filter import ScanFilter
+
+ROOT_INODE = 5
+MTIME = 1600000000
+
+
+class FakeEntry:
+    """A directory entry; iterating it is read_attributes walking the record's attributes."""
+
+    def __init__(self, name, inode, is_directory, size, reads):
+        meta_type = pytsk3.TSK_FS_META_TYPE_DIR if is_directory else pytsk3.TSK_FS_META_TYPE_REG
+        self.info = SimpleNamespace(name=SimpleNamespace(name=name.encode()), meta=SimpleNamespace(
+            type=meta_type, addr=inode, size=size, crtime=0, mtime=MTIME, atime=0, flags=1, seq=1, mode=0o777,
+            uid=0, gid=0))
+        self.reads = reads
+
+    def __iter__(self):
+        self.reads.append(self.info.name.name.decode())
+        return iter(())
+
+
+class FakeFS:
+    """Directories keyed by inode: {inode: [(name, inode, is_directory, size)]}."""
+
+    def __init__(self, directories):
+        self.directories = directories
+        self.info = SimpleNamespace(block_size=4096, root_inum=ROOT_INODE)
+        self.reads = []
+        self.threads = set()
+
+    def open_dir(self, inode):
+        self.threads.add(threading.get_ident())
+        return [FakeEntry(*child, self.reads) for child in [(".", inode, True, 0)] + self.directories[inode]]
+
+
+def volume():
+    return FakeFS({
+        ROOT_INODE: [("$MFT", 0, False, 4096), ("docs", 10, True, 0), ("System Volume Information", 11, True, 0),
+                     ("big.iso", 12, False, 10 ** 9)],
+        10: [("report.docx", 20, False, 500), ("notes.txt", 21, False, 50), ("archive", 22, True, 0)],
+        11: [("tracking.log", 30, False, 10)],
+        22: [("old.docx", 40, False, 700), ("deeper", 41, True, 0)],
+        41: [("deepest.docx", 50, False, 900)],
+    })
+
+
+def paths(fs, scan_filter=None, **kwargs):
+    return sorted(path for path, _ in iter_directory(fs, scan_filter=scan_filter, **kwargs))
+
+
+def test_without_a_filter_everything_is_listed():
+    assert paths(volume()) == ["/$MFT", "/System Volume Information", "/System Volume Information/tracking.log",
+                               "/big.iso", "/docs", "/docs/archive", "/docs/archive/deeper",
+                               "/docs/archive/deeper/deepest.docx", "/docs/archive/old.docx", "/docs/notes.txt",
+                               "/docs/report.docx"]
+    assert ScanFilter.create(include=None, exclude=[], skip_system=False) is None
+
+
+def test_filters_apply_before_attributes_are_read():
+    fs = volume()
+    scan_filter = ScanFilter(include=["*.DOCX"], exclude=["/docs/archive/deeper"], max_size=800, skip_system=True)
+    assert paths(fs, scan_filter) == ["/docs/archive/old.docx", "/docs/report.docx"]
+    assert sorted(fs.reads) == ["old.docx", "report.docx"]
+
+
+def test_depth_and_time_bounds():
+    assert paths(volume(), ScanFilter(max_depth=1, skip_system=True)) == [
+        "/big.iso", "/docs", "/docs/archive", "/docs/notes.txt", "/docs/report.docx"]
+    after = datetime.fromtimestamp(MTIME + 1, tz=timezone.utc).replace(tzinfo=None)
+    assert paths(volume(), ScanFilter(modified_after=after, include=["*.txt"])) == []
+    assert paths(volume(), ScanFilter(modified_before=MTIME, min_size=600)) == [
+        "/$MFT", "/System Volume Information", "/big.iso", "/docs", "/docs/archive", "/docs/archive/deeper",
+        "/docs/archive/deeper/deepest.docx", "/docs/archive/old.docx"]
+
+
+def test_deep_trees_do_not_recurse():
+    depth = sys.getrecursionlimit() * 2
+    directories = {ROOT_INODE: [("d", 100, True, 0)]}
+    for level in range(depth):
+        directories[100 + level] = [("d", 101 + level, True, 0)]
+    directories[100 + depth] = [("leaf.txt", 99, False, 1)]
+    leaf = [path for path in paths(FakeFS(directories)) if path.endswith("leaf.txt")]
+    assert leaf == ["/d" * (depth + 1) + "/leaf.txt"]
+
+
+def test_workers_list_directories_on_their_own_handles():
+    handles = []
+
+    def open_fs():
+        handles.append(volume())
+        return handles[-1]
+
+    assert paths(volume(), workers=3, open_fs=open_fs) == paths(volume())
+    assert 1 <= len(handles) <= 3
+    assert len({thread for fs in handles for thread in fs.threads}) == len(handles)
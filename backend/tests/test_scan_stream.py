@@ -0,0 +1,95 @@
+# tests/test_scan_stream.py
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytsk3")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.core.pipeline import ScanPipeline
+
+PATHS = [f"/file{i}.txt" for i in range(5)]
+
+
+def metadata(file_id):
+    return {"size": 10, "created": "", "modified": "", "accessed": "", "type": "File", "flags": "Allocated",
+            "file_id": file_id, "permissions": "rwxrwxrwx", "uid": 0, "gid": 0}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for name in ("VIRUSTOTAL_API_KEY", "YARA_RULES", "KNOWN_HASH_DIR"):
+        monkeypatch.delenv(name, raising=False)
+    calls = SimpleNamespace(batches=[], pulled=[], closed=0, sources_closed=0, fail_after=None, threads={})
+
+    def evidence_source(drive):
+        calls.threads["source"] = threading.current_thread()
+        return SimpleNamespace(source=drive, volumes=[], close=lambda: setattr(calls, "sources_closed",
+                                                                               calls.sources_closed + 1))
+
+    pipeline_init = ScanPipeline.__init__
+
+    def init(self, *args, **kwargs):
+        calls.threads["pipeline"] = threading.current_thread()
+        pipeline_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(routes, "EvidenceSource", evidence_source)
+    monkeypatch.setattr(ScanPipeline, "__init__", init)
+
+    def iter_mft(source, **kwargs):
+        for index, path in enumerate(PATHS):
+            calls.pulled.append(path)
+            yield path, metadata(16 + index)
+
+    async def process_batch(self, batch):
+        if calls.fail_after is not None and len(calls.batches) == calls.fail_after:
+            raise RuntimeError("disk went away")
+        # Only the entries of the current batch have been read off the volume
+        calls.batches.append(([path for path, _ in batch], len(calls.pulled)))
+        calls.threads["loop"] = threading.current_thread()
+        for _, entry in batch:
+            entry["attributes"] = ["$DATA"]
+
+    async def close(self):
+        calls.closed += 1
+
+    monkeypatch.setattr(routes, "iter_mft", iter_mft)
+    monkeypatch.setattr(ScanPipeline, "process_batch", process_batch)
+    monkeypatch.setattr(ScanPipeline, "close", close)
+    app = FastAPI()
+    app.include_router(routes.router)
+    return TestClient(app), calls
+
+
+def test_entries_stream_batch_by_batch(client):
+    client, calls = client
+    response = client.get("/scan/stream", params={"drive": "image.dd", "batch_size": 2})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["path"] for line in lines[:-1]] == PATHS
+    assert lines[0]["file_id"] == 16 and lines[0]["attributes"] == ["$DATA"]
+    assert "hashing" in lines[-1]["summary"]
+    assert calls.batches == [(PATHS[0:2], 2), (PATHS[2:4], 4), (PATHS[4:], 5)]
+    assert calls.closed == 1 and calls.sources_closed == 1
+    # Opening the image and building the pipeline never blocked the event loop
+    assert calls.threads["loop"] not in (calls.threads["source"], calls.threads["pipeline"])
+
+
+def test_failures_end_the_stream_with_an_error_line(client):
+    client, calls = client
+    calls.fail_after = 1
+    lines = client.get("/scan/stream", params={"drive": "image.dd", "batch_size": 2}).text.splitlines()
+    assert [json.loads(line)["path"] for line in lines[:2]] == PATHS[:2]
+    assert json.loads(lines[-1]) == {"error": "disk went away"}
+    assert calls.closed == 1 and calls.sources_closed == 1
+
+
+def test_unknown_engines_are_rejected(client):
+    client, _ = client
+    assert client.get("/scan/stream", params={"drive": "image.dd", "engine": "fast"}).status_code == 400
@@ -0,0 +1,114 @@
+# tests/test_signatures.py
+import io
+import os
+import random
+import struct
+import zipfile
+
+import pytest
+
+from app.core.content import ContentReader
+from app.core.signatures import (DEFAULT_RULES, FileSignature, SignatureConsumer, SignatureEngine, SignatureRule,
+                                 parse_pattern)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return SignatureEngine.from_file(DEFAULT_RULES)
+
+
+def archive(members, mimetype=None):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        if mimetype:
+            zf.writestr(zipfile.ZipInfo("mimetype"), mimetype, compress_type=zipfile.ZIP_STORED)
+        for name in members:
+            zf.writestr(name, os.urandom(64))
+    return buffer.getvalue()
+
+
+def pe(characteristics=0x0102, subsystem=2):
+    image = bytearray(0x200)
+    image[:2] = b"MZ"
+    struct.pack_into("<I", image, 0x3C, 0x80)
+    image[0x80:0x84] = b"PE\x00\x00"
+    struct.pack_into("<H", image, 0x80 + 22, characteristics)
+    struct.pack_into("<H", image, 0x80 + 24 + 68, subsystem)
+    return bytes(image)
+
+
+def extension(engine, content):
+    signature = engine.identify(content[:engine.header_length], content[-64 * 1024:], len(content))
+    return signature.extension if signature else None
+
+
+def test_bundled_database_covers_offset_magic(engine):
+    assert len(engine.rules) > 150
+    assert extension(engine, b"\x89PNG\r\n\x1a\n" + bytes(100)) == "png"
+    tar = bytearray(1024)
+    tar[257:262] = b"ustar"
+    assert extension(engine, bytes(tar)) == "tar"
+    iso = bytearray(40000)
+    iso[32769:32774] = b"CD001"
+    assert extension(engine, bytes(iso)) == "iso"
+    assert extension(engine, b"plain text, nothing magic about it") is None
+
+
+@pytest.mark.parametrize("members, mimetype, expected", [
+    (["[Content_Types].xml", "word/document.xml"], None, "docx"),
+    (["META-INF/MANIFEST.MF", "com/example/Main.class"], None, "jar"),
+    (["AndroidManifest.xml", "classes.dex"], None, "apk"),
+    (["content.xml"], "application/vnd.oasis.opendocument.text", "odt"),
+    (["notes.txt"], None, "zip"),
+])
+def test_zip_containers_are_refined(engine, members, mimetype, expected):
+    assert extension(engine, archive(members, mimetype)) == expected
+
+
+def test_pe_subtypes(engine):
+    assert extension(engine, pe()) == "exe"
+    assert extension(engine, pe(characteristics=0x2102)) == "dll"
+    assert extension(engine, pe(subsystem=1)) == "sys"
+
+
+def test_masks_wildcards_and_priority():
+    offset, value, mask = parse_pattern(4, "AB??CD", "FFFFF0")
+    assert (offset, value, mask) == (4, b"\xab\x00\xc0", b"\xff\x00\xf0")
+
+    generic = FileSignature("gen", "application/x-gen", "Generic")
+    specific = FileSignature("spec", "application/x-spec", "Specific")
+    preferred = FileSignature("pref", "application/x-pref", "Preferred")
+    engine = SignatureEngine([
+        SignatureRule(0, generic, [parse_pattern(0, "CAFE")]),
+        SignatureRule(1, specific, [parse_pattern(0, "CAFE"), parse_pattern(8, "??0F", "00FF")]),
+        SignatureRule(2, preferred, [parse_pattern(0, "CAFEBABE")], priority=1),
+    ])
+    assert engine.identify(b"\xca\xfe\x00\x00" + bytes(6)) == generic
+    assert engine.identify(b"\xca\xfe\x00\x00" + bytes(4) + b"\x99\x0f") == specific
+    assert engine.identify(b"\xca\xfe\xba\xbe" + bytes(4) + b"\x99\x0f") == preferred
+
+
+def test_verification_stays_flat_as_rules_grow(engine, monkeypatch):
+    rng = random.Random(1)
+    rules = list(engine.rules)
+    for i in range(5000):
+        magic = rng.randbytes(6)
+        rules.append(SignatureRule(len(rules), FileSignature(f"x{i}", "application/octet-stream", "Synthetic"),
+                                   [(rng.choice((0, 4, 257)), magic, b"\xff" * 6)]))
+    grown = SignatureEngine(rules)
+    verified = []
+    verify = SignatureRule.verify
+    monkeypatch.setattr(SignatureRule, "verify", lambda rule, head: verified.append(rule) or verify(rule, head))
+
+    sample = pe()
+    assert grown.identify(sample).extension == "exe"
+    # Only rules whose anchor matched the header are checked, not all of them
+    assert len(verified) < 10
+
+
+def test_consumer_identifies_during_the_read_pass(engine, tmp_path):
+    content = archive(["[Content_Types].xml", "word/document.xml"] + [f"word/media/{i}.bin" for i in range(2000)])
+    path = tmp_path / "report.bin"
+    path.write_bytes(content)
+    result = ContentReader(buffer_size=16 * 1024).read(str(path), [SignatureConsumer(engine)])
+    assert result["signature"].extension == "docx"
@@ -0,0 +1,84 @@
+# tests/test_streams.py
+from types import SimpleNamespace
+
+import pytest
+
+pytsk3 = pytest.importorskip("pytsk3")
+
+from app.core.mft import SI_HEADER, read_attributes
+from app.core.mft_records import RawNTFSVolume, iter_volume
+from ntfs_image import ROOT, NTFSImage, data, file_name, nonresident, record, standard_information
+
+
+class Attribute:
+    """A pytsk3 Attribute: info plus iteration over its runs."""
+
+    def __init__(self, attr_type, attr_id, name=None, size=0, runs=()):
+        flags = pytsk3.TSK_FS_ATTR_NONRES if runs else pytsk3.TSK_FS_ATTR_RES
+        self.info = SimpleNamespace(type=attr_type, id=attr_id, name=name, size=size, flags=flags)
+        self.runs = [SimpleNamespace(addr=addr) for addr in runs]
+
+    def __iter__(self):
+        return iter(self.runs)
+
+
+class FakeEntry:
+    def __init__(self, attributes):
+        self.attributes = attributes
+
+    def __iter__(self):
+        return iter(self.attributes)
+
+    def read_random(self, offset, length, attr_type, attr_id):
+        return SI_HEADER.pack(1, 2, 3, 4, 0x2)[offset:offset + length]
+
+
+def test_tsk_walk_lists_every_data_stream():
+    entry = FakeEntry([
+        Attribute(pytsk3.TSK_FS_ATTR_TYPE_NTFS_SI, 0),
+        Attribute(pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA, 1, size=10, runs=[30]),
+        Attribute(pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA, 3, name=b"Zone.Identifier", size=26),
+        Attribute(pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA, 4, name=b"payload", size=9000, runs=[50, 60]),
+    ])
+    dos_flags, times, streams = read_attributes(entry, 4096)
+    assert dos_flags == 0x2 and times["si_crtime"] == 1
+    assert streams == [("", 1, 10, 30 * 4096), ("Zone.Identifier", 3, 26, None), ("payload", 4, 9000, 50 * 4096)]
+
+
+def test_attribute_read_errors_are_logged(caplog):
+    class BrokenEntry(FakeEntry):
+        info = SimpleNamespace(meta=SimpleNamespace(addr=42))
+
+        def read_random(self, offset, length, attr_type, attr_id):
+            if attr_type == pytsk3.TSK_FS_ATTR_TYPE_NTFS_FNAME:
+                raise IOError("Read error")
+            return super().read_random(offset, length, attr_type, attr_id)
+
+    entry = BrokenEntry([
+        Attribute(pytsk3.TSK_FS_ATTR_TYPE_NTFS_SI, 0),
+        Attribute(pytsk3.TSK_FS_ATTR_TYPE_NTFS_FNAME, 2),
+        Attribute(pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA, 1, size=10, runs=[30]),
+    ])
+    dos_flags, times, streams = read_attributes(entry, 4096)
+    assert dos_flags == 0x2 and streams == []
+    assert "MFT entry 42: Read error" in caplog.text
+    # Anything but an IO failure is a bug, not an unreadable entry
+    with pytest.raises(AttributeError):
+        read_attributes(FakeEntry([SimpleNamespace()]), 4096)
+
+
+def test_raw_engine_reports_streams_as_child_entries():
+    image = NTFSImage()
+    image.put(16, record(16, [standard_information(), file_name(ROOT, "a.txt", ROOT), data(b"visible"),
+                              data(b"zone", name="Zone.Identifier", attribute_id=3),
+                              nonresident(0x80, [(40, 2)], 6000, name="payload", attribute_id=4)]))
+
+    entries = dict(iter_volume(RawNTFSVolume(image.reader())))
+    assert sorted(path for path in entries if path.startswith("/a.txt")) == [
+        "/a.txt", "/a.txt:Zone.Identifier", "/a.txt:payload"]
+    assert entries["/a.txt"].get("attribute_id") is None and entries["/a.txt"]["size"] == 7
+    zone, payload = entries["/a.txt:Zone.Identifier"], entries["/a.txt:payload"]
+    # Read back later by attribute id from the same record
+    assert (zone["file_id"], zone["attribute_id"], zone["size"], zone["data_offset"]) == (16, 3, 4, None)
+    assert (payload["file_id"], payload["attribute_id"], payload["size"], payload["data_offset"]) == (
+        16, 4, 6000, 40 * 4096)
@@ -0,0 +1,103 @@
+# tests/test_timestamps.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytsk3 = pytest.importorskip("pytsk3")
+
+from app.core.mft import SI_HEADER, TIME_FIELDS
+from app.core.timestamps import (BEFORE_VOLUME, FILETIME_PER_SECOND, SI_BEFORE_FN, ZEROED_SUBSECOND, AFTER_SCAN,
+                                 TimestampChecker, decode_anomalies, detect_anomalies, unix_to_filetime)
+
+NOW = 1700000000
+FORMATTED = unix_to_filetime(1600000000) + 1234567
+LATER = FORMATTED + 86400 * FILETIME_PER_SECOND
+
+
+class FakeMFTEntry:
+    """Just enough of a pytsk3 File for read_attributes to find $STANDARD_INFORMATION."""
+
+    def __init__(self, crtime):
+        self.si = SI_HEADER.pack(crtime, crtime, crtime, crtime, 0x6)
+
+    def __iter__(self):
+        yield SimpleNamespace(info=SimpleNamespace(type=pytsk3.TSK_FS_ATTR_TYPE_NTFS_SI, id=0))
+
+    def read_random(self, offset, length, attr_type, attr_id):
+        return self.si[offset:offset + length]
+
+
+class FakeFS:
+    def __init__(self, crtime=None):
+        self.crtime = crtime
+        self.info = SimpleNamespace(block_size=4096)
+
+    def open_meta(self, inode):
+        assert inode == 0
+        if self.crtime is None:
+            raise IOError("unreadable")
+        return FakeMFTEntry(self.crtime)
+
+
+def columns(rows):
+    times = {field: np.array([row.get(field, LATER) for row in rows], dtype=np.int64) for field in TIME_FIELDS}
+    file_id = np.array([row.get("file_id", 64) for row in rows], dtype=np.uint64)
+    volume = np.array([row.get("volume", 0) for row in rows], dtype=np.int64)
+    return times, file_id, volume
+
+
+def test_each_anomaly_sets_its_bit():
+    rows = [
+        {},
+        {"si_crtime": LATER - FILETIME_PER_SECOND},
+        {"si_crtime": unix_to_filetime(1650000000), "si_ctime": unix_to_filetime(1650000000),
+         "fn_crtime": unix_to_filetime(1600000000)},
+        {"fn_crtime": FORMATTED - 3600 * FILETIME_PER_SECOND},
+        {"si_mtime": unix_to_filetime(NOW + 3600)},
+        {"si_crtime": 0, "fn_crtime": 0},
+    ]
+    times, _, volume = columns(rows)
+    mask = detect_anomalies(times, volume, {0: FORMATTED}, unix_to_filetime(NOW)).tolist()
+    assert mask == [0, SI_BEFORE_FN, ZEROED_SUBSECOND, BEFORE_VOLUME, AFTER_SCAN, 0]
+    assert decode_anomalies(SI_BEFORE_FN | AFTER_SCAN) == ["si_created_before_fn", "after_scan_time"]
+
+
+def test_volume_creation_comes_from_the_mft_itself():
+    checker = TimestampChecker(now=NOW)
+    checker.add_volumes([{"fs": FakeFS(FORMATTED)}, {"fs": FakeFS(None)}])
+    assert checker.created == {0: FORMATTED}
+
+    # No $MFT row among the data, as with skip_system
+    times, file_id, volume = columns([{"fn_crtime": FORMATTED - 7200 * FILETIME_PER_SECOND}])
+    assert checker.check(times, file_id, volume).tolist() == [BEFORE_VOLUME]
+    assert checker.stats["before_volume_created"] == 1
+
+
+def test_mft_row_only_stands_in_when_the_read_failed():
+    checker = TimestampChecker(now=NOW)
+    checker.add_volumes([{"fs": FakeFS(FORMATTED)}, {"fs": FakeFS(None)}])
+    mft_row_time = FORMATTED + 30 * 86400 * FILETIME_PER_SECOND
+    times, file_id, volume = columns([{"file_id": 0, "si_crtime": mft_row_time, "volume": 0},
+                                      {"file_id": 0, "si_crtime": mft_row_time, "volume": 1}])
+    checker.check(times, file_id, volume)
+    assert checker.created == {0: FORMATTED, 1: mft_row_time}
+
+
+def test_check_batch_annotates_formatted_entries():
+    checker = TimestampChecker(now=NOW)
+    checker.created[0] = FORMATTED
+    stomped = {field: LATER for field in TIME_FIELDS}
+    stomped["si_crtime"] = stomped["si_ctime"] = unix_to_filetime(1650000000)
+    batch = [
+        ("/a", {"file_id": 70, "timestamps": stomped}),
+        ("/b", {"file_id": 71, "timestamps": {field: LATER for field in TIME_FIELDS}}),
+        ("/c", {"file_id": 72, "timestamps": None}),
+        ("/d", {"file_id": 73, "timestamps": stomped, "timestamp_anomalies": []}),
+    ]
+    checker.check_batch(batch)
+    assert batch[0][1]["timestamp_anomalies"] == ["zeroed_subsecond"]
+    assert batch[1][1]["timestamp_anomalies"] == []
+    assert "timestamp_anomalies" not in batch[2][1]
+    assert batch[3][1]["timestamp_anomalies"] == []
+    assert checker.stats["checked"] == 2
@@ -0,0 +1,63 @@
+# tests/test_triage.py
+import time
+
+import numpy as np
+
+from app.core import triage
+from app.core.triage import BYTE_BUDGET, PARTIAL, TIME_BUDGET, TOO_LARGE, TriagePolicy, extension
+
+
+def test_extensions_ignore_case_and_dotfiles():
+    assert extension("/a/Setup.EXE") == "exe"
+    assert extension("/a/.bashrc") == ""
+    assert extension("/a/archive.tar.gz") == "gz"
+    assert extension("/a.d/README") == ""
+
+
+def test_order_puts_priority_extensions_then_recent_then_small_first():
+    now = time.time()
+    names = ["old.txt", "new.txt", "tool.exe", "big.txt", "macro.docm", "small.exe"]
+    size = np.array([10, 500, 9000, 10 ** 9, 100, 20], dtype=np.int64)
+    mtime = np.array([now - 90 * 86400, now, now - 90 * 86400, now, now, now], dtype=np.int64)
+    policy = TriagePolicy(priority_extensions=[".EXE", "docm"], recent_days=7)
+    assert [names[row] for row in policy.order(names, size, mtime)] == [
+        "small.exe", "tool.exe", "macro.docm", "new.txt", "big.txt", "old.txt"]
+
+
+def test_admit_applies_limits_in_processing_order():
+    policy = TriagePolicy(max_file_bytes=1000, partial_above=300, byte_budget=700)
+    assert policy.admit("/a", 200, 64) is None
+    assert policy.admit("/b", 5000, 64) == {"action": "skipped", "reason": TOO_LARGE}
+    assert policy.admit("/c", 900, 64) == {"action": "partial", "reason": PARTIAL}
+    assert policy.admit("/d", 300, 64) is None
+    # 200 + 64 + 300 planned, 200 more would pass the budget, a partial read still fits
+    assert policy.admit("/e", 200, 64) == {"action": "skipped", "reason": BYTE_BUDGET}
+    assert policy.admit("/f", 800, 64) == {"action": "partial", "reason": PARTIAL}
+
+    report = policy.report()
+    assert (report["analyzed"], report["partial"], report["skipped"], report["bytes_planned"]) == (2, 2, 2, 628)
+    assert report["reasons"][PARTIAL] == {"files": 2, "bytes": 1700, "examples": ["/c", "/f"]}
+    assert report["reasons"][TOO_LARGE]["examples"] == ["/b"]
+    assert report["policy"]["byte_budget"] == 700
+
+
+def test_time_budget_skips_the_rest(monkeypatch):
+    clock = iter([100.0, 100.5, 103.0])
+    monkeypatch.setattr(triage.time, "monotonic", lambda: next(clock))
+    policy = TriagePolicy(time_budget=2)
+    assert policy.admit("/a", 10, 0) is None
+    assert policy.admit("/b", 10, 0) == {"action": "skipped", "reason": TIME_BUDGET}
+
+
+def test_report_examples_are_capped(monkeypatch):
+    monkeypatch.setattr(triage, "REPORT_EXAMPLES", 3)
+    policy = TriagePolicy(max_file_bytes=0)
+    for i in range(10):
+        policy.admit(f"/f{i}", 1, 0)
+    assert policy.reasons[TOO_LARGE]["files"] == 10
+    assert policy.reasons[TOO_LARGE]["examples"] == ["/f0", "/f1", "/f2"]
+
+
+def test_create_returns_none_without_limits():
+    assert TriagePolicy.create(max_file_bytes=None, priority_extensions=[]) is None
+    assert TriagePolicy.create(max_file_bytes=None, byte_budget=0).byte_budget == 0
@@ -0,0 +1,99 @@
+# tests/test_yara_scanner.py
+import io
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+yara = pytest.importorskip("yara")
+
+from app.core import yara_scanner
+from app.core.yara_scanner import CHUNK_OVERLAP, YaraScanner, compile_rules
+
+RULES = """
+rule Marker { strings: $m = "EVIL-MARKER" condition: $m }
+rule Never { strings: $n = "not in any file" condition: $n }
+"""
+CHUNK = 2 * CHUNK_OVERLAP
+
+
+class FakeSource:
+    def __init__(self, files):
+        self.files = files
+
+    def open_file(self, metadata):
+        return io.BytesIO(self.files[metadata["file_id"]])
+
+
+@pytest.fixture
+def rules_file(tmp_path):
+    path = tmp_path / "rules" / "test.yar"
+    path.parent.mkdir()
+    path.write_text(RULES)
+    return path
+
+
+@pytest.fixture
+def in_process(monkeypatch, tmp_path, rules_file):
+    """A YaraScanner whose worker runs in a thread of this process, over in-memory files."""
+    files = {
+        # The marker straddles the first window boundary
+        16: bytes(CHUNK - 5) + b"EVIL-MARKER" + bytes(CHUNK),
+        17: b"clean" * 100,
+    }
+    compiled = compile_rules(str(rules_file), str(tmp_path / "cache"))
+    monkeypatch.setattr(yara_scanner, "_worker", {
+        "yara": yara, "rules": yara.load(compiled), "source": FakeSource(files),
+        "chunk_size": CHUNK, "timeout": 10, "namespaces": {"test": yara.load(compiled)}, "files": 0,
+    })
+    scanner = YaraScanner(SimpleNamespace(source="image.dd"), str(rules_file), workers=1,
+                          cache_dir=str(tmp_path / "cache"), chunk_size=CHUNK)
+    scanner.executor.shutdown()
+    scanner.executor = ThreadPoolExecutor(1)
+    yield scanner
+    scanner.close()
+
+
+def test_rules_are_compiled_once(tmp_path, rules_file):
+    first = compile_rules(str(rules_file), str(tmp_path / "cache"))
+    assert compile_rules(str(rules_file), str(tmp_path / "cache")) == first
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_overlapping_windows_catch_straddling_strings(in_process):
+    results = in_process.scan([("evil", {"file_id": 16, "size": 2 * CHUNK + 6}),
+                               ("evil", {"file_id": 16, "size": 2 * CHUNK + 6}),
+                               ("clean", {"file_id": 17, "size": 500})])
+    assert [match["rule"] for match in results["evil"]] == ["Marker"]
+    assert results["clean"] == []
+
+    stats = in_process.stats
+    # Identical content is scanned once; windows are counted per read, not per file
+    assert stats["files_scanned"] == 2 and stats["files_matched"] == 1
+    assert stats["windows_scanned"] == 3 + 1
+    assert in_process.rule_matches == {("test", "Marker"): 1}
+    # Every window is matched in place in the worker's one buffer
+    assert len(yara_scanner._worker["window"]) == CHUNK_OVERLAP + CHUNK
+
+
+def test_rule_files_are_timed_on_sampled_windows(in_process, monkeypatch, tmp_path):
+    monkeypatch.setattr(yara_scanner, "PROFILE_EVERY", 2)
+    slow = tmp_path / "rules" / "slow.yar"
+    slow.write_text('rule Slow { strings: $s = /[a-z]{2,}[0-9]+x/ condition: $s }')
+    namespaces = yara_scanner.rule_namespaces(str(tmp_path / "rules"))
+    assert set(namespaces) == {"slow", "test"}
+    yara_scanner._worker["namespaces"] = {
+        namespace: yara.load(yara_scanner.compile_namespaces({namespace: file}, str(tmp_path / "cache")))
+        for namespace, file in namespaces.items()}
+
+    in_process.scan([("evil", {"file_id": 16, "size": 2 * CHUNK + 6}), ("clean", {"file_id": 17, "size": 500}),
+                     ("other", {"file_id": 17, "size": 500})])
+    # Only the first and third file were sampled, each rule file timed on its own
+    assert {namespace: samples for namespace, (_, samples) in in_process.namespace_costs.items()} == {
+        "slow": 2, "test": 2}
+    costs = in_process.summary()["rule_costs"]
+    assert {cost["namespace"]: cost["matches"] for cost in costs} == {"slow": 0, "test": 1}
+    assert costs[0]["mean_ms"] >= costs[1]["mean_ms"] > 0
+
+    in_process.profiling = False
+    assert in_process.summary()["rule_costs"] is None
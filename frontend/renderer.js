@@ -121,6 +121,29 @@ function flattenForSunburst(data, parent = '', result = []) {
     return result;
 }
 
+function flattenTreeForSunburst(data, tree) {
+    // The scan's path tree node indices are the sunburst ids, so nothing is split from path strings
+    const colors = tree.names.map((_, node) => node === 0 ? 'lightgrey' : 'blue');
+    const customdata = tree.names.map(() => '');
+
+    Object.values(data).forEach((value, row) => {
+        const { color, messages } = getColorAndMessages(value);
+        if (color) {
+            const node = tree.nodes[row];
+            colors[node] = color;
+            customdata[node] = messages.join('<br>');
+        }
+    });
+
+    return tree.parents.map((parent, node) => ({
+        id: String(node),
+        parent: parent < 0 ? '' : String(parent),
+        label: tree.names[node] || 'root',
+        color: colors[node],
+        customdata: customdata[node]
+    }));
+}
+
 
 
 document.addEventListener('DOMContentLoaded', () => {
@@ -168,7 +191,7 @@ document.addEventListener('DOMContentLoaded', () => {
     
         try {
             visualizationContainer.style.display = 'block'; // Show container
-            const response = await fetch(`http://127.0.0.1:8000/scan?drive=${encodeURIComponent(drivePath)}`);
+            const response = await fetch(`http://127.0.0.1:8000/scan?drive=${encodeURIComponent(drivePath)}&include_tree=true`);
             const result = await response.json();
 
             console.log("Scan result:", result);
@@ -176,8 +199,9 @@ document.addEventListener('DOMContentLoaded', () => {
             if (result.status === 'success') {
                 // Process the data
                 window.scanResult = result;
-                const restructured = restructureData(result.data);
-                const sunburstData = flattenForSunburst(restructured);
+                const sunburstData = result.tree
+                    ? flattenTreeForSunburst(result.data, result.tree)
+                    : flattenForSunburst(restructureData(result.data));
     
                 // Prepare Plotly data
                 const plotData = [{
@@ -1,23 +1,35 @@
 import json
 import plotly.graph_objects as go
 
-def generate_visualization(json_data):
-    # Existing code but as a function
-    def restructure_json(data):
-        result = {}
-        for key, value in data.items():
-            parts = key.strip('/').split('/')
-            current = result
-            for part in parts[:-1]:
-                current = current.setdefault(part, {})
-            file_or_folder = parts[-1]
-            current.setdefault(file_or_folder, {})
-            color, messages = get_color_based_on_conditions(file_or_folder, value)
-            if color:
-                current[file_or_folder]['color'] = color
-                if messages:
-                    current[file_or_folder]['messages'] = messages
-        return result
+def generate_visualization(json_data, tree=None):
+    # tree is the optional "tree" of the scan response: names and parent indices of every
+    # path component, plus the node of each entry of json_data in order
+    def build_tree(data):
+        # Same shape from the paths alone, each directory prefix resolved once
+        names, parents, nodes = [''], [-1], []
+        directories = {'': 0}
+        for key in data:
+            head, _, name = key.rstrip('/').rpartition('/')
+            parent = directories.get(head)
+            if parent is None:
+                parent = 0
+                prefix = ''
+                for part in head.strip('/').split('/'):
+                    prefix = prefix + '/' + part
+                    node = directories.get(prefix)
+                    if node is None:
+                        node = directories[prefix] = len(names)
+                        names.append(part)
+                        parents.append(parent)
+                    parent = node
+            node = directories.get(key.rstrip('/'))
+            if node is None:
+                node = len(names)
+                names.append(name)
+                parents.append(parent)
+                directories[key.rstrip('/')] = node
+            nodes.append(node)
+        return {'names': names, 'parents': parents, 'nodes': nodes}
 
     def get_color_based_on_conditions(key, value):
         color = None
@@ -39,39 +51,30 @@ def generate_visualization(json_data):
                     messages.append(f"Suspicious file type: {reason}")
         return color, messages
 
-    def flatten_for_sunburst(data, parent='', sunburst_data=[]):
-        if not parent:
-            sunburst_data.append({
-                'id': 'root',
-                'parent': '',
-                'label': 'root',
-                'color': 'lightgrey',
-                'customdata': []
-            })
-        if isinstance(data, dict):
-            for key, value in data.items():
-                new_parent = 'root' if parent == '' else parent
-                color = None
-                label = key
-                messages = []
-                if isinstance(value, dict):
-                    color = value.get('color', None)
-                    if 'messages' in value:
-                        messages = value['messages']
-                    messages_str = '<br>'.join(messages)
-                    sunburst_data.append({
-                        'id': new_parent + '/' + key,
-                        'parent': new_parent,
-                        'label': label,
-                        'color': color if color else 'blue',
-                        'customdata': messages_str
-                    })
-                    flatten_for_sunburst(value, new_parent + '/' + key, sunburst_data)
-        return sunburst_data
+    def flatten_for_sunburst(data, tree):
+        # Node indices are the sunburst ids, so nothing is rebuilt from path strings
+        names, parents = tree['names'], tree['parents']
+        colors = ['blue'] * len(names)
+        colors[0] = 'lightgrey'
+        customdata = [''] * len(names)
+        for node, (key, value) in zip(tree['nodes'], data.items()):
+            color, messages = get_color_based_on_conditions(names[node], value)
+            if color:
+                colors[node] = color
+                customdata[node] = '<br>'.join(messages)
+        return [
+            {
+                'id': str(node),
+                'parent': '' if parent < 0 else str(parent),
+                'label': names[node] or 'root',
+                'color': colors[node],
+                'customdata': customdata[node]
+            }
+            for node, parent in enumerate(parents)
+        ]
 
     # Process the data
-    restructured_data = restructure_json(json_data)
-    sunburst_data = flatten_for_sunburst(restructured_data)
+    sunburst_data = flatten_for_sunburst(json_data, tree or build_tree(json_data))
 
     # Create the visualization
     ids = [item['id'] for item in sunburst_data]
@@ -102,8 +105,15 @@ def generate_visualization(json_data):
     # Return the plot as HTML
     return fig.to_json()
 
+def visualize_response(response):
+    # A /scan response requested with include_tree=true carries the tree, older ones just the data
+    if 'data' in response and 'status' in response:
+        return generate_visualization(response['data'], response.get('tree'))
+    return generate_visualization(response)
+
 if __name__ == "__main__":
-    # Test with example data
-    with open("exampleResponse.json", "r") as file:
+    # Test with example data, or a saved scan response given on the command line
+    import sys
+    with open(sys.argv[1] if len(sys.argv) > 1 else "exampleResponse.json", "r") as file:
         sample_data = json.load(file)
-    generate_visualization(sample_data)
\ No newline at end of file
+    visualize_response(sample_data)
\ No newline at end of file